@@ -0,0 +1,255 @@
+"""
+Offline benchmark suite for osrsutils
+
+Every network benchmark runs against the local stub server (benchmarks/stubserver.py),
+so results only depend on the machine and the stub settings.
+Results are printed (or written with --output) as JSON, to compare between releases.
+
+Usage:
+
+python benchmarks/run.py --output results.json
+python benchmarks/run.py --latency 0.05 --error-rate 0.01 --throttle-rate 0.05 --only bulk_prices bulk_hiscores
+
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0,os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+from osrsutils import itemcache, metrics, osrshiscores, osrsitems, transport
+from osrsutils.itemcatalog import ItemCatalog
+from osrsutils.itemquery import compile_query
+from osrsutils.resolver import NameResolver
+
+from stubserver import StubServer, item_data
+
+def _timed(func,repeat:int = 1):
+
+    """
+    Runs func repeat times
+
+        Returns: (best seconds per run, mean seconds per run)
+
+    """
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return min(times), sum(times)/len(times)
+
+def _search_queries(items,n,seed):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        item = rng.choice(items)
+        query = {}
+        for field in rng.sample(['name','examine','icon','id','members','highalch','limit','value'],rng.randint(1,3)):
+            value = item.get(field)
+            if(isinstance(value,str)):
+                start = rng.randint(0,max(0,len(value) - 3))
+                value = value[start:start + rng.randint(3,8)]
+            query[field] = value
+        queries.append(query)
+    return queries
+
+import_check = (
+    'import sys, time\n'
+    'start = time.perf_counter()\n'
+    'import osrsutils, osrsutils.osrsitems, osrsutils.osrshiscores\n'
+    'print(time.perf_counter() - start, *[name for name in {} if name in sys.modules])\n'
+)
+
+#modules a cold import must not load (requests is imported on the first request, numpy by the modules needing it)
+deferred_modules = ('requests','numpy')
+
+def bench_import(args,workdir):
+
+    """
+    Times a cold import of osrsitems and osrshiscores in fresh interpreters
+    and checks that none of deferred_modules is imported (raises AssertionError otherwise)
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+    env = dict(os.environ,PYTHONPATH = root + os.pathsep + os.environ.get('PYTHONPATH',''))
+    check = import_check.format(deferred_modules)
+    times = []
+    for _ in range(max(args.repeat,5)):
+        output = subprocess.run([sys.executable,'-c',check],env = env,check = True,stdout = subprocess.PIPE).stdout.split()
+        times.append(float(output[0]))
+        loaded = [name.decode() for name in output[1:]]
+        assert not loaded, 'import osrsutils loaded {} up front'.format(', '.join(loaded))
+    return {'seconds':min(times),'mean_seconds':sum(times)/len(times),'deferred_modules':list(deferred_modules)}
+
+def bench_catalog_load(args,workdir):
+    json_path = os.path.join(workdir,'item_data.json')
+    bin_path = os.path.join(workdir,'item_data.bin')
+    best_json, mean_json = _timed(lambda: ItemCatalog(osrsitems.get_item_data()).get(4151),args.repeat)
+    itemcache.write_item_cache(bin_path,osrsitems.get_item_data(),json_path)
+    best_bin, mean_bin = _timed(lambda: ItemCatalog(itemcache.load_item_cache(bin_path,json_path)).get(4151),args.repeat)
+    return {'json_seconds':best_json,'json_mean_seconds':mean_json,'sidecar_seconds':best_bin,'sidecar_mean_seconds':mean_bin}
+
+def bench_search(args,workdir):
+    osrsitems.catalog_handle.invalidate()
+    catalog = osrsitems.get_catalog()
+    queries = _search_queries(list(catalog.items),args.queries,args.seed)
+    for query in queries:
+        osrsitems.search_item_data(**query)
+    best, mean = _timed(lambda: [osrsitems.search_item_data(**query) for query in queries],args.repeat)
+    return {'queries':len(queries),'seconds':best,'queries_per_second':len(queries)/best,'mean_seconds':mean}
+
+def bench_resolve(args,workdir):
+    osrsitems._resolver = None
+    best_build, _ = _timed(lambda: NameResolver(osrsitems.get_catalog()),args.repeat)
+    rng = random.Random(args.seed)
+    names = [item['name'] for item in osrsitems.get_catalog() if item.get('name')]
+    queries = []
+    for _ in range(args.queries):
+        name = rng.choice(names)
+        i = rng.randrange(len(name))
+        #drop one character to simulate a typo
+        queries.append(name[:i] + name[i + 1:])
+    resolver = osrsitems.get_resolver()
+    best, mean = _timed(lambda: [resolver.search(query) for query in queries],args.repeat)
+    return {'build_seconds':best_build,'queries':len(queries),'seconds':best,'queries_per_second':len(queries)/best,'mean_seconds':mean}
+
+def bench_query(args,workdir):
+    rng = random.Random(args.seed)
+    catalog = osrsitems.get_catalog()
+    fields = ['lowalch','highalch','limit','value']
+    queries = []
+    for _ in range(args.queries):
+        query = compile_query(order_by = rng.choice(['-value','highalch','-limit']))
+        for field in rng.sample(fields,rng.randint(1,3)):
+            query.where(field,rng.choice(['gt','le']),rng.choice(catalog.items).get(field) or 0)
+        if(rng.random() < 0.5):
+            query.where('members','eq',rng.random() < 0.5)
+        queries.append(query)
+    best, mean = _timed(lambda: [query.run(catalog,20) for query in queries],args.repeat)
+    return {'queries':len(queries),'seconds':best,'queries_per_second':len(queries)/best,'mean_seconds':mean}
+
+def bench_parse_hiscores(args,server):
+    text = server.payloads['hiscores'].decode('utf-8')
+    n = args.players * 10
+
+    def parse_dicts():
+        for _ in range(n):
+            player = osrshiscores.PlayerHiscores.__new__(osrshiscores.PlayerHiscores)
+            player.skills = {}
+            player.activities = {}
+            player.bosses = {}
+            player._parse_hiscores(text)
+
+    def parse_compact():
+        for _ in range(n):
+            osrshiscores.CompactHiscores('bench','N',text).row
+
+    best_dicts, _ = _timed(parse_dicts,args.repeat)
+    best_compact, _ = _timed(parse_compact,args.repeat)
+    return {'rows':n,'dict_rows_per_second':n/best_dicts,'compact_rows_per_second':n/best_compact}
+
+def bench_bulk_prices(args,server):
+    ids = [item['id'] for item in osrsitems.get_catalog()][:args.items]
+    missing = [900000 + i for i in range(args.items // 10)]
+    osrsitems.response_cache.invalidate()
+    start_requests = server.requests
+    best, mean = _timed(lambda: (osrsitems.response_cache.invalidate(),osrsitems.get_current_prices(ids + missing)),args.repeat)
+    requests_made = (server.requests - start_requests) / args.repeat
+    best_ge, _ = _timed(lambda: osrsitems.ge_lookups(ids[:args.items // 10]),args.repeat)
+    return {'items':len(ids) + len(missing),'seconds':best,'mean_seconds':mean,'requests_per_run':requests_made,
+            'ge_lookups':args.items // 10,'ge_lookups_seconds':best_ge}
+
+def bench_bulk_hiscores(args,server):
+    players = [('player{}'.format(i),'N') for i in range(args.players)]
+    players += [('missing{}'.format(i),'IM') for i in range(args.players // 20)]
+
+    def fetch():
+        results = list(osrshiscores.fetch_hiscores(players,workers = args.workers,compact = True))
+        return sum(1 for r in results if r.error is not None)
+
+    failures = fetch()
+    best, mean = _timed(fetch,args.repeat)
+    return {'players':len(players),'seconds':best,'mean_seconds':mean,'players_per_second':len(players)/best,'failures':failures}
+
+benchmarks = {
+    'import': (bench_import,False),
+    'catalog_load': (bench_catalog_load,False),
+    'search': (bench_search,False),
+    'resolve': (bench_resolve,False),
+    'query': (bench_query,False),
+    'parse_hiscores': (bench_parse_hiscores,True),
+    'bulk_prices': (bench_bulk_prices,True),
+    'bulk_hiscores': (bench_bulk_hiscores,True),
+}
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Run the osrsutils benchmarks against a local stub server')
+    parser.add_argument('--only',nargs = '+',choices = list(benchmarks),help = 'benchmarks to run (default: all)')
+    parser.add_argument('--output',help = 'write the JSON results to this file instead of stdout')
+    parser.add_argument('--repeat',type = int,default = 3)
+    parser.add_argument('--seed',type = int,default = 0)
+    parser.add_argument('--latency',type = float,default = 0.01,help = 'stub response latency in seconds')
+    parser.add_argument('--error-rate',type = float,default = 0,help = 'fraction of stub responses that are 500s')
+    parser.add_argument('--throttle-rate',type = float,default = 0,help = 'fraction of stub responses that are 429s')
+    parser.add_argument('--rate-limits',action = 'store_true',help = 'keep the default transport rate limits (disabled by default)')
+    parser.add_argument('--metrics',action = 'store_true',help = 'enable osrsutils.metrics and include the snapshot in the results')
+    parser.add_argument('--queries',type = int,default = 2000)
+    parser.add_argument('--items',type = int,default = 500)
+    parser.add_argument('--players',type = int,default = 200)
+    parser.add_argument('--workers',type = int,default = 16)
+    args = parser.parse_args(argv)
+
+    if(not args.rate_limits):
+        for endpoint in list(transport.rate_limits):
+            transport.set_rate_limit(endpoint,None)
+    transport.configure(backoff_factor = 0)
+    if(args.metrics):
+        metrics.enable()
+
+    workdir = tempfile.mkdtemp(prefix = 'osrsutils-bench-')
+    saved = (osrsitems.item_list,osrsitems.item_cache,osrsitems.item_meta)
+    osrsitems.item_list = os.path.join(workdir,'item_data.json')
+    osrsitems.item_cache = os.path.join(workdir,'item_data.bin')
+    osrsitems.item_meta = os.path.join(workdir,'item_data.meta.json')
+    osrsitems.catalog_handle.invalidate()
+    shutil.copy(item_data,osrsitems.item_list)
+
+    results = {}
+    try:
+        with StubServer(latency = args.latency,error_rate = args.error_rate,throttle_rate = args.throttle_rate,seed = args.seed) as server:
+            server.install()
+            for name in args.only or list(benchmarks):
+                func, uses_server = benchmarks[name]
+                results[name] = func(args,server if uses_server else workdir)
+    finally:
+        osrsitems.item_list, osrsitems.item_cache, osrsitems.item_meta = saved
+        osrsitems.catalog_handle.invalidate()
+        shutil.rmtree(workdir,ignore_errors = True)
+
+    report = {
+        'timestamp':int(time.time()),
+        'python':platform.python_version(),
+        'platform':platform.platform(),
+        'settings':{k:v for k, v in vars(args).items() if k not in ('only','output','metrics')},
+        'results':results,
+    }
+    if(args.metrics):
+        report['metrics'] = metrics.snapshot()
+    output = json.dumps(report,indent = 4)
+    if(args.output):
+        with open(args.output,'w',encoding = 'utf-8') as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
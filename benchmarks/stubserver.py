@@ -0,0 +1,235 @@
+"""
+A local stand-in for every endpoint osrsutils talks to, used by the benchmarks
+
+Serves fixture payloads with configurable latency, error rate and 429 (rate limited) rate,
+with an ETag on every payload (a matching If-None-Match is answered with a 304):
+
+    /prices/latest, /prices/5m, /prices/1h, /prices/mapping, /prices/timeseries
+    /ge/detail.json?item=<id>
+    /graph/<id>.json
+    /<hiscores table>/index_lite.ws?player=<username>    (players whose name starts with 'missing' get a 404,
+                                                           'empty' an empty 200 and 'html' an HTML page)
+
+The mapping is item_data.json, the other payloads are generated from it with a fixed seed
+(or read from the fixtures directory when a recorded file exists, i.e fixtures/latest.json).
+
+Typical usage:
+
+with StubServer(latency = 0.02, error_rate = 0.01) as server:
+    server.install()    # points osrsitems/osrshiscores at the stub
+    ...
+
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+fixtures_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)),'fixtures')
+item_data = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'osrsutils','item_data.json')
+
+def _fixture(name):
+    path = os.path.join(fixtures_dir,name)
+    if(not os.path.exists(path)):
+        return None
+    with open(path,'rb') as f:
+        return f.read()
+
+def build_payloads(seed:int = 0):
+
+    """
+    Builds the response bodies served by the stub
+
+        Returns: a dict {name: bytes}
+
+    """
+
+    rng = random.Random(seed)
+    with open(item_data,encoding = 'utf-8') as f:
+        mapping = json.load(f)
+
+    now = int(time.time())
+    latest = {}
+    averages = {}
+    for item in mapping:
+        base = max(1,item.get('value',1))
+        high = int(base * rng.uniform(0.8,1.6))
+        low = int(high * rng.uniform(0.9,1.0))
+        latest[str(item['id'])] = {'high':high,'highTime':now - rng.randint(0,3600),'low':low,'lowTime':now - rng.randint(0,3600)}
+        averages[str(item['id'])] = {'avgHighPrice':high,'highPriceVolume':rng.randint(0,5000),'avgLowPrice':low,'lowPriceVolume':rng.randint(0,5000)}
+
+    timeseries = {'data':[{'timestamp':now - now % 300 - 300*i,'avgHighPrice':rng.randint(100,200),'avgLowPrice':rng.randint(90,110),
+                           'highPriceVolume':rng.randint(0,100),'lowPriceVolume':rng.randint(0,100)} for i in reversed(range(365))]}
+    day = 86400000
+    start = (now - now % 86400) * 1000 - 179*day
+    graph = {'daily':{str(start + i*day):rng.randint(200000,220000) for i in range(180)},
+             'average':{str(start + i*day):rng.randint(200000,220000) for i in range(180)}}
+
+    payloads = {
+        'mapping': json.dumps(mapping).encode('utf-8'),
+        'latest': json.dumps({'data':latest}).encode('utf-8'),
+        '5m': json.dumps({'data':averages,'timestamp':now - now % 300}).encode('utf-8'),
+        '1h': json.dumps({'data':averages,'timestamp':now - now % 3600}).encode('utf-8'),
+        'timeseries': json.dumps(timeseries).encode('utf-8'),
+        'graph': json.dumps(graph).encode('utf-8'),
+        'ge': _fixture('ge_detail.json'),
+        'hiscores': _fixture('hiscores.txt'),
+    }
+    for name in list(payloads):
+        recorded = _fixture(name + '.json')
+        if(recorded is not None):
+            payloads[name] = recorded
+    return payloads
+
+class StubServer:
+
+    """
+    A threaded HTTP server serving the stub endpoints on localhost
+
+    Attributes:
+                latency (float): seconds each response is delayed
+                error_rate (float): fraction of requests answered with a 500
+                throttle_rate (float): fraction of requests answered with a 429 (with Retry-After: retry_after)
+                retry_after (str): the Retry-After header sent with 429 responses
+                requests (int): number of requests received
+                not_modified (int): number of requests answered with a 304
+
+    """
+
+    def __init__(self,latency:float = 0,error_rate:float = 0,throttle_rate:float = 0,seed:int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = '0'
+        self.requests = 0
+        self.not_modified = 0
+        self._statuses = deque()
+        self.payloads = build_payloads(seed)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1',0),self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+        self._installed = []
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:{}'.format(self._server.server_port)
+
+    def queue_statuses(self,*statuses):
+
+        """
+        Answers the next requests with these status codes (in order, before latency/error injection applies)
+        i.e queue_statuses(429, 500) makes the next request get a 429 and the one after a 500
+        """
+
+        with self._lock:
+            self._statuses.extend(statuses)
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self,*args):
+                pass
+
+            def _send(self,status,body = b'',content_type = 'application/json',extra = ()):
+                self.send_response(status)
+                self.send_header('Content-Type',content_type)
+                self.send_header('Content-Length',str(len(body)))
+                for header in extra:
+                    self.send_header(*header)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_payload(self,body,content_type = 'application/json'):
+                etag = '"{}"'.format(hashlib.md5(body).hexdigest())
+                if(self.headers['If-None-Match'] == etag):
+                    with stub._lock:
+                        stub.not_modified += 1
+                    return self._send(304,extra = [('ETag',etag)])
+                return self._send(200,body,content_type,[('ETag',etag)])
+
+            def do_GET(self):
+                with stub._lock:
+                    stub.requests += 1
+                    roll = stub._rng.random()
+                    status = stub._statuses.popleft() if stub._statuses else None
+                if(stub.latency):
+                    time.sleep(stub.latency)
+                if(status == 429 or (status is None and roll < stub.throttle_rate)):
+                    return self._send(429,extra = [('Retry-After',stub.retry_after)])
+                if(status is not None and status != 200):
+                    return self._send(status)
+                if(status is None and roll < stub.throttle_rate + stub.error_rate):
+                    return self._send(500)
+
+                url = urlsplit(self.path)
+                parts = url.path.strip('/').split('/')
+                query = parse_qs(url.query)
+                if(parts[0] == 'prices' and len(parts) == 2 and parts[1] in stub.payloads):
+                    return self._send_payload(stub.payloads[parts[1]])
+                if(parts[0] == 'ge'):
+                    return self._send_payload(stub.payloads['ge'])
+                if(parts[0] == 'graph'):
+                    return self._send_payload(stub.payloads['graph'])
+                if(parts[-1] == 'index_lite.ws'):
+                    player = query.get('player',[''])[0]
+                    if(player.startswith('missing')):
+                        return self._send(404,b'',content_type = 'text/plain')
+                    if(player.startswith('empty')):
+                        return self._send(200,b'',content_type = 'text/plain')
+                    if(player.startswith('html')):
+                        return self._send(200,b'<!DOCTYPE html>\n<html><body>Maintenance</body></html>',content_type = 'text/html')
+                    return self._send_payload(stub.payloads['hiscores'],content_type = 'text/plain')
+                return self._send(404)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target = self._server.serve_forever,daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.uninstall()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,*exc):
+        self.stop()
+
+    def install(self):
+
+        """
+        Points the osrsitems and osrshiscores endpoints at the stub (undone by uninstall() or stop())
+        """
+
+        from osrsutils import osrsitems, osrshiscores
+
+        targets = [
+            (osrsitems,'prices_endpoint',self.url + '/prices'),
+            (osrsitems,'ge_endpoint',self.url + '/ge/detail.json'),
+            (osrsitems,'graph_endpoint',self.url + '/graph/'),
+            (osrshiscores,'hiscores_endpoint',self.url + '/'),
+        ]
+        for module, name, value in targets:
+            self._installed.append((module,name,getattr(module,name)))
+            setattr(module,name,value)
+        osrsitems.response_cache.invalidate()
+
+    def uninstall(self):
+        while(self._installed):
+            module, name, value = self._installed.pop()
+            setattr(module,name,value)
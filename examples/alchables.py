@@ -1,21 +1,16 @@
-from osrsutils.osrsitems import search_item_data, get_current_price
-import time
+from osrsutils.osrsitems import search_item_data, get_current_prices
 
 nature_rune = 561
-nature_rune_price = get_current_price(nature_rune)
+battlestaves = search_item_data(name='battlestaff')
+prices = get_current_prices([nature_rune] + [item['id'] for item in battlestaves])
+nature_rune_price = prices[nature_rune]
 
 print('Nature rune price: ' + str(nature_rune_price))
 results = []
 #find every battlestaff that has an high alch profit/loss of no less than -10
-for item in search_item_data(name='battlestaff'):
-    time.sleep(0.5) #unfortunately we have to have a delay as to not spam the api
-    difference = (item['highalch'] - nature_rune_price) - get_current_price(item['id'])
+for item in battlestaves:
+    difference = (item['highalch'] - nature_rune_price) - prices[item['id']]
     if(difference >= -10):
         results.append((item['name'], difference))
 
 print(*results,sep='\n')
-
-
-
-
-
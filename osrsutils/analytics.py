@@ -0,0 +1,370 @@
+"""
+Module implementing time series analytics across many items
+
+Time series (from get_time_series or a PriceStore) are aligned on a shared timestamp grid and kept as
+contiguous (items, timestamps) float64 arrays, so rolling statistics for the whole market are computed as
+batched array operations. Large panels are split by rows across a process pool, the arrays being passed
+through shared memory instead of being pickled to each worker.
+Requires numpy (pip install osrsutils[numpy])
+
+Typical usage:
+
+panel = TimeSeriesPanel.load(ids, '1h')
+stats = analyze(panel, window = 24, basket = [561, 554, 555], workers = 4)
+stats['volatility'][:, -1]    # latest 24h volatility of every item
+
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from . import osrsitems
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    #python < 3.8, analyze() runs in a single process
+    shared_memory = None
+
+fields = ('avgHighPrice','avgLowPrice','highPriceVolume','lowPriceVolume')
+
+#statistics computed by analyze(), each an (items, timestamps) array
+statistics = ('mean','std','volatility','vwap')
+
+#panels with fewer items than this are analyzed in the calling process
+min_parallel_items = 256
+
+class TimeSeriesPanel:
+
+    """
+    Time series of many items aligned on the same timestamps
+
+    Attributes:
+                ids (ndarray): int64 item ids, one per row
+                timestamps (ndarray): int64 timestamps in ascending order, one per column
+                fields (dict): float64 arrays of shape (len(ids), len(timestamps)) for avgHighPrice, avgLowPrice,
+                               highPriceVolume and lowPriceVolume, NaN where an item has no point
+
+    """
+
+    def __init__(self,ids,timestamps,fields):
+        self.ids = ids
+        self.timestamps = timestamps
+        self.fields = fields
+
+    @classmethod
+    def from_series(cls,series:dict):
+
+        """
+        Aligns the series of several items
+
+            Parameters:
+                        series (dict): {id: series}, a series being a get_time_series() response ({'data':[{'timestamp':..},...]}),
+                                       a list of points, or the columns returned by PriceStore.read()
+
+            Returns: a TimeSeriesPanel (items without any point are left out)
+
+        """
+
+        columns = {}
+        for id, points in series.items():
+            if(isinstance(points,dict) and 'data' in points):
+                points = points['data']
+            if(isinstance(points,dict)):
+                data = {f:points.get(f,[]) for f in ('timestamp',) + fields}
+            else:
+                data = {f:[p.get(f) for p in points] for f in ('timestamp',) + fields}
+            if(data['timestamp']):
+                columns[int(id)] = data
+
+        ids = np.array(sorted(columns),dtype = np.int64)
+        lengths = [len(columns[id]['timestamp']) for id in ids.tolist()]
+        stamps = np.fromiter((ts for id in ids.tolist() for ts in columns[id]['timestamp']),dtype = np.int64,count = sum(lengths))
+        timestamps, positions = np.unique(stamps,return_inverse = True)
+        rows = np.repeat(np.arange(len(ids)),lengths)
+
+        arrays = {}
+        for f in fields:
+            values = np.array([v for id in ids.tolist() for v in columns[id][f]],dtype = np.float64)
+            arrays[f] = np.full((len(ids),len(timestamps)),np.nan)
+            arrays[f][rows,positions] = values
+        return cls(ids,timestamps,arrays)
+
+    @classmethod
+    def load(cls,ids,timestep:str = '1h',workers:int = None):
+
+        """
+        Downloads the time series of several items (see osrsitems.get_time_series) and aligns them
+
+            Parameters:
+                        ids (iterable): item ids
+                        timestep (str): '5m', '1h', '6h' or '24h'
+                        workers (int): number of download threads (optional, osrsitems.max_workers by default)
+
+        """
+
+        ids = list(dict.fromkeys(ids))
+        series = osrsitems._lookup_concurrently(lambda id: osrsitems.get_time_series(id,timestep),ids,workers)
+        return cls.from_series(series)
+
+    @classmethod
+    def from_store(cls,store,ids,timestep:str = '1h',start:int = None,end:int = None):
+
+        """
+        Aligns series read from a pricestore.PriceStore (no network access)
+        """
+
+        return cls.from_series(store.read_many(ids,timestep,start,end))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def shape(self):
+        return (len(self.ids),len(self.timestamps))
+
+    def rows(self,ids):
+
+        """
+        Gets the row of each id (-1 for ids that aren't in the panel)
+        """
+
+        ids = np.asarray(ids,dtype = np.int64)
+        positions = np.searchsorted(self.ids,ids)
+        positions[positions >= len(self.ids)] = 0
+        found = self.ids[positions] == ids if len(self.ids) else np.zeros(len(ids),dtype = bool)
+        return np.where(found,positions,-1)
+
+    def mid(self):
+
+        """
+        Gets the midpoint of the average high and low prices (or whichever one exists)
+        """
+
+        return mid_price(self.fields['avgHighPrice'],self.fields['avgLowPrice'])
+
+    def volume(self):
+
+        """
+        Gets the total traded volume (missing volumes count as 0)
+        """
+
+        return np.nan_to_num(self.fields['highPriceVolume']) + np.nan_to_num(self.fields['lowPriceVolume'])
+
+def mid_price(high,low):
+    return np.where(np.isnan(high),low,np.where(np.isnan(low),high,(high + low) / 2))
+
+def _rolling_sum(values,window):
+
+    """
+    Sums the last window values of every row, NaNs counting as 0
+    """
+
+    sums = np.cumsum(np.where(np.isnan(values),0,values),axis = -1)
+    sums[...,window:] = sums[...,window:] - sums[...,:-window].copy()
+    return sums
+
+def rolling_mean(values,window:int,min_periods:int = 1):
+
+    """
+    Computes the mean of the last window values along the last axis, ignoring NaNs
+
+        Parameters:
+                    values (ndarray): a 1d or 2d (items, timestamps) array
+                    window (int): number of timestamps in the window
+                    min_periods (int): windows with fewer non NaN values than this are NaN
+
+        Returns: an array of the same shape as values
+
+    """
+
+    counts = _rolling_sum((~np.isnan(values)).astype(np.float64),window)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        means = _rolling_sum(values,window) / counts
+    means[counts < max(1,min_periods)] = np.nan
+    return means
+
+def rolling_std(values,window:int,min_periods:int = 2):
+
+    """
+    Computes the sample standard deviation of the last window values along the last axis, ignoring NaNs
+    """
+
+    #centering each row keeps the sums of squares small
+    valid = ~np.isnan(values)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        means = np.where(valid,values,0).sum(axis = -1,keepdims = True) / valid.sum(axis = -1,keepdims = True)
+    centered = values - np.nan_to_num(means)
+    counts = _rolling_sum((~np.isnan(centered)).astype(np.float64),window)
+    sums = _rolling_sum(centered,window)
+    squares = _rolling_sum(centered*centered,window)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        variance = (squares - sums*sums/counts) / (counts - 1)
+    variance[counts < max(2,min_periods)] = np.nan
+    return np.sqrt(np.maximum(variance,0))
+
+def log_returns(prices):
+
+    """
+    Computes log(price[t] / price[t - 1]) along the last axis (the first column and gaps are NaN)
+    """
+
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        logs = np.log(np.where(prices > 0,prices,np.nan))
+    returns = np.full(prices.shape,np.nan)
+    returns[...,1:] = logs[...,1:] - logs[...,:-1]
+    return returns
+
+def rolling_vwap(prices,volumes,window:int):
+
+    """
+    Computes the volume weighted average price over the last window timestamps
+    (NaN where nothing traded in the window)
+    """
+
+    volumes = np.where(np.isnan(prices),0,np.nan_to_num(volumes))
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        vwap = _rolling_sum(prices*volumes,window) / _rolling_sum(volumes,window)
+    vwap[~np.isfinite(vwap)] = np.nan
+    return vwap
+
+def correlation(returns,basket_returns,min_periods:int = 3):
+
+    """
+    Computes the correlation of every row of returns with a single series, over the timestamps where both exist
+
+        Parameters:
+                    returns (ndarray): (items, timestamps) array
+                    basket_returns (ndarray): (timestamps,) array
+
+        Returns: a (items,) float64 array, NaN where fewer than min_periods timestamps overlap
+
+    """
+
+    valid = ~np.isnan(returns) & ~np.isnan(basket_returns)
+    n = valid.sum(axis = -1)
+    x = np.where(valid,returns,0)
+    y = np.where(valid,basket_returns,0)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        mx = x.sum(axis = -1) / n
+        my = y.sum(axis = -1) / n
+        cov = (x*y).sum(axis = -1)/n - mx*my
+        vx = (x*x).sum(axis = -1)/n - mx*mx
+        vy = (y*y).sum(axis = -1)/n - my*my
+        corr = cov / np.sqrt(vx*vy)
+    corr[(n < min_periods) | ~np.isfinite(corr)] = np.nan
+    return np.clip(corr,-1,1)
+
+def basket_returns(panel:TimeSeriesPanel,basket):
+
+    """
+    Gets the equally weighted log returns of a basket of items in the panel
+
+        Returns: a (timestamps,) array (NaN where none of the basket items traded)
+
+    """
+
+    rows = panel.rows(list(basket))
+    rows = rows[rows >= 0]
+    if(not len(rows)):
+        return np.full(len(panel.timestamps),np.nan)
+    returns = log_returns(panel.mid()[rows])
+    valid = ~np.isnan(returns)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        return np.where(valid.any(axis = 0),np.where(valid,returns,0).sum(axis = 0) / valid.sum(axis = 0),np.nan)
+
+def _analyze_rows(high,low,high_volume,low_volume,window,basket):
+
+    """
+    Computes every statistic for a block of rows
+
+        Returns: (ndarray of shape (len(statistics), rows, timestamps), correlation ndarray of shape (rows,))
+
+    """
+
+    prices = mid_price(high,low)
+    returns = log_returns(prices)
+    volumes = np.nan_to_num(high_volume) + np.nan_to_num(low_volume)
+    out = np.empty((len(statistics),) + prices.shape)
+    out[0] = rolling_mean(prices,window)
+    out[1] = rolling_std(prices,window)
+    out[2] = rolling_std(returns,window)
+    out[3] = rolling_vwap(prices,volumes,window)
+    corr = correlation(returns,basket) if basket is not None else np.full(len(prices),np.nan)
+    return out, corr
+
+def _attach(name,shape):
+    shm = shared_memory.SharedMemory(name = name)
+    return shm, np.ndarray(shape,dtype = np.float64,buffer = shm.buf)
+
+def _analyze_shared(inputs,outputs,correlations,shape,start,stop,window,basket):
+
+    """
+    Process pool task: analyzes rows start:stop of the shared input block into the shared output blocks
+    """
+
+    n, t = shape
+    blocks = [_attach(inputs,(len(fields),n,t)),_attach(outputs,(len(statistics),n,t)),_attach(correlations,(n,))]
+    try:
+        (_, data), (_, out), (_, corr) = blocks
+        out[:,start:stop], corr[start:stop] = _analyze_rows(*data[:,start:stop],window,basket)
+        del data, out, corr
+    finally:
+        for shm, _ in blocks:
+            shm.close()
+
+def analyze(panel:TimeSeriesPanel,window:int,basket = None,workers:int = None):
+
+    """
+    Computes rolling statistics for every item of a panel, on the mid price (see TimeSeriesPanel.mid)
+
+        Parameters:
+                    panel (TimeSeriesPanel): the aligned series
+                    window (int): number of timestamps in each rolling window
+                    basket (iterable): item ids whose equally weighted returns every item is correlated against (optional)
+                    workers (int): number of processes (optional, os.cpu_count() by default, 1 runs in the calling process)
+
+        Returns: a dict {'mean','std','volatility','vwap': (items, timestamps) arrays, 'correlation': (items,) array}
+                 volatility is the rolling standard deviation of log returns
+
+    """
+
+    n, t = panel.shape
+    basket = basket_returns(panel,basket) if basket is not None else None
+    workers = min(workers or os.cpu_count() or 1,max(1,n // (min_parallel_items // 2)))
+    data = [panel.fields[f] for f in fields]
+
+    if(workers <= 1 or n < min_parallel_items or shared_memory is None or not t):
+        out, corr = _analyze_rows(*data,window,basket)
+        result = dict(zip(statistics,out))
+        result['correlation'] = corr
+        return result
+
+    size = 8*n*t
+    blocks = [shared_memory.SharedMemory(create = True,size = len(fields)*size),
+              shared_memory.SharedMemory(create = True,size = len(statistics)*size),
+              shared_memory.SharedMemory(create = True,size = max(8,8*n))]
+    try:
+        shared = np.ndarray((len(fields),n,t),dtype = np.float64,buffer = blocks[0].buf)
+        for i, array in enumerate(data):
+            shared[i] = array
+        del shared
+
+        bounds = np.linspace(0,n,workers + 1).astype(int)
+        with ProcessPoolExecutor(max_workers = workers) as executor:
+            tasks = [executor.submit(_analyze_shared,blocks[0].name,blocks[1].name,blocks[2].name,(n,t),
+                                     int(start),int(stop),window,basket)
+                     for start, stop in zip(bounds[:-1],bounds[1:]) if stop > start]
+            for task in tasks:
+                task.result()
+
+        out = np.ndarray((len(statistics),n,t),dtype = np.float64,buffer = blocks[1].buf)
+        result = {name:out[i].copy() for i, name in enumerate(statistics)}
+        result['correlation'] = np.ndarray((n,),dtype = np.float64,buffer = blocks[2].buf).copy()
+        del out
+        return result
+    finally:
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
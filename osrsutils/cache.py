@@ -0,0 +1,194 @@
+"""
+Module implementing a response cache for the prices api
+
+Responses are kept for a per-route TTL in a size-bounded LRU.
+Once an entry expires it is revalidated with If-None-Match / If-Modified-Since,
+so an unchanged snapshot costs a 304 instead of downloading the whole body again.
+
+Typical usage:
+
+cache = ResponseCache(ttls = {'latest': 60})
+res = cache.fetch('latest', None, lambda headers: requests.get(url, headers = headers))
+
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from . import metrics
+
+#seconds each route is cached for, the wiki refreshes /latest about once a minute
+default_ttls = {
+    'latest': 60,
+    '5m': 300,
+    '1h': 3600,
+    'timeseries': 300,
+    'mapping': 3600,
+}
+
+def make_key(route:str,params = None):
+
+    """
+    Builds a cache key from a route and its query parameters
+
+        Parameters:
+                    route (str): the route requested
+                    params: Dict, list or tuple sent as the query string (optional)
+
+        Returns: a hashable key
+
+    """
+
+    if(not params):
+        return (route,)
+    if(isinstance(params,dict)):
+        params = params.items()
+    return (route,) + tuple(sorted((str(k),str(v)) for k, v in params if v is not None))
+
+class _Entry:
+
+    __slots__ = ('response','expires','size')
+
+    def __init__(self,response,expires):
+        self.response = response
+        self.expires = expires
+        self.size = len(response.content)
+
+    def validators(self):
+        headers = {}
+        etag = self.response.headers.get('ETag')
+        if(etag):
+            headers['If-None-Match'] = etag
+        modified = self.response.headers.get('Last-Modified')
+        if(modified):
+            headers['If-Modified-Since'] = modified
+        return headers
+
+class ResponseCache:
+
+    """
+    A thread-safe LRU cache of requests.Response objects
+
+    Attributes:
+                ttls (dict): seconds each route is cached for (routes not listed use default_ttl, a ttl of 0 disables caching)
+                default_ttl (float): ttl of routes not in ttls
+                max_entries (int): the maximum number of responses kept
+                max_bytes (int): the maximum total size of the cached response bodies
+                hits (int): requests answered from the cache without contacting the server
+                misses (int): requests that downloaded a new response
+                revalidations (int): expired entries the server confirmed were unchanged (304)
+                evictions (int): entries dropped to stay within max_entries/max_bytes
+
+    """
+
+    def __init__(self,ttls:dict = None,default_ttl:float = 0,max_entries:int = 256,max_bytes:int = 64*1024*1024):
+        self.ttls = dict(default_ttls if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def ttl(self,route:str):
+        return self.ttls.get(route,self.default_ttl)
+
+    def _lookup(self,key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if(entry is not None):
+                self._entries.move_to_end(key)
+            return entry
+
+    def _store(self,key,entry):
+        with self._lock:
+            old = self._entries.pop(key,None)
+            if(old is not None):
+                self._bytes -= old.size
+            if(entry.size > self.max_bytes):
+                return
+            self._entries[key] = entry
+            self._bytes += entry.size
+            while(len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                evicted_key, evicted = self._entries.popitem(last = False)
+                self._bytes -= evicted.size
+                self.evictions += 1
+                if(metrics.enabled):
+                    metrics.increment('cache.evictions',route = evicted_key[0])
+
+    def _count(self,counter,route = None):
+        with self._lock:
+            setattr(self,counter,getattr(self,counter) + 1)
+        if(metrics.enabled):
+            metrics.increment('cache.' + counter,route = route)
+
+    def fetch(self,route:str,params,request,revalidate:bool = False):
+
+        """
+        Gets the response for route and params, from the cache if possible
+
+            Parameters:
+                        route (str): the route requested
+                        params: the query parameters (used to build the key)
+                        request: a function taking a dict of extra request headers and returning a requests.Response
+                        revalidate (bool): whether to check a cached response with the server even if it hasn't expired
+
+            Returns: a requests.Response (only successful (200) responses are cached)
+
+        """
+
+        ttl = self.ttl(route)
+        if(ttl <= 0):
+            return request({})
+
+        key = make_key(route,params)
+        entry = self._lookup(key)
+        now = time.monotonic()
+        if(entry is not None and entry.expires > now and not revalidate):
+            self._count('hits',route)
+            return entry.response
+
+        response = request(entry.validators() if entry is not None else {})
+        now = time.monotonic()
+        if(entry is not None and response.status_code == 304):
+            self._count('revalidations',route)
+            entry.expires = now + ttl
+            return entry.response
+
+        self._count('misses',route)
+        if(response.status_code == 200):
+            self._store(key,_Entry(response,now + ttl))
+        return response
+
+    def invalidate(self,route:str = None):
+
+        """
+        Drops cached responses
+
+            Parameters:
+                        route (str): only drop responses for this route (optional, drops everything by default)
+
+        """
+
+        with self._lock:
+            for key in [k for k in self._entries if route is None or k[0] == route]:
+                self._bytes -= self._entries.pop(key).size
+
+    def stats(self):
+
+        """
+        Gets the cache counters
+
+            Returns: a dict {'hits','misses','revalidations','evictions','entries','bytes'}
+
+        """
+
+        return {'hits':self.hits,'misses':self.misses,'revalidations':self.revalidations,
+                'evictions':self.evictions,'entries':len(self._entries),'bytes':self._bytes}
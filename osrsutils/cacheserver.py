@@ -0,0 +1,233 @@
+"""
+Module implementing a local cache server shared by every osrsutils process on a host
+
+The server fronts the prices, ge, graph and hiscores endpoints: it holds one response cache, one set of
+rate limits (see transport) and coalesces identical requests, so N worker processes asking for /latest,
+graphs or hiscores cost about as much upstream traffic as a single process.
+Clients are routed through it by transport.get once it is configured, nothing else changes for them.
+
+Typical usage:
+
+python -m osrsutils.cacheserver --port 8787            # once per host
+
+transport.set_cache_server('http://127.0.0.1:8787')      # in each worker (or set OSRSUTILS_CACHE_SERVER)
+osrsitems.get_latest_price()
+
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+from . import cache
+from . import osrshiscores
+from . import osrsitems
+from . import transport
+from .singleflight import SingleFlight
+
+default_port = 8787
+
+#seconds each route is cached for by the server (prices routes are named after the route, i.e 'latest')
+server_ttls = dict(cache.default_ttls,ge = 300,graph = 3600,hiscores = 60)
+
+#response headers passed on to the clients (Retry-After so a throttled upstream slows the clients down)
+forwarded_headers = ('Content-Type','ETag','Last-Modified','Retry-After')
+
+def upstreams():
+
+    """
+    Gets the url prefixes the server is allowed to request for each endpoint
+    (read from osrsitems and osrshiscores every time, so changing their endpoints is picked up)
+
+        Returns: a dict {endpoint: url prefix or tuple of url prefixes}
+                 the hiscores are limited to the index_lite route of each hiscores table
+
+    """
+
+    return {
+        'prices': osrsitems.prices_endpoint.rstrip('/') + '/',
+        'ge': osrsitems.ge_endpoint,
+        'graph': osrsitems.graph_endpoint,
+        'hiscores': tuple(osrshiscores.hiscores_endpoint + table + '/index_lite.ws?' for table in osrshiscores.hiscores_tables.values()),
+    }
+
+def _route(endpoint,url):
+
+    """
+    Gets the name a request is cached under (the route for the prices endpoint, the endpoint otherwise)
+    """
+
+    if(endpoint == 'prices'):
+        return urlsplit(url).path.rstrip('/').rsplit('/',1)[-1]
+    return endpoint
+
+class CacheServer:
+
+    """
+    A threaded HTTP server answering requests for the upstream endpoints from a shared cache
+
+    Clients request GET /fetch?endpoint=<endpoint>&url=<upstream url> (see transport.get),
+    GET /stats returns the counters as JSON.
+
+    Attributes:
+                cache (ResponseCache): the shared responses
+                inflight (SingleFlight): identical requests waiting on the same upstream request
+                requests (int): requests received from clients
+                upstream_requests (int): requests sent upstream (including revalidations)
+
+    """
+
+    def __init__(self,host:str = '127.0.0.1',port:int = default_port,ttls:dict = None,max_bytes:int = 256*1024*1024):
+
+        """
+        Parameters:
+                    host (str): address to listen on (localhost by default, the server doesn't authenticate clients)
+                    port (int): port to listen on (0 picks a free port)
+                    ttls (dict): seconds each route is cached for (optional, server_ttls by default)
+                    max_bytes (int): the maximum total size of the cached responses
+
+        """
+
+        self.cache = cache.ResponseCache(ttls = server_ttls if ttls is None else ttls,max_entries = 100000,max_bytes = max_bytes)
+        self.inflight = SingleFlight()
+        self.requests = 0
+        self.upstream_requests = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host,port),self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://{}:{}'.format(host,port)
+
+    def stats(self):
+
+        """
+        Gets the server counters
+
+            Returns: a dict {'requests','upstream_requests','inflight','cache': ResponseCache.stats()}
+
+        """
+
+        return {'requests':self.requests,'upstream_requests':self.upstream_requests,'inflight':len(self.inflight),'cache':self.cache.stats()}
+
+    def fetch(self,endpoint:str,url:str,headers:dict = None):
+
+        """
+        Gets the upstream response for url, from the cache if possible
+
+            Parameters:
+                        endpoint (str): 'prices', 'ge', 'graph' or 'hiscores'
+                        url (str): the upstream url (with its query string)
+                        headers (dict): request headers sent upstream (i.e User-Agent)
+
+            Returns: a requests.Response
+
+            Raises: ValueError if url isn't one of endpoint's urls
+
+        """
+
+        prefix = upstreams().get(endpoint)
+        if(prefix is None or not url.startswith(prefix)):
+            raise ValueError('{!r} is not a {} url'.format(url,endpoint))
+        route = _route(endpoint,url)
+
+        def request(validators):
+            with self._lock:
+                self.upstream_requests += 1
+            return transport.get_direct(url,endpoint,headers = dict(headers or {},**validators),route = 'server/' + endpoint)
+
+        return self.inflight.do(url,self.cache.fetch,route,[('url',url)],request)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self,*args):
+                pass
+
+            def _send(self,status,body = b'',headers = ()):
+                self.send_response(status)
+                for header in headers:
+                    self.send_header(*header)
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if(url.path == '/stats'):
+                    return self._send(200,json.dumps(server.stats()).encode('utf-8'),[('Content-Type','application/json')])
+                if(url.path != '/fetch'):
+                    return self._send(404)
+
+                with server._lock:
+                    server.requests += 1
+                query = parse_qs(url.query)
+                endpoint = query.get('endpoint',[''])[0]
+                upstream = query.get('url',[''])[0]
+                headers = {'User-Agent':self.headers['User-Agent']} if self.headers['User-Agent'] else {}
+                try:
+                    res = server.fetch(endpoint,upstream,headers)
+                except ValueError as e:
+                    return self._send(400,str(e).encode('utf-8'),[('Content-Type','text/plain')])
+                except transport.RequestException as e:
+                    return self._send(502,str(e).encode('utf-8'),[('Content-Type','text/plain')])
+
+                headers = [(name,res.headers[name]) for name in forwarded_headers if name in res.headers]
+                etag = res.headers.get('ETag')
+                if(res.status_code == 200 and etag and self.headers['If-None-Match'] == etag):
+                    return self._send(304,b'',headers)
+                self._send(res.status_code,res.content,headers)
+
+        return Handler
+
+    def start(self):
+
+        """
+        Serves requests in a background thread
+
+            Returns: the server
+
+        """
+
+        self._thread = threading.Thread(target = self._server.serve_forever,name = 'osrsutils-cache-server',daemon = True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,*exc):
+        self.stop()
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description = 'Run a local cache server shared by the osrsutils processes on this host')
+    parser.add_argument('--host',default = '127.0.0.1')
+    parser.add_argument('--port',type = int,default = default_port)
+    args = parser.parse_args(argv)
+
+    server = CacheServer(args.host,args.port)
+    print('Serving on {}'.format(server.url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+if __name__ == '__main__':
+    main()
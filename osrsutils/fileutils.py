@@ -2,16 +2,31 @@ import json
 import os
 
 def get_data_dir():
-    return os.path.dirname(os.path.realpath(__file__)) + '\\'
+    return os.path.join(os.path.dirname(os.path.realpath(__file__)),'')
+
+def get_data_path(name):
+    return os.path.join(get_data_dir(),name)
 
 def write_to_json(file,data):
+    return write_json_stat(file,data) is not None
+
+def write_json_stat(file,data):
+    #write to a temporary file and rename it over the old one, so readers never see a partially written file
+    #returns the os.stat_result of the file that was written (the rename keeps it), or None if it couldn't be written
+    tmp = '{}.{}.tmp'.format(file,os.getpid())
     try:
-        with open(file, 'w+', encoding='utf-8') as f:
+        with open(tmp, 'w', encoding='utf-8') as f:
             json.dump(data, f, ensure_ascii = False, indent = 4,skipkeys = True)
-        return True
+        stat = os.stat(tmp)
+        os.replace(tmp,file)
+        return stat
     except OSError as e:
         print(e)
-        return False
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return None
 
 def read_json(file):
     try:
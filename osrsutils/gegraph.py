@@ -0,0 +1,212 @@
+"""
+Module implementing a bulk loader for the grand exchange price graphs
+
+The graph route returns 180 days of daily prices and 30 day averages for an item. Each item's graph is
+kept on disk as int64 arrays and only downloaded again once a new (UTC) day has started, so trend analysis
+over the whole catalog costs one download per item per day.
+Requires numpy (pip install osrsutils[numpy])
+
+Typical usage:
+
+graphs = GraphHistory()
+series = graphs.get(4751)                   # GraphSeries(timestamps, daily, average)
+ids, timestamps, daily, average = graphs.matrix(ids)
+
+convert(['217.1k', '1,223', '-5.2m'])       # array([217100, 1223, -5200000])
+
+"""
+import datetime
+import os
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from . import fileutils
+from . import osrsitems
+from . import transport
+
+GraphSeries = namedtuple('GraphSeries',['timestamps','daily','average'])
+GraphSeries.__doc__ = """
+An item's price graph: int64 arrays of unix timestamps (seconds), daily prices and 30 day average prices
+"""
+
+default_root = fileutils.get_data_path('graphs')
+
+def _day(timestamp):
+    return datetime.datetime.fromtimestamp(timestamp,datetime.timezone.utc).date()
+
+def parse_graph(graph:dict):
+
+    """
+    Converts a graph route response ({'daily':{ms timestamp: price},'average':{...}}) to a GraphSeries
+    """
+
+    daily = graph.get('daily') or {}
+    average = graph.get('average') or {}
+    timestamps = np.fromiter((int(k) for k in daily),dtype = np.int64,count = len(daily))
+    prices = np.fromiter(daily.values(),dtype = np.int64,count = len(daily))
+    averages = np.fromiter((average.get(k,-1) for k in daily),dtype = np.int64,count = len(daily))
+    order = np.argsort(timestamps,kind = 'stable')
+    return GraphSeries(timestamps[order] // 1000,prices[order],averages[order])
+
+class GraphHistory:
+
+    """
+    A disk cache of grand exchange price graphs
+
+    Attributes:
+                root (str): directory the graphs are stored in (one .npy file per item)
+
+    """
+
+    def __init__(self,root:str = None):
+
+        """
+        Parameters:
+                    root (str): directory to store the graphs in (optional)
+                    Default: the 'graphs' directory next to item_data.json
+
+        """
+
+        self.root = root or default_root
+        self._memory = {}
+
+    def _path(self,id):
+        return os.path.join(self.root,'{}.npy'.format(int(id)))
+
+    def is_fresh(self,id,now:float = None):
+
+        """
+        Checks whether an item's graph was downloaded on the current UTC day
+        """
+
+        try:
+            modified = os.path.getmtime(self._path(id))
+        except OSError:
+            return False
+        return _day(modified) == _day(time.time() if now is None else now)
+
+    def cached(self,id):
+
+        """
+        Reads an item's stored graph without touching the network
+
+            Returns: a GraphSeries or None if nothing is stored
+
+        """
+
+        path = self._path(id)
+        try:
+            modified = os.path.getmtime(path)
+            entry = self._memory.get(int(id))
+            if(entry is not None and entry[0] == modified):
+                return entry[1]
+            data = np.load(path)
+        except (OSError,ValueError):
+            return None
+        series = GraphSeries(*data)
+        self._memory[int(id)] = (modified,series)
+        return series
+
+    def _download(self,id):
+        try:
+            response = osrsitems._graph_api_request(id)
+            series = parse_graph(response.json())
+        except (transport.RequestException,ValueError):
+            return None
+        os.makedirs(self.root,exist_ok = True)
+        path = self._path(id)
+        tmp = '{}.{}.tmp.npy'.format(path[:-4],os.getpid())
+        try:
+            np.save(tmp,np.stack(series))
+            os.replace(tmp,path)
+        except OSError as e:
+            print(e)
+        self._memory.pop(int(id),None)
+        return series
+
+    def get(self,id,refresh:bool = False):
+
+        """
+        Gets an item's graph, downloading it if it wasn't downloaded today
+
+            Parameters:
+                        id (int): item id
+                        refresh (bool): whether to download the graph even if it is fresh
+
+            Returns: a GraphSeries, the stale cached graph if the download failed, or None if there is neither
+
+        """
+
+        if(not refresh and self.is_fresh(id)):
+            series = self.cached(id)
+            if(series is not None):
+                return series
+        series = self._download(id)
+        return series if series is not None else self.cached(id)
+
+    def get_many(self,ids,refresh:bool = False,workers:int = None):
+
+        """
+        Gets several items' graphs, downloading the stale ones concurrently
+
+            Returns: a dict {id: GraphSeries} (items whose graph couldn't be loaded are left out)
+
+        """
+
+        ids = list(dict.fromkeys(ids))
+        stale = [id for id in ids if refresh or not self.is_fresh(id)]
+        series = osrsitems._lookup_concurrently(lambda id: self.get(id,refresh),stale,workers)
+        for id in ids:
+            if(id not in series):
+                series[id] = self.cached(id)
+        return {id:series[id] for id in ids if series[id] is not None}
+
+    def matrix(self,ids,refresh:bool = False,workers:int = None):
+
+        """
+        Gets several items' graphs aligned on the same timestamps
+
+            Returns: (ids, timestamps, daily, average)
+                     ids and timestamps are int64 arrays, daily and average are float64 arrays
+                     of shape (len(ids), len(timestamps)) with NaN where an item has no point
+
+        """
+
+        series = self.get_many(ids,refresh,workers)
+        found = [id for id in dict.fromkeys(ids) if id in series]
+        if(not found):
+            empty = np.zeros((0,0))
+            return np.zeros(0,dtype = np.int64), np.zeros(0,dtype = np.int64), empty, empty
+        timestamps = np.unique(np.concatenate([series[id].timestamps for id in found]))
+        daily = np.full((len(found),len(timestamps)),np.nan)
+        average = np.full((len(found),len(timestamps)),np.nan)
+        for row, id in enumerate(found):
+            positions = np.searchsorted(timestamps,series[id].timestamps)
+            daily[row,positions] = series[id].daily
+            average[row,positions] = np.where(series[id].average >= 0,series[id].average,np.nan)
+        return np.array(found,dtype = np.int64), timestamps, daily, average
+
+def convert(values):
+
+    """
+    Converts many price strings from ge_lookup (like '217.1k', '+1,223' or '-5.0m') to numbers at once
+    (the vectorized version of osrsitems.convert: the strings are parsed with the same rules,
+    suffixed values are rounded and plain decimals are truncated the same way)
+
+        Parameters:
+                    values (iterable): the strings to convert
+
+        Returns: an int64 ndarray
+
+        Raises: ValueError if a string isn't a number
+
+    """
+
+    parts = [osrsitems._split_number(value) for value in values]
+    if(not parts):
+        return np.zeros(0,dtype = np.int64)
+    numbers = np.fromiter((number for number, _ in parts),dtype = np.float64,count = len(parts))
+    multipliers = np.fromiter((multiplier for _, multiplier in parts),dtype = np.float64,count = len(parts))
+    return np.where(multipliers > 1,np.rint(numbers * multipliers),np.trunc(numbers)).astype(np.int64)
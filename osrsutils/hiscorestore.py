@@ -0,0 +1,264 @@
+"""
+Module implementing a history store for hiscores snapshots
+
+Successive hiscores rows of each player are stored as sparse deltas in the osrshiscores row layout:
+every change is one (player, column, timestamp, delta) entry in four parallel int columns,
+and a snapshot where nothing changed isn't stored at all.
+Gains and rank changes over any time window are then a vectorized sum of the deltas inside the window.
+Requires numpy (pip install osrsutils[numpy])
+
+Typical usage:
+
+history = HiscoresHistory('clan_history')
+for result in fetch_hiscores(players, compact = True):
+    if(result.error is None):
+        history.add(result.hiscores)
+
+players, skills, xp = history.gains(start = time.time() - 7*86400)
+
+"""
+import json
+import os
+import struct
+import threading
+import time
+from array import array
+
+import numpy as np
+
+from .osrshiscores import player_key, row_offsets, row_length, sections, to_row
+
+_change = struct.Struct('=iiqq')
+
+def column_indices(section:str,column:str):
+
+    """
+    Gets the row positions of one column of every entry in a section, i.e column_indices('skills','xp')
+
+        Returns: (names, ndarray of positions)
+
+    """
+
+    names, columns = sections[section]
+    i = columns.index(column)
+    return names, np.array([row_offsets[(section,name)] + i for name in names],dtype = np.int64)
+
+def _state(arrays,at):
+
+    """
+    Sums every change up to at into a (players, row_length) matrix
+    """
+
+    player, column, timestamp, delta, n = arrays
+    if(at is not None):
+        mask = timestamp <= at
+        player, column, delta = player[mask], column[mask], delta[mask]
+    rows = np.full((n,row_length),-1,dtype = np.int64)
+    np.add.at(rows,(player,column),delta)
+    return rows
+
+class HiscoresHistory:
+
+    """
+    A store of hiscores snapshots for many players
+
+    Attributes:
+                root (str): directory the history is saved in (None keeps it in memory only)
+                players (list): (username, account_type) of every tracked player, the index is the player's id in queries
+                                Players are matched by osrshiscores.player_key, so 'Foo Bar', 'foo bar' and 'Foo%20Bar'
+                                share one history (stored under the spelling they were first added with)
+
+    """
+
+    def __init__(self,root:str = None):
+
+        """
+        Parameters:
+                    root (str): directory to save the history in (optional)
+                    Existing history in the directory is loaded
+
+        """
+
+        self.root = root
+        self.players = []
+        self._ids = {}
+        self._last = []
+        self._last_time = []
+        self._player = array('i')
+        self._column = array('i')
+        self._time = array('q')
+        self._delta = array('q')
+        self._lock = threading.Lock()
+        if(root is not None):
+            os.makedirs(root,exist_ok = True)
+            self._load()
+
+    def _load(self):
+        try:
+            with open(os.path.join(self.root,'players.jsonl'),encoding = 'utf-8') as f:
+                for line in f:
+                    username, account_type = json.loads(line)
+                    self._new_player(username,account_type)
+        except FileNotFoundError:
+            pass
+
+        try:
+            with open(os.path.join(self.root,'changes.bin'),'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+
+        data = data[:len(data) - len(data) % _change.size]
+        for player, column, timestamp, delta in _change.iter_unpack(data):
+            if(player >= len(self.players)):
+                break
+            self._apply(player,column,timestamp,delta)
+
+    def _new_player(self,username,account_type):
+        player = (username.replace('%20',' '),account_type.upper())
+        #histories saved before usernames were normalized may hold several spellings, lookups use the first one
+        self._ids.setdefault(player_key(username,account_type),len(self.players))
+        self.players.append(player)
+        self._last.append(array('q',[-1]) * row_length)
+        self._last_time.append(None)
+        return len(self.players) - 1
+
+    def _apply(self,player,column,timestamp,delta):
+        self._player.append(player)
+        self._column.append(column)
+        self._time.append(timestamp)
+        self._delta.append(delta)
+        self._last[player][column] += delta
+        self._last_time[player] = timestamp
+
+    def __len__(self):
+        return len(self.players)
+
+    def add(self,hiscores,timestamp:int = None):
+
+        """
+        Stores a snapshot of a player's hiscores
+
+            Parameters:
+                        hiscores: a PlayerHiscores or CompactHiscores object
+                        timestamp (int): unix time of the snapshot (optional, now by default)
+
+            Returns: the number of changed values stored (0 if nothing changed or the snapshot is older than the last one)
+
+        """
+
+        return self.add_row(hiscores.username,hiscores.account_type,to_row(hiscores),timestamp)
+
+    def add_row(self,username:str,account_type:str,row,timestamp:int = None):
+
+        """
+        Stores a snapshot given as a row in the osrshiscores row layout
+
+            Returns: the number of changed values stored
+
+        """
+
+        timestamp = int(time.time() if timestamp is None else timestamp)
+        with self._lock:
+            player = self._ids.get(player_key(username,account_type))
+            if(player is None):
+                player = self._new_player(username,account_type)
+                if(self.root is not None):
+                    with open(os.path.join(self.root,'players.jsonl'),'a',encoding = 'utf-8') as f:
+                        f.write(json.dumps(self.players[player]) + '\n')
+            elif(self._last_time[player] is not None and timestamp < self._last_time[player]):
+                return 0
+
+            last = self._last[player]
+            changes = [(player,column,timestamp,value - last[column]) for column, value in enumerate(row) if value != last[column]]
+            if(not changes):
+                return 0
+
+            for change in changes:
+                self._apply(*change)
+            if(self.root is not None):
+                with open(os.path.join(self.root,'changes.bin'),'ab') as f:
+                    f.write(b''.join(_change.pack(*change) for change in changes))
+            return len(changes)
+
+    def _arrays(self):
+        with self._lock:
+            return (np.frombuffer(self._player,dtype = np.int32).copy(),np.frombuffer(self._column,dtype = np.int32).copy(),
+                    np.frombuffer(self._time,dtype = np.int64).copy(),np.frombuffer(self._delta,dtype = np.int64).copy(),
+                    len(self.players))
+
+    def state(self,at:int = None):
+
+        """
+        Gets every player's row as it was at a point in time
+
+            Parameters: at (int): unix time (optional, the latest rows by default)
+
+            Returns: ndarray of shape (len(players), row_length), players not seen yet are all -1
+
+        """
+
+        return _state(self._arrays(),at)
+
+    def gains(self,start:int,end:int = None,section:str = 'skills',column:str = 'xp'):
+
+        """
+        Computes how much one column of every entry in a section increased between start and end, for every player
+        Unranked values (-1) are counted as 0
+
+            Parameters:
+                        start (int): unix time of the beginning of the window
+                        end (int): unix time of the end of the window (optional, now by default)
+                        section (str): 'skills', 'activities' or 'bosses'
+                        column (str): 'xp', 'level', 'kc', 'value'...
+
+            Returns: (players, names, gains)
+                     gains is an int64 ndarray of shape (len(players), len(names))
+                     players that weren't tracked yet at start have a gain of 0
+
+        """
+
+        names, columns = column_indices(section,column)
+        arrays = self._arrays()
+        before = _state(arrays,start)[:,columns]
+        after = _state(arrays,end)[:,columns]
+        player, _, timestamp, _, n = arrays
+        tracked = np.zeros(n,dtype = bool)
+        tracked[player[timestamp <= start]] = True
+        gains = np.maximum(after,0) - np.maximum(before,0)
+        gains[~tracked] = 0
+        return list(self.players[:n]), names, gains
+
+    def rank_changes(self,start:int,end:int = None,section:str = 'skills'):
+
+        """
+        Computes how many places every player moved in each entry of a section between start and end
+        (positive values are improvements)
+
+            Returns: (players, names, changes)
+                     changes is a float64 ndarray of shape (len(players), len(names)),
+                     NaN where the player was unranked (or not tracked) at either end of the window
+
+        """
+
+        names, columns = column_indices(section,'rank')
+        arrays = self._arrays()
+        before = _state(arrays,start)[:,columns].astype(np.float64)
+        after = _state(arrays,end)[:,columns].astype(np.float64)
+        before[before < 0] = np.nan
+        after[after < 0] = np.nan
+        return list(self.players[:arrays[4]]), names, before - after
+
+    def top_gainers(self,name:str,k:int,start:int,end:int = None,section:str = 'skills',column:str = 'xp'):
+
+        """
+        Gets the k players with the biggest gain in one entry, i.e top_gainers('slayer', 10, start)
+
+            Returns: a list of ((username, account_type), gain), biggest gain first
+
+        """
+
+        players, names, gains = self.gains(start,end,section,column)
+        values = gains[:,names.index(name)]
+        order = np.argsort(-values,kind = 'stable')[:k]
+        return [(players[i],int(values[i])) for i in order.tolist()]
@@ -0,0 +1,263 @@
+"""
+Module implementing a compact binary sidecar for the item mapping
+
+item_data.json stays the source of truth. The sidecar stores the same records in a columnar layout
+that can be memory-mapped, so processes don't have to parse the JSON on startup and
+several processes loading the same file share the same pages.
+
+Layout (native byte order):
+
+    header      magic, byte order mark, item count, source mtime (ns), source size
+    int columns one int64 array per field in int_fields (missing values are stored as MISSING)
+    offsets     uint32 array of 3*count + 1 offsets into the string blob
+    present     uint8 array of 3*count flags, 0 where the item doesn't have the string field
+    strings     utf-8 blob containing every value of string_fields, field by field
+
+The source stamp is the JSON file's (mtime, size) from before the records were read, so a sidecar built from
+records that are older than the file on disk is always seen as stale.
+
+"""
+import mmap
+import os
+import struct
+from array import array
+
+magic = b'OSRSITM2'
+_header = struct.Struct('=8sIIqq')
+_bom = 0x01020304
+
+int_fields = ('id','members','lowalch','highalch','limit','value')
+string_fields = ('examine','icon','name')
+
+#same key order as the mapping route
+field_order = ('examine','id','members','lowalch','limit','value','highalch','icon','name')
+
+MISSING = -2**63
+
+def source_stamp(source):
+
+    """
+    Gets the (mtime in ns, size) stamp of the JSON file, from its path or an os.stat_result
+    Take it before reading the file and pass it to write_item_cache
+
+        Raises: OSError if the file can't be read
+
+    """
+
+    stat = source if isinstance(source,os.stat_result) else os.stat(source)
+    return stat.st_mtime_ns, stat.st_size
+
+def _pad(n):
+    return (8 - n % 8) % 8
+
+def write_item_cache(file,items,source,stamp = None):
+
+    """
+    Writes the items to a binary sidecar file
+    The file is written to a temporary file and then renamed, so existing readers keep seeing the old file
+
+        Parameters:
+                    file (str): path of the sidecar file
+                    items (list): item records (dicts) to write
+                    source (str): path of the JSON file the items were read from (used to detect a stale sidecar)
+                    stamp (tuple): source_stamp(source) taken before the items were read
+                    Default: the current stamp (only correct if nothing else can write the file in between)
+
+        Returns: bool (whether the sidecar was written, it isn't if the JSON file changed since stamp was taken)
+
+    """
+
+    try:
+        mtime, size = stamp or source_stamp(source)
+    except OSError as e:
+        print(e)
+        return False
+
+    count = len(items)
+    columns = []
+    for field in int_fields:
+        column = array('q')
+        for item in items:
+            v = item.get(field)
+            column.append(MISSING if v is None else int(v))
+        columns.append(column)
+
+    offsets = array('I',[0])
+    present = bytearray()
+    blob = bytearray()
+    for field in string_fields:
+        for item in items:
+            v = item.get(field)
+            if(v is not None):
+                blob += str(v).encode('utf-8')
+            present.append(v is not None)
+            offsets.append(len(blob))
+
+    tmp = '{}.{}.tmp'.format(file,os.getpid())
+    try:
+        with open(tmp,'wb') as f:
+            f.write(_header.pack(magic,_bom,count,mtime,size))
+            for column in columns:
+                f.write(column.tobytes())
+            f.write(offsets.tobytes())
+            f.write(b'\0' * _pad(offsets.itemsize * len(offsets)))
+            f.write(present)
+            f.write(b'\0' * _pad(len(present)))
+            f.write(blob)
+        #another process may have replaced the JSON file while the items were encoded, leave its sidecar alone
+        if(source_stamp(source) != (mtime,size)):
+            os.remove(tmp)
+            return False
+        os.replace(tmp,file)
+        return True
+    except OSError as e:
+        print(e)
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        return False
+
+class MappedItems:
+
+    """
+    A read-only sequence of item records backed by a memory-mapped sidecar file
+    Records are decoded into dicts the first time they are accessed and kept afterwards
+    (callers should copy a record before modifying it)
+
+    """
+
+    def __init__(self,file):
+
+        """
+        Parameters:
+                    file (str): path of the sidecar file
+
+        Raises:
+                    ValueError: if the file is not a valid sidecar
+
+        """
+
+        with open(file,'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(),0,access = mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        if(len(view) < _header.size):
+            raise ValueError('Truncated item cache')
+        file_magic, bom, count, self.source_mtime, self.source_size = _header.unpack_from(view)
+        if(file_magic != magic or bom != _bom):
+            raise ValueError('Invalid item cache')
+
+        self._count = count
+        self._decoded = [None] * count
+        offset = _header.size
+        self._columns = {}
+        for field in int_fields:
+            self._columns[field] = view[offset:offset + count*8].cast('q')
+            offset += count*8
+
+        n_offsets = len(string_fields)*count + 1
+        self._offsets = view[offset:offset + n_offsets*4].cast('I')
+        offset += n_offsets*4
+        offset += _pad(n_offsets*4)
+        self._present = view[offset:offset + n_offsets - 1]
+        offset += n_offsets - 1 + _pad(n_offsets - 1)
+        self._blob = view[offset:]
+        if(len(self._offsets) != n_offsets or len(self._present) != n_offsets - 1 or len(self._blob) < self._offsets[-1]):
+            raise ValueError('Truncated item cache')
+
+    def is_stale(self,source):
+
+        """
+        Checks whether the JSON file has changed since the sidecar was written
+        """
+
+        try:
+            return source_stamp(source) != (self.source_mtime,self.source_size)
+        except OSError:
+            return True
+
+    def column(self,field):
+
+        """
+        Gets a list of the values of an integer field for every item (None where the item doesn't have the field)
+        """
+
+        if(field not in self._columns):
+            raise KeyError(field)
+        values = self._columns[field].tolist()
+        if(field == 'members'):
+            return [None if v == MISSING else bool(v) for v in values]
+        return [None if v == MISSING else v for v in values]
+
+    def strings(self,field):
+
+        """
+        Gets a list of the values of a string field for every item (None where the item doesn't have the field)
+        """
+
+        start = string_fields.index(field)*self._count
+        offsets = self._offsets[start:start + self._count + 1].tolist()
+        present = self._present[start:start + self._count].tobytes()
+        data = self._blob[offsets[0]:offsets[-1]].tobytes()
+        base = offsets[0]
+        return [data[offsets[i] - base:offsets[i + 1] - base].decode('utf-8') if present[i] else None for i in range(self._count)]
+
+    def _string(self,field,i):
+        index = string_fields.index(field)*self._count + i
+        if(not self._present[index]):
+            return None
+        return self._blob[self._offsets[index]:self._offsets[index + 1]].tobytes().decode('utf-8')
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self,i):
+        if(isinstance(i,slice)):
+            return [self[j] for j in range(*i.indices(self._count))]
+        if(i < 0):
+            i += self._count
+        if(not 0 <= i < self._count):
+            raise IndexError('item index out of range')
+
+        item = self._decoded[i]
+        if(item is not None):
+            return item
+
+        item = {}
+        for field in field_order:
+            if(field in self._columns):
+                v = self._columns[field][i]
+                if(v != MISSING):
+                    item[field] = bool(v) if field == 'members' else v
+            else:
+                v = self._string(field,i)
+                if(v is not None):
+                    item[field] = v
+        self._decoded[i] = item
+        return item
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+def load_item_cache(file,source):
+
+    """
+    Loads the sidecar file if it exists and is up to date with the JSON file
+
+        Parameters:
+                    file (str): path of the sidecar file
+                    source (str): path of the JSON file
+
+        Returns: a MappedItems sequence or None if the sidecar is missing, invalid or stale
+
+    """
+
+    try:
+        items = MappedItems(file)
+    except (OSError,ValueError):
+        return None
+    if(items.is_stale(source)):
+        return None
+    return items
@@ -0,0 +1,641 @@
+"""
+Module providing an indexed, in-memory view of the item mapping
+
+The mapping is loaded once and indexed so that searches don't have to scan every item.
+Catalogs are never modified once published: updates build a new catalog (apply_changes) which a
+CatalogHandle swaps in atomically, so readers never wait and never see a partially updated catalog.
+
+Typical usage:
+
+catalog = ItemCatalog(get_item_data())
+catalog.search(name = 'battlestaff', members = True)
+
+"""
+import bisect
+import threading
+
+string_fields = ('name','examine','icon')
+numeric_fields = ('id','members','lowalch','highalch','limit','value')
+
+gram_size = 3
+
+def _grams(s,n):
+
+    """
+    Yields every distinct substring of length n contained in s
+    """
+
+    seen = set()
+    for i in range(len(s) - n + 1):
+        gram = s[i:i + n]
+        if(gram not in seen):
+            seen.add(gram)
+            yield gram
+
+def _is_number(v):
+    return isinstance(v,(int,float)) and v == v
+
+def _insert(positions,pos):
+    i = bisect.bisect_left(positions,pos)
+    if(i == len(positions) or positions[i] != pos):
+        positions.insert(i,pos)
+
+def _remove(positions,pos):
+    i = bisect.bisect_left(positions,pos)
+    if(i < len(positions) and positions[i] == pos):
+        del positions[i]
+
+class CatalogChanges:
+
+    """
+    The differences between two versions of the item mapping
+
+    Attributes:
+                added (list): ids of items that are only in the new mapping
+                removed (list): ids of items that are only in the old mapping
+                changed (list): ids of items whose record changed
+                records (dict): the new record of every added or changed item {id: item}
+                version (int): version of the item data after the changes were applied (set by osrsitems.update_item_data)
+
+    """
+
+    def __init__(self,added,removed,changed,records,version = None):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+        self.records = records
+        self.version = version
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return 'CatalogChanges(added={}, removed={}, changed={}, version={})'.format(self.added,self.removed,self.changed,self.version)
+
+    @property
+    def ids(self):
+
+        """
+        Every id that was added, removed or changed
+        """
+
+        return self.added + self.removed + self.changed
+
+def diff_items(old_items,new_items):
+
+    """
+    Compares two versions of the item mapping by id
+
+        Parameters:
+                    old_items (iterable): the current item records
+                    new_items (iterable): the new item records
+
+        Returns: a CatalogChanges object (ids are listed in the order they appear in the mappings)
+
+    """
+
+    old = {item.get('id'):item for item in old_items}
+    new = {item.get('id'):item for item in new_items}
+    added = [id for id in new if id not in old]
+    removed = [id for id in old if id not in new]
+    changed = [id for id, item in new.items() if id in old and old[id] != item]
+    return CatalogChanges(added,removed,changed,{id:new[id] for id in added + changed})
+
+class ItemCatalog:
+
+    """
+    An indexed collection of item mapping records
+
+    Indexes are built the first time a field is queried, so creating a catalog is cheap
+    and fields which are never searched never pay for an index.
+
+    Attributes:
+                items (sequence): Every item in the mapping, in the same order as the source data
+                ----
+                Indexes:
+                id: hash index (id -> positions)
+                name, examine, icon: exact index (lowered string -> positions)
+                                     and n-gram posting lists (1 to 3 character substrings -> positions)
+                members, lowalch, highalch, limit, value: sorted (value, position) index
+
+    """
+
+    def __init__(self,items):
+
+        """
+        Parameters:
+                    items (iterable): item records (dicts) as returned by the mapping route
+                    Read-only sequences (such as itemcache.MappedItems) are used as they are, anything else is copied into a tuple
+
+        """
+
+        if(isinstance(items,list) or not hasattr(items,'__getitem__')):
+            items = tuple(items)
+        self.items = items
+        self._by_id = None
+        self._lowered = {}
+        self._columns = {}
+        self._exact = {}
+        self._postings = {}
+        self._sorted = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def _values(self,field):
+
+        """
+        Gets the value of field for every item (None where the item doesn't have the field)
+        Columnar sequences are read a column at a time instead of item by item
+        """
+
+        if(hasattr(self.items,'column')):
+            return self.items.column(field)
+        return [item.get(field) for item in self.items]
+
+    def _column(self,field):
+
+        """
+        Gets the value of field for every item, kept for the next calls (used to check predicates item by item)
+        """
+
+        column = self._columns.get(field)
+        if(column is None):
+            column = self._columns[field] = self._values(field)
+        return column
+
+    def _lower(self,field):
+
+        """
+        Gets the lowered string value of field for every item (matches the old search behaviour, missing values become 'none')
+        """
+
+        lowered = self._lowered.get(field)
+        if(lowered is None):
+            if(hasattr(self.items,'strings')):
+                lowered = [str(s).lower() for s in self.items.strings(field)]
+            else:
+                lowered = [str(item.get(field)).lower() for item in self.items]
+            self._lowered[field] = lowered
+        return lowered
+
+    def _id_index(self):
+        if(self._by_id is None):
+            by_id = {}
+            for pos, id in enumerate(self._values('id')):
+                if(id is not None):
+                    by_id.setdefault(id,[]).append(pos)
+            self._by_id = by_id
+        return self._by_id
+
+    def _exact_index(self,field):
+        index = self._exact.get(field)
+        if(index is None):
+            index = {}
+            for pos, s in enumerate(self._lower(field)):
+                index.setdefault(s,[]).append(pos)
+            self._exact[field] = index
+        return index
+
+    def _posting_index(self,field):
+
+        """
+        Builds posting lists for every 1, 2 and 3 character substring of field
+        Positions in each posting list are in ascending order
+        """
+
+        index = self._postings.get(field)
+        if(index is None):
+            index = {}
+            for pos, s in enumerate(self._lower(field)):
+                for n in range(1,gram_size + 1):
+                    for gram in _grams(s,n):
+                        index.setdefault(gram,[]).append(pos)
+            self._postings[field] = index
+        return index
+
+    def _sorted_index(self,field):
+
+        """
+        Builds a sorted list of values for field along with the matching item positions
+        Items without the field (or with a non-numeric value) are left out of the index
+        """
+
+        index = self._sorted.get(field)
+        if(index is None):
+            pairs = sorted((v,pos) for pos, v in enumerate(self._values(field)) if _is_number(v))
+            index = ([v for v,_ in pairs],[p for _,p in pairs])
+            self._sorted[field] = index
+        return index
+
+    def _substring_candidates(self,field,query):
+
+        """
+        Gets the positions of every item whose field contains query (query must already be lowered)
+        """
+
+        index = self._posting_index(field)
+        if(len(query) <= gram_size):
+            return set(index.get(query,()))
+
+        postings = []
+        for gram in _grams(query,gram_size):
+            posting = index.get(gram)
+            if(not posting):
+                return set()
+            postings.append(posting)
+        postings.sort(key = len)
+
+        candidates = set(postings[0])
+        for posting in postings[1:]:
+            candidates.intersection_update(posting)
+            if(not candidates):
+                return candidates
+
+        lowered = self._lower(field)
+        return {pos for pos in candidates if query in lowered[pos]}
+
+    def _equal_candidates(self,field,value):
+
+        """
+        Gets the positions of every item where item[field] == value
+        """
+
+        if(field == 'id'):
+            try:
+                return set(self._id_index().get(value,()))
+            except TypeError:
+                return set()
+
+        if(field in numeric_fields and _is_number(value)):
+            values, positions = self._sorted_index(field)
+            lo = bisect.bisect_left(values,value)
+            hi = bisect.bisect_right(values,value)
+            return set(positions[lo:hi])
+
+        return {pos for pos, item in enumerate(self.items) if field in item and item[field] == value}
+
+    def index_fields(self):
+
+        """
+        Gets the fields of every index built so far
+
+            Returns: a dict {'id': bool, 'exact': [fields], 'postings': [fields], 'sorted': [fields]}
+
+        """
+
+        return {'id':self._by_id is not None,'exact':list(self._exact.keys()),'postings':list(self._postings.keys()),
+                'sorted':list(self._sorted.keys())}
+
+    def warm(self,fields:dict = None):
+
+        """
+        Builds indexes up front, so the first queries don't pay for them
+
+            Parameters:
+                        fields (dict): the indexes to build, as returned by index_fields()
+                        Default: every index
+
+            Returns: the catalog
+
+        """
+
+        if(fields is None):
+            fields = {'id':True,'exact':string_fields,'postings':string_fields,'sorted':numeric_fields[1:]}
+        if(fields.get('id')):
+            self._id_index()
+        for field in fields.get('exact',()):
+            self._exact_index(field)
+        for field in fields.get('postings',()):
+            self._posting_index(field)
+        for field in fields.get('sorted',()):
+            self._sorted_index(field)
+        return self
+
+    def get(self,id):
+
+        """
+        Gets the item with the specified id
+
+            Parameters:
+                        id (int): item id
+
+            Returns: the item record (dict) or None if there is no item with that id
+
+        """
+
+        positions = self._id_index().get(id)
+        if(not positions):
+            return None
+        return dict(self.items[positions[0]])
+
+    def lookup(self,field,value):
+
+        """
+        Gets every item whose field is exactly equal to value (case insensitive)
+
+            Parameters:
+                        field (str): one of 'name', 'examine' or 'icon'
+                        value (str): the value to match
+
+            Returns: a list of matching items
+
+        """
+
+        positions = self._exact_index(field).get(str(value).lower(),())
+        return [dict(self.items[pos]) for pos in positions]
+
+    def apply_changes(self,changes):
+
+        """
+        Creates a new catalog with changes applied, this catalog is left untouched
+        Changed items keep their position and added items are appended, so only the index entries of those items are updated
+        (removing items shifts positions, so in that case the new catalog is built from scratch)
+
+            Parameters: changes (CatalogChanges): the changes to apply, see diff_items()
+
+            Returns: a new ItemCatalog
+
+        """
+
+        if(changes.removed):
+            removed = set(changes.removed)
+            items = [changes.records.get(item.get('id'),item) for item in self.items if item.get('id') not in removed]
+            return ItemCatalog(items + [changes.records[id] for id in changes.added])
+
+        items = list(self.items)
+        by_id = self._id_index()
+        updates = []
+        for id in changes.changed:
+            pos = by_id[id][0]
+            updates.append((pos,items[pos],changes.records[id]))
+            items[pos] = changes.records[id]
+        for id in changes.added:
+            updates.append((len(items),None,changes.records[id]))
+            items.append(changes.records[id])
+
+        catalog = ItemCatalog(tuple(items))
+        catalog._by_id = dict(by_id)
+        for pos, old, new in updates:
+            if(old is not None and 'id' in old):
+                catalog._by_id[old['id']] = [p for p in catalog._by_id[old['id']] if p != pos]
+            if('id' in new):
+                catalog._by_id[new['id']] = sorted(catalog._by_id.get(new['id'],[]) + [pos])
+
+        #readers may add lazy indexes to this catalog meanwhile: iterate over copies of the index dicts
+        #(list() of a dict is taken in one step, a for loop over the dict itself could see it change size)
+        for field, lowered in list(self._lowered.items()):
+            lowered = list(lowered)
+            exact = self._exact.get(field)
+            exact = None if exact is None else dict(exact)
+            postings = self._postings.get(field)
+            postings = None if postings is None else dict(postings)
+            for pos, old, new in updates:
+                old_value = lowered[pos] if pos < len(lowered) else None
+                new_value = str(new.get(field)).lower()
+                if(old_value == new_value):
+                    continue
+                if(pos < len(lowered)):
+                    lowered[pos] = new_value
+                else:
+                    lowered.append(new_value)
+
+                if(exact is not None):
+                    if(old_value is not None):
+                        exact[old_value] = [p for p in exact[old_value] if p != pos]
+                    exact[new_value] = sorted(exact.get(new_value,[]) + [pos])
+
+                if(postings is not None):
+                    old_grams = set()
+                    new_grams = set()
+                    for n in range(1,gram_size + 1):
+                        if(old_value is not None):
+                            old_grams.update(_grams(old_value,n))
+                        new_grams.update(_grams(new_value,n))
+                    for gram in old_grams - new_grams:
+                        postings[gram] = list(postings[gram])
+                        _remove(postings[gram],pos)
+                    for gram in new_grams - old_grams:
+                        postings[gram] = list(postings.get(gram,()))
+                        _insert(postings[gram],pos)
+
+            catalog._lowered[field] = lowered
+            if(exact is not None):
+                catalog._exact[field] = exact
+            if(postings is not None):
+                catalog._postings[field] = postings
+
+        for field, (values, positions) in list(self._sorted.items()):
+            values = list(values)
+            positions = list(positions)
+            for pos, old, new in updates:
+                if(old is not None and _is_number(old.get(field))):
+                    i = bisect.bisect_left(values,old[field])
+                    while(positions[i] != pos):
+                        i += 1
+                    del values[i]
+                    del positions[i]
+                if(_is_number(new.get(field))):
+                    i = bisect.bisect_right(values,new[field])
+                    values.insert(i,new[field])
+                    positions.insert(i,pos)
+            catalog._sorted[field] = (values,positions)
+
+        return catalog
+
+    def search_positions(self,**query):
+
+        """
+        Gets the positions (in items) of every item matching the query
+        Accepts the same keyword arguments as search()
+
+            Returns: a sorted list of positions
+
+        """
+
+        candidate_sets = []
+        for field, value in query.items():
+            if(value is None):
+                continue
+            if(isinstance(value,str)):
+                value = value.lower()
+            if(field in string_fields):
+                if(not value):
+                    continue
+                candidate_sets.append(self._substring_candidates(field,value))
+            else:
+                candidate_sets.append(self._equal_candidates(field,value))
+
+        if(not candidate_sets):
+            return list(range(len(self.items)))
+
+        candidate_sets.sort(key = len)
+        candidates = candidate_sets[0]
+        for other in candidate_sets[1:]:
+            if(not candidates):
+                break
+            candidates = candidates.intersection(other)
+
+        return sorted(candidates)
+
+    def search(self,examine:str = None, id:int = None, members:bool = None,lowalch:int=None,highalch:int=None,
+               limit:int = None, value:int=None,icon:str=None,name:str=None):
+
+        """
+        Search the catalog for items matching the query
+        String fields (name, examine, icon) are matched as case insensitive substrings, every other field must be equal
+
+            Parameters: see osrsitems.search_item_data
+
+            Returns: a list of items matching the search query, in mapping order
+
+        """
+
+        positions = self.search_positions(examine = examine, id = id, members = members, lowalch = lowalch,
+                                          highalch = highalch, limit = limit, value = value, icon = icon, name = name)
+        return [dict(self.items[pos]) for pos in positions]
+
+class CatalogHandle:
+
+    """
+    A shared reference to the current ItemCatalog, updated with read-copy-update semantics
+
+    Readers take the current snapshot (handle.current) without locking and keep using it for as long as they need;
+    writers build a new catalog from the current one and publish it, which swaps the reference atomically.
+    A replaced snapshot is freed once the last reader holding it is done with it.
+
+    Attributes:
+                version (int): incremented every time a snapshot is published or the handle is invalidated
+
+    """
+
+    def __init__(self,load):
+
+        """
+        Parameters:
+                    load: a function returning the item records, called to build the first snapshot
+
+        """
+
+        self._load = load
+        self._snapshot = None
+        self._lock = threading.RLock()
+        self._listeners = []
+        self._stop = None
+        self.version = 0
+
+    @property
+    def current(self):
+
+        """
+        The current catalog snapshot (loaded the first time it is needed)
+        """
+
+        snapshot = self._snapshot
+        if(snapshot is None):
+            with self._lock:
+                snapshot = self._snapshot
+                if(snapshot is None):
+                    snapshot = self._snapshot = ItemCatalog(self._load())
+        return snapshot
+
+    def loaded(self):
+        return self._snapshot is not None
+
+    def publish(self,catalog:ItemCatalog):
+
+        """
+        Makes catalog the current snapshot
+        The indexes built on the previous snapshot are built on the new one first,
+        so readers switching to it don't pay for them
+
+            Returns: the previous snapshot (or None)
+
+        """
+
+        with self._lock:
+            previous = self._snapshot
+            if(previous is not None):
+                catalog.warm(previous.index_fields())
+            self._snapshot = catalog
+            self.version += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(catalog)
+        return previous
+
+    def update(self,func):
+
+        """
+        Builds and publishes a new snapshot from the current one (updates are serialized, reads are not blocked)
+
+            Parameters:
+                        func: a function taking the current ItemCatalog and returning (new catalog or None, result)
+                        nothing is published if the new catalog is None
+
+            Returns: result
+
+        """
+
+        with self._lock:
+            catalog, result = func(self.current)
+            if(catalog is not None):
+                self.publish(catalog)
+            return result
+
+    def invalidate(self):
+
+        """
+        Drops the current snapshot, the next read loads a new one
+        """
+
+        with self._lock:
+            self._snapshot = None
+            self.version += 1
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(None)
+
+    def subscribe(self,listener):
+
+        """
+        Calls listener with every newly published catalog (or None when the handle is invalidated)
+        """
+
+        self._listeners.append(listener)
+
+    def start(self,refresh,interval:float):
+
+        """
+        Calls refresh every interval seconds in a background thread (i.e osrsitems.update_item_data)
+        Exceptions raised by refresh are printed and the thread keeps running
+
+            Returns: the handle
+
+        """
+
+        self.stop()
+        stop = self._stop = threading.Event()
+
+        def run():
+            while(not stop.wait(interval)):
+                try:
+                    refresh()
+                except Exception as e:
+                    print(e)
+
+        threading.Thread(target = run,name = 'osrsutils-catalog-refresh',daemon = True).start()
+        return self
+
+    def stop(self):
+
+        """
+        Stops the background refresh
+        """
+
+        if(self._stop is not None):
+            self._stop.set()
+            self._stop = None
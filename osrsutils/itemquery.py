@@ -0,0 +1,411 @@
+"""
+Module implementing compiled queries over the item catalog
+
+A query is a conjunction of predicates on the mapping fields: comparisons and ranges on the numeric fields
+(id, members, lowalch, highalch, limit, value) and substring or exact matches on the string fields (name, examine, icon).
+Predicates are parsed and checked once when the query is compiled. When it runs, every predicate estimates its
+number of matches from the catalog indexes (a bisection of the sorted index for numeric fields, the posting list
+sizes for strings) and they are applied cheapest first: the first one yields the candidate positions, the others
+either intersect their own candidates or, when that would be larger, are checked on the remaining candidates only.
+Sorted results are taken with a heap (only offset + k items are ordered), not by sorting every match.
+
+Typical usage:
+
+query = Query(members = True, highalch__gt = 10000, limit__ge = 100).order_by('-value')
+query = compile_query('members and highalch > 10k and limit >= 100', order_by = '-value')
+page = query.run(get_catalog(), k = 20)              # QueryPage(items, total, offset)
+page = query.run(get_catalog(), k = 20, offset = 20)  # the next page
+
+"""
+import bisect
+import heapq
+import operator
+import re
+from collections import namedtuple
+
+from .itemcatalog import ItemCatalog, gram_size, numeric_fields, string_fields, _grams, _is_number
+
+QueryPage = namedtuple('QueryPage',['items','total','offset'])
+QueryPage.__doc__ = """
+A page of query results: the items (dicts), the total number of matching items and the offset of the first item
+"""
+
+Predicate = namedtuple('Predicate',['field','op','value'])
+Predicate.__doc__ = """
+A compiled condition on an item field (string values are lowered, between values are a (low, high) tuple)
+"""
+
+numeric_ops = ('eq','ne','lt','le','gt','ge','between','in')
+string_ops = ('eq','contains')
+
+_compare = {'eq':operator.eq,'ne':operator.ne,'lt':operator.lt,'le':operator.le,'gt':operator.gt,'ge':operator.ge}
+
+#expression operators
+_symbols = {'=':'eq','==':'eq','!=':'ne','<':'lt','<=':'le','>':'gt','>=':'ge','~':'contains'}
+
+class QueryError(ValueError):
+    """
+    An exception raised when a query uses an unknown field or operator, or an expression can't be parsed
+    """
+    pass
+
+def _number(value):
+
+    """
+    Converts a numeric predicate value, accepting strings such as '10k' (see osrsitems.convert)
+    """
+
+    if(isinstance(value,bool) or _is_number(value)):
+        return value
+    try:
+        from .osrsitems import convert
+        return convert(value)
+    except (TypeError,ValueError):
+        raise QueryError('Expected a number, got {!r}'.format(value))
+
+def predicate(field:str,op:str,value):
+
+    """
+    Checks and normalizes a predicate
+
+        Parameters:
+                    field (str): a mapping field
+                    op (str): eq, ne, lt, le, gt, ge, between, in (numeric fields) or eq, contains (string fields)
+                    value: the value compared with (a (low, high) pair for between, an iterable for in)
+
+        Returns: a Predicate
+
+        Raises: QueryError
+
+    """
+
+    if(field in string_fields):
+        if(op not in string_ops):
+            raise QueryError('{} is a string field, expected one of {}'.format(field,', '.join(string_ops)))
+        return Predicate(field,op,str(value).lower())
+    if(field not in numeric_fields):
+        raise QueryError('Unknown field {!r}'.format(field))
+    if(op not in numeric_ops):
+        raise QueryError('{} is a numeric field, expected one of {}'.format(field,', '.join(numeric_ops)))
+    if(op == 'between'):
+        try:
+            low, high = value
+        except (TypeError,ValueError):
+            raise QueryError('between expects a (low, high) pair, got {!r}'.format(value))
+        return Predicate(field,op,(_number(low),_number(high)))
+    if(op == 'in'):
+        return Predicate(field,op,tuple(sorted(set(_number(v) for v in value))))
+    return Predicate(field,op,_number(value))
+
+def _sorted_range(values,p):
+
+    """
+    Gets the slices of a sorted index matching a numeric predicate
+
+        Returns: a list of (start, stop)
+
+    """
+
+    if(p.op == 'in'):
+        return [(bisect.bisect_left(values,v),bisect.bisect_right(values,v)) for v in p.value]
+    if(p.op == 'between'):
+        return [(bisect.bisect_left(values,p.value[0]),bisect.bisect_right(values,p.value[1]))]
+    if(p.op == 'ne'):
+        return [(0,bisect.bisect_left(values,p.value)),(bisect.bisect_right(values,p.value),len(values))]
+    start = bisect.bisect_left(values,p.value) if p.op in ('eq','ge') else bisect.bisect_right(values,p.value) if p.op == 'gt' else 0
+    stop = bisect.bisect_right(values,p.value) if p.op in ('eq','le') else bisect.bisect_left(values,p.value) if p.op == 'lt' else len(values)
+    return [(start,stop)]
+
+def _estimate(catalog:ItemCatalog,p):
+
+    """
+    Gets the number of candidates a predicate yields (exact for numeric fields, an upper bound for substrings)
+    """
+
+    if(p.field in numeric_fields):
+        values, _ = catalog._sorted_index(p.field)
+        return sum(stop - start for start, stop in _sorted_range(values,p))
+    if(p.op == 'eq'):
+        return len(catalog._exact_index(p.field).get(p.value,()))
+    if(not p.value):
+        return len(catalog)
+    index = catalog._posting_index(p.field)
+    if(len(p.value) <= gram_size):
+        return len(index.get(p.value,()))
+    return min(len(index.get(gram,())) for gram in _grams(p.value,gram_size))
+
+def _candidates(catalog:ItemCatalog,p):
+
+    """
+    Gets the positions of every item matching a predicate, from the indexes
+    """
+
+    if(p.field in numeric_fields):
+        values, positions = catalog._sorted_index(p.field)
+        candidates = set()
+        for start, stop in _sorted_range(values,p):
+            candidates.update(positions[start:stop])
+        return candidates
+    if(p.op == 'eq'):
+        return set(catalog._exact_index(p.field).get(p.value,()))
+    if(not p.value):
+        return set(range(len(catalog)))
+    return catalog._substring_candidates(p.field,p.value)
+
+def _matcher(catalog:ItemCatalog,p):
+
+    """
+    Gets a function checking a predicate on a single position
+    """
+
+    if(p.field in string_fields):
+        lowered = catalog._lower(p.field)
+        if(p.op == 'eq'):
+            return lambda pos: lowered[pos] == p.value
+        return lambda pos: p.value in lowered[pos]
+
+    column = catalog._column(p.field)
+    if(p.op == 'in'):
+        values = set(p.value)
+        return lambda pos: _is_number(column[pos]) and column[pos] in values
+    if(p.op == 'between'):
+        low, high = p.value
+        return lambda pos: _is_number(column[pos]) and low <= column[pos] <= high
+    compare = _compare[p.op]
+    return lambda pos: _is_number(column[pos]) and compare(column[pos],p.value)
+
+class Query:
+
+    """
+    A compiled item query
+
+    Keyword filters are written field__op = value (field = value is the same as field__eq = value,
+    except for the string fields where it means field__contains, as in search_item_data).
+
+    Attributes:
+                predicates (list): the Predicates every matching item satisfies
+                order (tuple): (field, descending) results are sorted by, or None for mapping order
+
+    """
+
+    def __init__(self,expression:str = None,**filters):
+
+        """
+        Parameters:
+                    expression (str): an expression parsed with parse_expression (optional)
+                    filters: keyword filters, i.e highalch__gt = 10000 (None values are ignored)
+
+        Raises: QueryError
+
+        """
+
+        self.predicates = parse_expression(expression) if expression else []
+        self.order = None
+        for key, value in filters.items():
+            if(value is None):
+                continue
+            field, _, op = key.partition('__')
+            self.predicates.append(predicate(field,op or ('contains' if field in string_fields else 'eq'),value))
+
+    def __repr__(self):
+        return 'Query(predicates={}, order={})'.format(self.predicates,self.order)
+
+    def where(self,field:str,op:str,value):
+
+        """
+        Adds a predicate, i.e where('limit', 'ge', 100)
+
+            Returns: the query
+
+        """
+
+        self.predicates.append(predicate(field,op,value))
+        return self
+
+    def order_by(self,field:str):
+
+        """
+        Sorts the results by a field, descending if prefixed by '-' (i.e '-value')
+        Items without the field come last, ties are kept in mapping order
+
+            Returns: the query
+
+        """
+
+        descending = field.startswith('-')
+        field = field.lstrip('-+')
+        if(field not in numeric_fields and field not in string_fields):
+            raise QueryError('Unknown field {!r}'.format(field))
+        self.order = (field,descending)
+        return self
+
+    def positions(self,catalog:ItemCatalog):
+
+        """
+        Gets the positions of every matching item, applying the predicates cheapest first
+
+            Returns: a set of positions (or a range if there are no predicates)
+
+        """
+
+        if(not self.predicates):
+            return range(len(catalog))
+
+        plan = sorted(((_estimate(catalog,p),p) for p in self.predicates),key = lambda e: e[0])
+        candidates = _candidates(catalog,plan[0][1])
+        for estimate, p in plan[1:]:
+            if(not candidates):
+                break
+            if(estimate <= len(candidates)):
+                candidates.intersection_update(_candidates(catalog,p))
+            else:
+                matches = _matcher(catalog,p)
+                candidates = {pos for pos in candidates if matches(pos)}
+        return candidates
+
+    def _top(self,catalog,positions,n):
+
+        """
+        Gets the first n positions in the query's order
+        """
+
+        if(self.order is None):
+            if(isinstance(positions,range)):
+                return list(positions[:n])
+            return heapq.nsmallest(n,positions)
+
+        field, descending = self.order
+        if(field in string_fields):
+            values = catalog._lower(field)
+            present = lambda v: v != 'none'
+        else:
+            values = catalog._column(field)
+            present = _is_number
+        if(descending):
+            return heapq.nlargest(n,positions,key = lambda pos: (True,values[pos],-pos) if present(values[pos]) else (False,0,-pos))
+        return heapq.nsmallest(n,positions,key = lambda pos: (False,values[pos],pos) if present(values[pos]) else (True,0,pos))
+
+    def run(self,catalog:ItemCatalog,k:int = None,offset:int = 0):
+
+        """
+        Runs the query
+
+            Parameters:
+                        catalog (ItemCatalog): the items to query
+                        k (int): the maximum number of items to return (optional, every match by default)
+                        offset (int): the number of matching items to skip (for pagination)
+
+            Returns: a QueryPage
+
+        """
+
+        positions = self.positions(catalog)
+        total = len(positions)
+        n = total if k is None else min(total,offset + k)
+        top = self._top(catalog,positions,n)[offset:]
+        return QueryPage([dict(catalog.items[pos]) for pos in top],total,offset)
+
+_token = re.compile(r'''\s*(?:(?P<string>"[^"]*"|'[^']*')|(?P<op><=|>=|!=|==|=|<|>|~)|(?P<number>[+-]?\d+(?:\.\d+)?[kmb]?(?![a-z_]))|(?P<word>[a-z_][a-z_0-9]*)|(?P<punct>[(),]))''',re.IGNORECASE)
+
+def _tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.rstrip()
+    while(pos < len(expression)):
+        match = _token.match(expression,pos)
+        if(match is None):
+            raise QueryError('Unexpected {!r} at position {}'.format(expression[pos:],pos))
+        kind = match.lastgroup
+        text = match.group(kind)
+        if(kind == 'string'):
+            text = text[1:-1]
+        elif(kind == 'word'):
+            text = text.lower()
+            if(text in ('true','false')):
+                kind, text = 'value', text == 'true'
+        tokens.append((kind,text))
+        pos = match.end()
+    return tokens
+
+def parse_expression(expression:str):
+
+    """
+    Parses a query expression: conditions joined by 'and', i.e
+
+        members and highalch > 10k and limit >= 100 and name ~ "rune"
+        not members and value between 1k and 5k and id in (561, 554, 555)
+
+    Conditions are field op value (op is =, !=, <, <=, >, >= or ~ for contains), field between low and high,
+    field in (values), or a field alone (true) or preceded by not (false), for members.
+    Numbers can use the k, m and b suffixes, strings are quoted unless they are a single word.
+
+        Returns: a list of Predicates
+
+        Raises: QueryError
+
+    """
+
+    tokens = _tokenize(expression)
+    pos = 0
+
+    def take(kind = None,text = None):
+        nonlocal pos
+        if(pos >= len(tokens)):
+            raise QueryError('Unexpected end of expression {!r}'.format(expression))
+        token = tokens[pos]
+        if((kind is not None and token[0] != kind) or (text is not None and token[1] != text)):
+            raise QueryError('Unexpected {!r} in expression {!r}'.format(token[1],expression))
+        pos += 1
+        return token[1]
+
+    def peek(text):
+        return pos < len(tokens) and tokens[pos][0] == 'word' and tokens[pos][1] == text
+
+    def value():
+        kind, text = tokens[pos] if pos < len(tokens) else (None,None)
+        if(kind not in ('string','number','value','word')):
+            raise QueryError('Expected a value in expression {!r}'.format(expression))
+        take()
+        return text
+
+    predicates = []
+    while(True):
+        negated = peek('not')
+        if(negated):
+            take()
+        field = take('word')
+        if(negated or pos >= len(tokens) or peek('and')):
+            predicates.append(predicate(field,'eq',not negated))
+        elif(peek('between')):
+            take()
+            low = value()
+            take('word','and')
+            predicates.append(predicate(field,'between',(low,value())))
+        elif(peek('in')):
+            take()
+            take('punct','(')
+            values = [value()]
+            while(tokens[pos:pos + 1] == [('punct',',')]):
+                take()
+                values.append(value())
+            take('punct',')')
+            predicates.append(predicate(field,'in',values))
+        else:
+            predicates.append(predicate(field,_symbols[take('op')],value()))
+        if(pos >= len(tokens)):
+            return predicates
+        take('word','and')
+
+def compile_query(expression:str = None,order_by:str = None,**filters):
+
+    """
+    Compiles a query from an expression (see parse_expression) and/or keyword filters (see Query)
+
+        Returns: a Query
+
+    """
+
+    query = Query(expression,**filters)
+    if(order_by):
+        query.order_by(order_by)
+    return query
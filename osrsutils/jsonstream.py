@@ -0,0 +1,145 @@
+"""
+Module implementing incremental parsers for the large prices api responses
+
+The response is read in chunks and records are yielded as soon as they are complete,
+so memory use stays flat and callers can start working before the download finishes.
+
+Supported shapes:
+
+    /latest, /5m, /1h   {"data":{"2":{...},"6":{...}},...}   -> iter_data_items()
+    /mapping            [{...},{...}]                        -> iter_array_items()
+
+"""
+import codecs
+import json
+
+_decoder = json.JSONDecoder()
+_whitespace = ' \t\n\r'
+
+class _Buffer:
+
+    """
+    Text read so far from an iterable of chunks (bytes or str), consumed from the front
+    """
+
+    def __init__(self,chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self):
+
+        """
+        Reads another chunk, returns False once the input is exhausted
+        """
+
+        if(self.eof):
+            return False
+        for chunk in self._chunks:
+            if(isinstance(chunk,bytes)):
+                chunk = self._utf8.decode(chunk)
+            if(chunk):
+                self.text = self.text[self.pos:] + chunk
+                self.pos = 0
+                return True
+        self.eof = True
+        tail = self._utf8.decode(b'',final = True)
+        if(tail):
+            self.text = self.text[self.pos:] + tail
+            self.pos = 0
+            return True
+        return False
+
+    def peek(self):
+
+        """
+        Skips whitespace and returns the next character ('' at the end of the input)
+        """
+
+        while(True):
+            while(self.pos < len(self.text) and self.text[self.pos] in _whitespace):
+                self.pos += 1
+            if(self.pos < len(self.text)):
+                return self.text[self.pos]
+            if(not self.fill()):
+                return ''
+
+    def expect(self,chars):
+        c = self.peek()
+        if(c not in chars or not c):
+            raise ValueError('Expected {!r} at position {} but found {!r}'.format(chars,self.pos,c))
+        self.pos += 1
+        return c
+
+    def value(self):
+
+        """
+        Decodes the next complete JSON value, reading more chunks until it is complete
+        """
+
+        self.peek()
+        while(True):
+            try:
+                value, end = _decoder.raw_decode(self.text,self.pos)
+            except json.JSONDecodeError:
+                if(not self.fill()):
+                    raise
+                continue
+            #a number (or literal) cut off by the end of the buffer may continue in the next chunk
+            if(not isinstance(value,(dict,list,str)) and (end == len(self.text) or self.text[end] not in ',:]}' + _whitespace)):
+                if(self.fill()):
+                    continue
+            self.pos = end
+            return value
+
+def iter_array_items(chunks):
+
+    """
+    Yields the elements of a top level JSON array one at a time
+
+        Parameters: chunks (iterable): the response body as bytes or str chunks
+
+    """
+
+    buffer = _Buffer(chunks)
+    buffer.expect('[')
+    if(buffer.peek() == ']'):
+        return
+    while(True):
+        yield buffer.value()
+        if(buffer.expect(',]') == ']'):
+            return
+
+def _iter_object(buffer):
+    buffer.expect('{')
+    if(buffer.peek() == '}'):
+        buffer.pos += 1
+        return
+    while(True):
+        key = buffer.value()
+        buffer.expect(':')
+        yield key
+        if(buffer.expect(',}') == '}'):
+            return
+
+def iter_data_items(chunks,key:str = 'data'):
+
+    """
+    Yields the (key, value) pairs of the object stored under key in a top level JSON object
+    i.e ('2', {'high':..,'low':..}) for every item of a /latest response
+
+        Parameters:
+                    chunks (iterable): the response body as bytes or str chunks
+                    key (str): the top level key holding the object to stream
+
+    """
+
+    buffer = _Buffer(chunks)
+    for top_key in _iter_object(buffer):
+        if(top_key != key or buffer.peek() != '{'):
+            buffer.value()
+            continue
+        for item_key in _iter_object(buffer):
+            yield item_key, buffer.value()
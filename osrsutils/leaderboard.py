@@ -0,0 +1,242 @@
+"""
+Module implementing leaderboards over locally fetched hiscores
+
+Every tracked player's hiscores are kept as an int row (see osrshiscores.to_row). For each entry that gets
+queried (i.e slayer xp or zulrah kc) a sorted index of (-value, player) keys is built once and then updated
+in place when a player is refreshed, so top-k, rank and percentile queries are bisections instead of sorts.
+Unranked values (-1) are left out of the indexes.
+
+Typical usage:
+
+board = Leaderboard()
+for result in fetch_hiscores(clan, compact = True):
+    if(result.error is None):
+        board.update(result.hiscores)
+
+board.top('slayer', 50)                       # [((username, account_type), xp), ...]
+board.percentile('Foo', 'N', 'zulrah')        # percentage of tracked players with at most Foo's kc
+
+"""
+import bisect
+import threading
+from array import array
+
+from .osrshiscores import player_key, row_offsets, row_length, sections, skill_columns, to_row
+
+def _build_entries():
+
+    """
+    Maps every entry name to (offset of its first column, its columns, the column ranked by default)
+    """
+
+    default_columns = {'skills':'xp','activities':'value','bosses':'kc'}
+    entries = {'overall':(0,skill_columns,'xp')}
+    for section, (names, columns) in sections.items():
+        for name in names:
+            entries[name] = (row_offsets[(section,name)],columns,default_columns[section])
+    return entries
+
+entries = _build_entries()
+
+def column_position(name:str,column:str = None):
+
+    """
+    Gets the row position of an entry's column, i.e column_position('slayer') or column_position('zulrah','rank')
+
+        Parameters:
+                    name (str): 'overall' or any skill, activity or boss name
+                    column (str): the column (optional, xp for skills, value for activities and kc for bosses)
+
+        Returns: int
+
+    """
+
+    if(name not in entries):
+        raise KeyError('Unknown hiscores entry {!r}'.format(name))
+    offset, columns, default = entries[name]
+    return offset + columns.index(column or default)
+
+class Leaderboard:
+
+    """
+    Rankings of a set of tracked players
+
+    Attributes:
+                players (list): (username, account_type) of every tracked player (None for removed players)
+
+    """
+
+    def __init__(self):
+        self.players = []
+        self._ids = {}
+        self._rows = []
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self,player):
+        return player_key(*player) in self._ids
+
+    def update(self,hiscores):
+
+        """
+        Adds or refreshes a player from a PlayerHiscores or CompactHiscores object
+        """
+
+        self.update_row(hiscores.username,hiscores.account_type,to_row(hiscores))
+
+    def update_row(self,username:str,account_type:str,row):
+
+        """
+        Adds or refreshes a player from a row in the osrshiscores row layout
+        Only the built indexes whose value changed are touched
+        """
+
+        row = array('q',row)
+        if(len(row) != row_length):
+            raise ValueError('Expected a row of length {}, got {}'.format(row_length,len(row)))
+        key = player_key(username,account_type)
+        with self._lock:
+            player = self._ids.get(key)
+            if(player is None):
+                player = self._ids[key] = len(self.players)
+                self.players.append((username.replace('%20',' '),account_type.upper()))
+                self._rows.append(array('q',[-1]) * row_length)
+            old = self._rows[player]
+            for position, index in self._indexes.items():
+                if(old[position] != row[position]):
+                    if(old[position] >= 0):
+                        del index[bisect.bisect_left(index,(-old[position],player))]
+                    if(row[position] >= 0):
+                        bisect.insort(index,(-row[position],player))
+            self._rows[player] = row
+
+    def remove(self,username:str,account_type:str = 'N'):
+
+        """
+        Stops tracking a player
+
+            Returns: whether the player was tracked
+
+        """
+
+        with self._lock:
+            player = self._ids.pop(player_key(username,account_type),None)
+            if(player is None):
+                return False
+            row = self._rows[player]
+            for position, index in self._indexes.items():
+                if(row[position] >= 0):
+                    del index[bisect.bisect_left(index,(-row[position],player))]
+            self.players[player] = None
+            self._rows[player] = None
+            return True
+
+    def _index(self,position):
+
+        """
+        Gets the sorted (-value, player) index of a row position, building it the first time
+        Must be called with the lock held
+        """
+
+        index = self._indexes.get(position)
+        if(index is None):
+            index = sorted((-row[position],player) for player, row in enumerate(self._rows) if row is not None and row[position] >= 0)
+            self._indexes[position] = index
+        return index
+
+    def _value(self,username,account_type,position):
+        player = self._ids.get(player_key(username,account_type))
+        if(player is None):
+            return None
+        value = self._rows[player][position]
+        return value if value >= 0 else None
+
+    def value(self,username:str,account_type:str,name:str,column:str = None):
+
+        """
+        Gets a tracked player's value, i.e value('Foo', 'N', 'slayer')
+
+            Returns: int or None if the player isn't tracked or is unranked
+
+        """
+
+        with self._lock:
+            return self._value(username,account_type,column_position(name,column))
+
+    def count(self,name:str,column:str = None):
+
+        """
+        Gets the number of tracked players ranked in an entry
+        """
+
+        with self._lock:
+            return len(self._index(column_position(name,column)))
+
+    def top(self,name:str,k:int = 10,column:str = None,offset:int = 0):
+
+        """
+        Gets the players with the highest values in an entry (ties are ordered by when the player was first tracked)
+
+            Parameters:
+                        name (str): 'overall' or any skill, activity or boss name
+                        k (int): the number of players to return
+                        column (str): the column to rank by (optional, see column_position)
+                        offset (int): the number of players to skip (for pagination)
+
+            Returns: a list of ((username, account_type), value), highest first
+
+        """
+
+        with self._lock:
+            index = self._index(column_position(name,column))
+            return [(self.players[player],-value) for value, player in index[offset:offset + k]]
+
+    def rank_of(self,username:str,account_type:str,name:str,column:str = None):
+
+        """
+        Gets a player's rank among the tracked players (1 for the highest value, players with equal values share a rank)
+
+            Returns: int or None if the player isn't tracked or is unranked
+
+        """
+
+        position = column_position(name,column)
+        with self._lock:
+            value = self._value(username,account_type,position)
+            if(value is None):
+                return None
+            return bisect.bisect_left(self._index(position),(-value,)) + 1
+
+    def percentile(self,username:str,account_type:str,name:str,column:str = None):
+
+        """
+        Gets the percentage of tracked (ranked) players whose value is at most the player's value
+        (100 for the highest value)
+
+            Returns: float or None if the player isn't tracked or is unranked
+
+        """
+
+        position = column_position(name,column)
+        with self._lock:
+            value = self._value(username,account_type,position)
+            if(value is None):
+                return None
+            index = self._index(position)
+            higher = bisect.bisect_left(index,(-value,))
+            return 100 * (len(index) - higher) / len(index)
+
+    def range(self,name:str,low:int = None,high:int = None,column:str = None):
+
+        """
+        Gets the players whose value is between low and high (inclusive), highest first
+        """
+
+        with self._lock:
+            index = self._index(column_position(name,column))
+            start = 0 if high is None else bisect.bisect_left(index,(-high,))
+            stop = len(index) if low is None else bisect.bisect_left(index,(-low + 1,))
+            return [(self.players[player],-value) for value, player in index[start:stop]]
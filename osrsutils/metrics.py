@@ -0,0 +1,201 @@
+"""
+Module implementing optional instrumentation for osrsutils
+
+When enabled, every HTTP request records its latency, bytes, status code and retries per route,
+rate limiter waits and response cache hits are counted, and local hot paths (catalog load and search) are timed.
+Measurements go to the registry (see snapshot()) and to any hooks added with add_hook().
+When disabled (the default) call sites only check the enabled flag.
+
+Typical usage:
+
+metrics.enable()
+...
+print(metrics.snapshot())
+
+metrics.add_hook(lambda kind, name, value, labels: statsd.timing(name, value) if kind == 'histogram' else None)
+
+"""
+import bisect
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+enabled = False
+
+#upper bounds of the histogram buckets (seconds for timings)
+default_buckets = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+class Histogram:
+
+    """
+    A histogram with fixed bucket bounds
+
+    Attributes:
+                buckets (tuple): upper bounds of the buckets, values above the last bound go to an extra +Inf bucket
+                counts (list): number of values in each bucket
+                count, sum, min, max: summary of every observed value
+
+    """
+
+    __slots__ = ('buckets','counts','count','sum','min','max')
+
+    def __init__(self,buckets = default_buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0
+        self.min = None
+        self.max = None
+
+    def observe(self,value):
+        self.counts[bisect.bisect_left(self.buckets,value)] += 1
+        self.count += 1
+        self.sum += value
+        if(self.min is None or value < self.min):
+            self.min = value
+        if(self.max is None or value > self.max):
+            self.max = value
+
+    def to_dict(self):
+        return {'count':self.count,'sum':self.sum,'min':self.min,'max':self.max,
+                'buckets':[[bound,count] for bound, count in zip(self.buckets + ('+Inf',),self.counts)]}
+
+def _key(name,labels):
+    return (name,tuple(sorted(labels.items())) if labels else ())
+
+class MetricsRegistry:
+
+    """
+    A thread-safe store of counters and histograms, keyed by name and labels
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def increment(self,name:str,value = 1,labels:dict = None):
+        key = _key(name,labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key,0) + value
+
+    def observe(self,name:str,value,labels:dict = None):
+        key = _key(name,labels)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if(histogram is None):
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self):
+
+        """
+        Gets every metric as plain data (ready to be serialised or exported)
+
+            Returns: {'counters': [{'name','labels','value'}...],
+                      'histograms': [{'name','labels','count','sum','min','max','buckets':[[upper bound,count]...]}...]}
+
+        """
+
+        with self._lock:
+            counters = [{'name':name,'labels':dict(labels),'value':value} for (name, labels), value in self._counters.items()]
+            histograms = [dict(histogram.to_dict(),name = name,labels = dict(labels)) for (name, labels), histogram in self._histograms.items()]
+        return {'counters':counters,'histograms':histograms}
+
+registry = MetricsRegistry()
+_hooks = []
+
+def enable():
+    global enabled
+    enabled = True
+
+def disable():
+    global enabled
+    enabled = False
+
+def add_hook(hook):
+
+    """
+    Adds a function called for every measurement while metrics are enabled
+
+        Parameters:
+                    hook: a function taking (kind, name, value, labels)
+                    kind is 'counter' or 'histogram', labels is a dict
+
+    """
+
+    _hooks.append(hook)
+
+def remove_hook(hook):
+    _hooks.remove(hook)
+
+def snapshot():
+    return registry.snapshot()
+
+def reset():
+    registry.reset()
+
+def increment(name:str,value = 1,**labels):
+
+    """
+    Increments a counter (does nothing while metrics are disabled)
+    """
+
+    if(not enabled):
+        return
+    registry.increment(name,value,labels)
+    for hook in _hooks:
+        hook('counter',name,value,labels)
+
+def observe(name:str,value,**labels):
+
+    """
+    Records a value in a histogram (does nothing while metrics are disabled)
+    """
+
+    if(not enabled):
+        return
+    registry.observe(name,value,labels)
+    for hook in _hooks:
+        hook('histogram',name,value,labels)
+
+#returned by timer() while metrics are disabled, it holds no state so every caller shares it
+_no_timer = nullcontext()
+
+def timer(name:str,**labels):
+
+    """
+    Times the body of a with block into a histogram (in seconds)
+    While metrics are disabled a shared no-op context manager is returned, no generator is created
+    """
+
+    if(not enabled):
+        return _no_timer
+    return _timer(name,labels)
+
+@contextmanager
+def _timer(name,labels):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name,time.perf_counter() - start,**labels)
+
+def record_request(route:str,seconds:float,status,size:int = None,retries:int = 0):
+
+    """
+    Records an HTTP request: latency histogram, status code counter, bytes received and retries
+    status is the HTTP status code, or the exception name if the request failed
+    """
+
+    observe('http.latency',seconds,route = route)
+    increment('http.responses',route = route,status = str(status))
+    if(size):
+        increment('http.bytes',size,route = route)
+    if(retries):
+        increment('http.retries',retries,route = route)
@@ -0,0 +1,192 @@
+"""
+Module providing an asyncio interface to osrsitems and osrshiscores
+
+Requests are run on a bounded thread pool sharing the pooled transport sessions (and rate limits),
+so the event loop is never blocked and return values are exactly the same as the sync functions.
+Concurrent identical calls on the same event loop are coalesced into one call (and one thread),
+each caller getting its own copy of the result.
+
+Typical usage:
+
+async with AsyncClient(max_concurrency = 64) as client:
+    prices = await asyncio.gather(*(client.get_current_price(id) for id in ids))
+
+or through the module level functions, which share a default client:
+
+foo = await get_player_hiscores('Foo', 'UIM')
+
+"""
+import asyncio
+import copy
+import functools
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+
+from . import osrsitems
+from . import transport
+from .osrshiscores import PlayerHiscores
+
+class AsyncClient:
+
+    """
+    Runs osrsutils requests without blocking the event loop
+
+    Attributes:
+                max_concurrency (int): the maximum number of requests in flight at once
+                                       (further calls wait for a free slot)
+
+    """
+
+    def __init__(self,max_concurrency:int = None):
+
+        """
+        Parameters:
+                    max_concurrency (int): the maximum number of requests in flight at once
+                    Default: transport.pool_maxsize (one request per pooled connection)
+
+        """
+
+        self.max_concurrency = max_concurrency or transport.pool_maxsize
+        transport.grow_pool(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers = self.max_concurrency, thread_name_prefix = 'osrsutils')
+        #in-flight calls of each event loop {loop: {key: [future, number of callers waiting]}}
+        self._inflight = weakref.WeakKeyDictionary()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self,*exc):
+        self.close()
+
+    def close(self):
+
+        """
+        Shuts down the thread pool (requests already in flight are allowed to finish)
+        """
+
+        self._executor.shutdown(wait = False)
+
+    async def run(self,func,*args,**kwargs):
+
+        """
+        Runs a blocking function on the client's thread pool
+
+            Returns: whatever func returns
+
+        """
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,functools.partial(func,*args,**kwargs))
+
+    async def run_shared(self,key,func,*args):
+
+        """
+        Runs a blocking function on the client's thread pool, unless a call with the same key
+        is already in flight on this event loop, in which case its result is shared
+
+            Returns: whatever func returns (callers sharing a call get their own deep copy,
+                     so modifying the result doesn't change it for the others)
+
+        """
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.setdefault(loop,{})
+        call = inflight.get(key)
+        if(call is None):
+            future = asyncio.ensure_future(self.run(func,*args))
+            call = inflight[key] = [future,0]
+            future.add_done_callback(lambda f: _finished(inflight,key,call))
+        call[1] += 1
+        try:
+            #a cancelled caller doesn't cancel the call for the others
+            result = await asyncio.shield(call[0])
+        finally:
+            call[1] -= 1
+        #callers resume one at a time: every caller but the last copies the result before anyone else can modify it
+        return result if call[1] == 0 else copy.deepcopy(result)
+
+    async def get_latest_price(self,id = None):
+
+        """
+        Async version of osrsitems.get_latest_price
+        """
+
+        return await self.run_shared(('latest',id),osrsitems.get_latest_price,id)
+
+    async def get_time_series(self,id:int,timestep:str):
+
+        """
+        Async version of osrsitems.get_time_series
+        """
+
+        return await self.run_shared(('timeseries',id,timestep),osrsitems.get_time_series,id,timestep)
+
+    async def ge_lookup(self,id):
+
+        """
+        Async version of osrsitems.ge_lookup
+        """
+
+        return await self.run_shared(('ge',id),osrsitems.ge_lookup,id)
+
+    async def get_current_price(self,id):
+
+        """
+        Async version of osrsitems.get_current_price
+        """
+
+        return await self.run_shared(('graph',id),osrsitems.get_current_price,id)
+
+    async def get_player_hiscores(self,username:str,account_type = 'N'):
+
+        """
+        Creates a PlayerHiscores object without blocking the event loop
+
+            Parameters:
+                        username (str): A string representing the player's username
+                        account_type (str): A string representing the account type
+
+            Returns: a PlayerHiscores object (concurrent calls for the same player share one request)
+
+            Raises: the same exceptions as PlayerHiscores (AccountTypeError, HiscoresError)
+
+        """
+
+        key = ('hiscores',str(account_type).upper(),username.lower())
+        return await self.run_shared(key,PlayerHiscores,username,account_type)
+
+def _finished(inflight,key,call):
+    future = call[0]
+    if(inflight.get(key) is call):
+        del inflight[key]
+    #the result is read by the callers, retrieve the exception in case they were all cancelled
+    if(not future.cancelled()):
+        future.exception()
+
+_default_client = None
+
+def get_default_client():
+
+    """
+    Gets the client used by the module level functions (created the first time it is needed)
+    """
+
+    global _default_client
+    if(_default_client is None):
+        _default_client = AsyncClient()
+    return _default_client
+
+async def get_latest_price(id = None):
+    return await get_default_client().get_latest_price(id)
+
+async def get_time_series(id:int,timestep:str):
+    return await get_default_client().get_time_series(id,timestep)
+
+async def ge_lookup(id):
+    return await get_default_client().ge_lookup(id)
+
+async def get_current_price(id):
+    return await get_default_client().get_current_price(id)
+
+async def get_player_hiscores(username:str,account_type = 'N'):
+    return await get_default_client().get_player_hiscores(username,account_type)
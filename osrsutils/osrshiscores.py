@@ -7,9 +7,19 @@ Typical usage:
 
 foo = PlayerHiscores(username = 'Foo', account_type = 'UIM')
 
+for result in fetch_hiscores([('Foo','UIM'),('Bar','N')], checkpoint = 'clan.ckpt'):
+    if(result.error is None):
+        print(result.hiscores.skills['slayer'])
+
 """
 
-import requests
+import json
+from array import array
+from collections import namedtuple
+from collections.abc import Mapping
+
+from . import transport
+from .singleflight import SingleFlight
 
 class AccountTypeError(Exception):
     """
@@ -19,10 +29,198 @@ class AccountTypeError(Exception):
 
 class HiscoresError(Exception):
     """
-    An exception raised when the api fails to return a sufficient response (i.e when it returns status code 400 (user may not exist))
+    An exception raised when the api fails to return a sufficient response (i.e when it is throttled or unavailable)
+
+    Attributes:
+                status_code (int): the status code of the response (None if there was no response)
+    """
+
+    def __init__(self,message,status_code = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class PlayerNotFoundError(HiscoresError):
+    """
+    An exception raised when the hiscores have no player with the username for the account type (status code 404)
     """
     pass
 
+skills_list = (
+    'attack',
+    'defence',
+    'strength',
+    'hitpoints',
+    'ranged',
+    'prayer',
+    'magic',
+    'cooking',
+    'woodcutting',
+    'fletching',
+    'fishing',
+    'firemaking',
+    'crafting',
+    'smithing',
+    'mining',
+    'herblore',
+    'agility',
+    'thieving',
+    'slayer',
+    'farming',
+    'runecraft',
+    'hunter',
+    'construction'
+)
+
+activities_list = (
+    'leaguepoints',
+    'bhhunter',
+    'bhrogue',
+    'allclues',
+    'beginnerclues',
+    'easyclues',
+    'mediumclues',
+    'hardclues',
+    'eliteclues',
+    'masterclues',
+    'lmsrank',
+    'pvprank',
+    'swzeal',
+    'riftsclosed'
+)
+
+bosses_list = (
+    'sire',
+    'hydra',
+    'barrows',
+    'bryophyta',
+    'callisto',
+    'cerberus',
+    'cox',
+    'coxc',
+    'chaosele',
+    'chaosfanatic',
+    'zilyana',
+    'corp',
+    'crazyarch',
+    'prime',
+    'rex',
+    'supreme',
+    'darch',
+    'graardor',
+    'mole',
+    'gg',
+    'hespori',
+    'kq',
+    'kbd',
+    'kraken',
+    "kree",
+    "kril",
+    'mimic',
+    'nex',
+    'nightmare',
+    "pnightmare",
+    'obor',
+    'sarachnis',
+    'scorpia',
+    'skotizo',
+    'tempoross',
+    'gauntlet',
+    'cgauntlet',
+    'tob',
+    'tobhard',
+    'thermy',
+    'toa',
+    'toaex',
+    'zuk',
+    'jad',
+    'venenatis',
+    "vetion",
+    'vorkath',
+    'wintertodt',
+    'zalcano',
+    'zulrah'
+)
+
+#layout of a parsed hiscores row: overall (rank, level, xp), then every skill (rank, level, xp),
+#then every activity (rank, value) and every boss (rank, kc), in the same order as the index_lite response
+skill_columns = ('rank','level','xp')
+activity_columns = ('rank','value')
+boss_columns = ('rank','kc')
+
+sections = {
+    'skills': (skills_list, skill_columns),
+    'activities': (activities_list, activity_columns),
+    'bosses': (bosses_list, boss_columns),
+}
+
+def _build_layout():
+    offsets = {}
+    offset = len(skill_columns)
+    for section, (names, columns) in sections.items():
+        for name in names:
+            offsets[(section,name)] = offset
+            offset += len(columns)
+    return offsets, offset
+
+#(section, name) -> position of the entry's first column in a row
+row_offsets, row_length = _build_layout()
+
+#number of columns of each line of the response, and how many lines hold overall and the skills
+line_widths = tuple([len(skill_columns)] * (1 + len(skills_list)) + [len(activity_columns)] * len(activities_list)
+                    + [len(boss_columns)] * len(bosses_list))
+head_lines = 1 + len(skills_list)
+
+hiscores_endpoint = 'http://secure.runescape.com/'
+
+hiscores_tables = {
+    'N': 'm=hiscore_oldschool',
+    'IM': 'm=hiscore_oldschool_ironman',
+    'UIM': 'm=hiscore_oldschool_ultimate',
+    'HCIM': 'm=hiscore_oldschool_hardcore_ironman',
+    'DMM': 'm=hiscore_oldschool_deadman',
+    'S': 'm=hiscore_oldschool_seasonal',
+    'T': 'm=hiscore_oldschool_tournament',
+}
+
+#concurrent lookups of the same player share one in-flight request
+inflight = SingleFlight()
+
+def _request_hiscores(username:str,account_type:str):
+
+    """
+    Requests a player's row from the index_lite route of the hiscores table for account_type
+
+        Parameters:
+                    username (str): the player's username (spaces already replaced with %20)
+                    account_type (str): the (upper case) account type
+
+        Returns: the response text
+
+        Raises:
+                AccountTypeError:
+                    If an invalid account type is specified
+
+                PlayerNotFoundError:
+                    If the player doesn't exist (status code 404)
+
+                HiscoresError:
+                    If the hiscores server responds with any other status code than 200 (HTTP.OK), after retries
+
+    """
+
+    if(account_type not in hiscores_tables):
+        raise AccountTypeError('Invalid account type specified. Valid types: N, IM, UIM, HCIM, DMM')
+
+    url = hiscores_endpoint + hiscores_tables[account_type] + '/index_lite.ws?player={}'.format(username)
+    #the hiscores aren't case sensitive, and PlayerHiscores passes spaces as %20
+    key = ('hiscores',account_type,username.replace('%20',' ').lower())
+    response = inflight.do(key,transport.get,url,endpoint='hiscores')
+    if(response.status_code == 404):
+        raise PlayerNotFoundError("No account with username '{}' found with account type '{}'. Valid types: N, IM, UIM, HCIM, DMM".format(username,account_type),404)
+    if(response.status_code != 200):
+        raise HiscoresError("Hiscores request for '{}' ({}) failed with status code {}".format(username,account_type,response.status_code),response.status_code)
+    return response.text
+
 class PlayerHiscores:
 
     """
@@ -95,25 +293,7 @@ class PlayerHiscores:
                     
         """
 
-        rs = 'http://secure.runescape.com/'
-
-        routes = {
-            'N': rs + 'm=hiscore_oldschool/index_lite.ws?player={}'.format(self.username),
-            'IM': rs + 'm=hiscore_oldschool_ironman/index_lite.ws?player={}'.format(self.username),
-            'UIM': rs + 'm=hiscore_oldschool_ultimate/index_lite.ws?player={}'.format(self.username),
-            'HCIM': rs + 'm=hiscore_oldschool_hardcore_ironman/index_lite.ws?player={}'.format(self.username),
-            'DMM': rs + 'm=hiscore_oldschool_deadman/index_lite.ws?player={}'.format(self.username),
-            'S': rs + 'm=hiscore_oldschool_seasonal/index_lite.ws?player={}'.format(self.username),
-            'T': rs + 'm=hiscore_oldschool_tournament/index_lite.ws?player={}'.format(self.username)
-            }
-
-        if(self.account_type not in routes.keys()):
-            raise AccountTypeError('Invalid account type specified. Valid types: N, IM, UIM, HCIM, DMM')
-
-        response = requests.get(routes[self.account_type])
-        if(response.status_code != 200):
-            raise HiscoresError("No account with username '{}' found with account type '{}'. Valid types: N, IM, UIM, HCIM, DMM".format(self.username,self.account_type))
-        self._parse_hiscores(response.text)
+        self._parse_hiscores(_request_hiscores(self.username,self.account_type))
 
     def _parse_hiscores(self,hiscores):
 
@@ -123,116 +303,341 @@ class PlayerHiscores:
         Sets the skills attribute to a dict with format: {'attack':{'rank':1,'level':99,'xp':200000000}...}
         Sets the bosses attribute to a dict with format: {'kbd':{'rank':1,'kc':344}...}
         Sets the activities attribute to a dict with format: {'mediumclues':{'rank':1,'value':342}...}
+
+        Raises:
+                HiscoresError:
+                    If the response isn't an index_lite response (i.e an empty or HTML body)
                     
         """
 
+        _check_response(hiscores)
         hiscores = hiscores.replace('\n',',').split(',')
         
         self.overall = {'rank':hiscores[0],'level':hiscores[1],'xp':hiscores[2]}
 
-        skills_list = (
-                  'attack',
-                  'defence',
-                  'strength',
-                  'hitpoints',
-                  'ranged',
-                  'prayer',
-                  'magic',
-                  'cooking',
-                  'woodcutting',
-                  'fletching',
-                  'fishing',
-                  'firemaking',
-                  'crafting',
-                  'smithing',
-                  'mining',
-                  'herblore',
-                  'agility',
-                  'thieving',
-                  'slayer',
-                  'farming',
-                  'runecraft',
-                  'hunter',
-                  'construction'
-                  )
-
-        activities_list = (
-            'leaguepoints',
-            'bhhunter',
-            'bhrogue',
-            'allclues',
-            'beginnerclues',
-            'easyclues',
-            'mediumclues',
-            'hardclues',
-            'eliteclues',
-            'masterclues',
-            'lmsrank',
-            'pvprank',
-            'swzeal',
-            'riftsclosed'
-            )
-
-        bosses_list = (
-            'sire',
-            'hydra',
-            'barrows',
-            'bryophyta',
-            'callisto',
-            'cerberus',
-            'cox',
-            'coxc',
-            'chaosele',
-            'chaosfanatic',
-            'zilyana',
-            'corp',
-            'crazyarch',
-            'prime',
-            'rex',
-            'supreme',
-            'darch',
-            'graardor',
-            'mole',
-            'gg',
-            'hespori',
-            'kq',
-            'kbd',
-            'kraken',
-            "kree",
-            "kril",
-            'mimic',
-            'nex',
-            'nightmare',
-            "pnightmare",
-            'obor',
-            'sarachnis',
-            'scorpia',
-            'skotizo',
-            'tempoross',
-            'gauntlet',
-            'cgauntlet',
-            'tob',
-            'tobhard',
-            'thermy',
-            'toa',
-            'toaex',
-            'zuk',
-            'jad',
-            'venenatis',
-            "vetion",
-            'vorkath',
-            'wintertodt',
-            'zalcano',
-            'zulrah'
-            )
-        
-        for count, skill in enumerate(skills_list):
-            self.skills[skill] = {'rank':hiscores[3 + count],'level':hiscores[4 + count],'xp':hiscores[5 + count]}
-        
+        for section, (names, columns) in sections.items():
+            entries = getattr(self,section)
+            for name in names:
+                offset = row_offsets[(section,name)]
+                entries[name] = dict(zip(columns,hiscores[offset:offset + len(columns)]))
 
-        for count, activity in enumerate(activities_list):
-            self.activities[activity] = {'rank':hiscores[3 + len(skills_list)*3 + 2*count],'value':hiscores[4 + len(skills_list)*3 + 2*count]}
-        
-        
-        for count, boss in enumerate(bosses_list):
-            self.bosses[boss] = {'rank':hiscores[3 + len(skills_list)*3 + len(activities_list)*2 + 2*count],'kc':hiscores[4 + len(skills_list)*3 + len(activities_list)*2 + 2*count]}
\ No newline at end of file
+
+def _check_response(hiscores):
+
+    """
+    Raises HiscoresError if a response doesn't start with the overall rank,level,xp line (i.e an empty or HTML body)
+    """
+
+    overall = hiscores.split('\n',1)[0].split(',')
+    if(len(overall) == len(skill_columns)):
+        try:
+            for value in overall:
+                int(value)
+            return
+        except ValueError:
+            pass
+    raise HiscoresError('Malformed hiscores response: {!r}'.format(hiscores[:80]),200)
+
+def _parse_lines(lines,row,offset,widths):
+
+    """
+    Parses index_lite lines into row starting at offset, each line is read up to the width expected for it
+    (empty or missing values, i.e from a truncated or blank line, are left/stored as -1 like missing values in to_row)
+    Raises HiscoresError if a value isn't a number
+    """
+
+    for line, width in zip(lines,widths):
+        for i, value in enumerate(line.split(',')[:width]):
+            value = value.strip()
+            try:
+                row[offset + i] = int(value) if value else -1
+            except ValueError:
+                raise HiscoresError('Malformed hiscores response line: {!r}'.format(line[:80]),200) from None
+        offset += width
+    return offset
+
+class _SectionView(Mapping):
+
+    """
+    A read-only dict-like view of one section (skills, activities or bosses) of a CompactHiscores row
+    section['attack'] returns a new dict such as {'rank':1,'level':99,'xp':200000000}
+    """
+
+    __slots__ = ('_hiscores','_section','_names','_columns')
+
+    def __init__(self,hiscores,section):
+        self._hiscores = hiscores
+        self._section = section
+        self._names, self._columns = sections[section]
+
+    def __getitem__(self,name):
+        row = self._hiscores._section_row(self._section)
+        offset = row_offsets[(self._section,name)]
+        return dict(zip(self._columns,row[offset:offset + len(self._columns)]))
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+class CompactHiscores:
+
+    """
+    A compact representation of a player's hiscore data
+
+    Every value is stored as an int in a single array('q') row laid out as described by row_offsets.
+    The activities and bosses part of the response is only parsed when it is first accessed.
+
+    Attributes:
+                username (str): A string representing the player's username
+                account_type (str): A string representing the player's account type (see PlayerHiscores)
+                overall (dict): {'rank','level','xp'}
+                skills, activities, bosses: read-only dict-like views with the same keys as the PlayerHiscores attributes,
+                                            but values are ints
+                ----
+                A value of -1 for any of the above denotes not ranked
+
+    """
+
+    __slots__ = ('username','account_type','_row','_rest')
+
+    def __init__(self,username:str,account_type:str,hiscores:str):
+
+        """
+        Parameters:
+                    username (str): A string representing the player's username
+                    account_type (str): A string representing the account type
+                    hiscores (str): the index_lite response to parse
+
+            Raises: HiscoresError if hiscores isn't an index_lite response (i.e an empty or HTML body)
+
+        """
+
+        self.username = username.replace(' ','%20')
+        self.account_type = account_type.upper()
+        _check_response(hiscores)
+        self._row = array('q',[-1]) * row_length
+        lines = hiscores.split('\n',head_lines)
+        _parse_lines(lines[:head_lines],self._row,0,line_widths)
+        self._rest = lines[head_lines] if len(lines) > head_lines else None
+
+    @classmethod
+    def fetch(cls,username:str,account_type = 'N'):
+
+        """
+        Searches the hiscores for a player (see PlayerHiscores)
+
+            Returns: a CompactHiscores object
+
+            Raises: AccountTypeError, HiscoresError
+
+        """
+
+        username = username.replace(' ','%20')
+        account_type = account_type.upper()
+        return cls(username,account_type,_request_hiscores(username,account_type))
+
+    def _section_row(self,section):
+        rest = self._rest
+        if(section != 'skills' and rest is not None):
+            #_rest is only cleared once the row is filled in, so other threads never read the -1 placeholders
+            #(threads racing here parse the same values into the same slots)
+            _parse_lines(rest.split('\n'),self._row,len(skill_columns) * head_lines,line_widths[head_lines:])
+            self._rest = None
+        return self._row
+
+    @property
+    def row(self):
+
+        """
+        The whole parsed row (array('q') of length row_length)
+        """
+
+        return self._section_row(None)
+
+    def get(self,section:str,name:str,column:str):
+
+        """
+        Gets a single value, i.e get('skills','attack','xp')
+
+            Returns: int
+
+        """
+
+        columns = sections[section][1]
+        return self._section_row(section)[row_offsets[(section,name)] + columns.index(column)]
+
+    @property
+    def overall(self):
+        return dict(zip(skill_columns,self._row[:len(skill_columns)]))
+
+    @property
+    def skills(self):
+        return _SectionView(self,'skills')
+
+    @property
+    def activities(self):
+        return _SectionView(self,'activities')
+
+    @property
+    def bosses(self):
+        return _SectionView(self,'bosses')
+
+
+def player_key(username:str,account_type:str):
+
+    """
+    Gets the key identifying a player across spellings of the username (the hiscores aren't case sensitive,
+    and PlayerHiscores.username has its spaces replaced with %20), i.e player_key('Foo%20Bar', 'n') == ('foo bar', 'N')
+    """
+
+    return (username.replace('%20',' ').lower(),account_type.upper())
+
+def to_row(hiscores):
+
+    """
+    Converts a PlayerHiscores or CompactHiscores object to an int row in the row layout described by row_offsets
+
+        Returns: array('q') of length row_length
+
+    """
+
+    if(isinstance(hiscores,CompactHiscores)):
+        return array('q',hiscores.row)
+
+    row = array('q',[-1]) * row_length
+    for i, column in enumerate(sections['skills'][1]):
+        row[i] = int(getattr(hiscores,'overall',{}).get(column,-1))
+    for section, (names, columns) in sections.items():
+        entries = getattr(hiscores,section)
+        for name in names:
+            offset = row_offsets[(section,name)]
+            for i, column in enumerate(columns):
+                row[offset + i] = int(entries.get(name,{}).get(column,-1))
+    return row
+
+
+HiscoresResult = namedtuple('HiscoresResult',('username','account_type','hiscores','error'))
+HiscoresResult.__doc__ = """
+A result yielded by fetch_hiscores()
+hiscores is a PlayerHiscores (or CompactHiscores) object, or None if the lookup failed (the exception is in error)
+"""
+
+def failure_reason(error):
+
+    """
+    Classifies the error of a failed lookup
+
+        Returns: None (no error), 'not_found' (the player doesn't exist), 'invalid' (invalid account type)
+                 or 'transient' (throttled, server error or connection error, the lookup may succeed later)
+
+    """
+
+    if(error is None):
+        return None
+    if(isinstance(error,PlayerNotFoundError)):
+        return 'not_found'
+    if(isinstance(error,AccountTypeError)):
+        return 'invalid'
+    return 'transient'
+
+def _read_checkpoint(checkpoint,retry_failed):
+
+    """
+    Gets the players a previous run is done with: successful lookups, and players that don't exist unless retry_failed
+    Every other failure (transient, invalid or from a checkpoint written without reasons) is fetched again
+    """
+
+    done = set()
+    try:
+        with open(checkpoint,encoding = 'utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if(entry.get('ok') or (entry.get('reason') == 'not_found' and not retry_failed)):
+                    done.add((entry.get('username'),entry.get('account_type')))
+    except FileNotFoundError:
+        pass
+    return done
+
+def _fetch(username,account_type,compact):
+    try:
+        if(compact):
+            return HiscoresResult(username,account_type,CompactHiscores.fetch(username,account_type),None)
+        return HiscoresResult(username,account_type,PlayerHiscores(username,account_type),None)
+    except (HiscoresError,AccountTypeError,OSError) as e:
+        return HiscoresResult(username,account_type,None,e)
+    except (ValueError,IndexError) as e:
+        #an unexpected body must not stop the batch
+        error = HiscoresError('Malformed hiscores response for {!r} ({}): {}'.format(username,account_type,e))
+        error.__cause__ = e
+        return HiscoresResult(username,account_type,None,error)
+
+def fetch_hiscores(players,workers:int = 8,checkpoint:str = None,retry_failed:bool = False,compact:bool = False):
+
+    """
+    Fetches the hiscores of many players concurrently, yielding results as they complete
+    Requests go through the pooled transport and are subject to the 'hiscores' rate limit
+
+        Parameters:
+                    players (iterable): (username, account_type) tuples, consumed lazily
+                    workers (int): number of lookups in flight at once
+                    checkpoint (str): path of a checkpoint file (optional)
+                    Every finished player is appended to it, and players already in it are skipped,
+                    so an interrupted run can be resumed by calling fetch_hiscores again with the same file
+                    retry_failed (bool): whether players that weren't found in a previous run are fetched again when resuming
+                    (other failures, such as throttled requests or connection errors, are always fetched again)
+                    compact (bool): whether to return CompactHiscores objects instead of PlayerHiscores
+
+        Yields: HiscoresResult(username, account_type, hiscores, error) in completion order
+                A failed lookup (HiscoresError, AccountTypeError or a connection error) doesn't stop the batch,
+                its result has hiscores = None and the exception in error (see failure_reason)
+
+    """
+
+    #imported here so importing the module stays cheap
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+    done = _read_checkpoint(checkpoint,retry_failed) if checkpoint else set()
+    log = open(checkpoint,'a',encoding = 'utf-8') if checkpoint else None
+
+    try:
+        with ThreadPoolExecutor(max_workers = workers) as executor:
+            pending = set()
+            players = iter(players)
+            exhausted = False
+            try:
+                while(pending or not exhausted):
+                    while(not exhausted and len(pending) < workers * 2):
+                        try:
+                            username, account_type = next(players)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        if((username,account_type) in done):
+                            continue
+                        done.add((username,account_type))
+                        pending.add(executor.submit(_fetch,username,account_type,compact))
+
+                    if(not pending):
+                        break
+                    finished, pending = wait(pending,return_when = FIRST_COMPLETED)
+                    for future in finished:
+                        result = future.result()
+                        if(log is not None):
+                            entry = {'username':result.username,'account_type':result.account_type,'ok':result.error is None}
+                            if(result.error is not None):
+                                entry['reason'] = failure_reason(result.error)
+                            log.write(json.dumps(entry) + '\n')
+                            log.flush()
+                        yield result
+            finally:
+                #stopped early, don't start lookups nobody will read
+                for future in pending:
+                    future.cancel()
+    finally:
+        if(log is not None):
+            log.close()
@@ -5,10 +5,20 @@ Currently implements the oldschool runescape wiki price api
 Information can be found here: https://oldschool.runescape.wiki/w/RuneScape:Real-time_Prices
 https://runescape.wiki/w/Application_programming_interface
 
+Importing the module is kept cheap for short-lived processes: requests is imported on the first request
+(see transport), and the item data is only read the first time the catalog is needed.
+
 """
-import requests
+import json
+import os
 from . import fileutils
-import inspect
+from . import itemcache
+from . import jsonstream
+from . import metrics
+from . import transport
+from .cache import ResponseCache, make_key
+from .itemcatalog import CatalogHandle, diff_items
+from .singleflight import SingleFlight
 
 prices_endpoint = 'http://prices.runescape.wiki/api/v1/osrs'
 ge_endpoint = 'https://secure.runescape.com/m=itemdb_oldschool/api/catalogue/detail.json'
@@ -18,7 +28,26 @@ headers = {
     'User-Agent': 'OSRS item search',
 }
 
-item_list = fileutils.get_data_dir() + 'item_data.json'
+item_list = fileutils.get_data_path('item_data.json')
+item_cache = fileutils.get_data_path('item_data.bin')
+item_meta = fileutils.get_data_path('item_data.meta.json')
+
+#size of the chunks read by the streaming functions
+stream_chunk_size = 64*1024
+
+#number of threads used by the bulk lookups (requests are still subject to the transport rate limits)
+max_workers = 8
+
+#responses from the prices api, see cache.default_ttls for how long each route is kept
+response_cache = ResponseCache()
+
+#concurrent identical requests share one in-flight request
+inflight = SingleFlight()
+
+#the current item catalog snapshot, see get_catalog()
+catalog_handle = CatalogHandle(lambda: _load_items())
+
+_resolver = None
 
 def _graph_api_request(id):
 
@@ -33,7 +62,7 @@ def _graph_api_request(id):
                     requests.Response object containing the servers response
 
     """
-    res = requests.get(graph_endpoint + str(id) + '.json', headers=headers)
+    res = inflight.do(('graph',str(id)),transport.get,graph_endpoint + str(id) + '.json', endpoint='graph', headers=headers)
     res.raise_for_status()
     return res
 
@@ -50,15 +79,16 @@ def _ge_api_request(id):
                     requests.Response object containing the servers response
 
     """
-    res = requests.get(ge_endpoint, headers=headers, params = {'item':id})
+    res = inflight.do(('ge',str(id)),transport.get,ge_endpoint, endpoint='ge', headers=headers, params = {'item':id})
     res.raise_for_status()
     return res
 
-def _prices_api_request(route:str,query_params = None):
+def _prices_api_request(route:str,query_params = None,revalidate:bool = False):
 
     """
     Makes a request to the specified route (using the prices endpoint)
     Not necessary to call
+    Responses are cached in response_cache and revalidated with the server once they expire
         
         Parameters: 
                     route (str): A string representing the desired route
@@ -67,13 +97,22 @@ def _prices_api_request(route:str,query_params = None):
                     query_params: Dict, list or tuple to send as a query string (optional)
                     Default: None
 
+                    revalidate (bool): whether to check a cached response with the server before it expires (optional)
+                    Default: False
+
 
         Returns: 
                     requests.Response object containing the servers response
 
     """
 
-    res = requests.get('{}/{}'.format(prices_endpoint,route), headers=headers,  params = query_params)
+    url = '{}/{}'.format(prices_endpoint,route)
+
+    def request(validators):
+        return transport.get(url, endpoint='prices', headers=dict(headers,**validators),  params = query_params,
+                             route='prices/' + route)
+
+    res = inflight.do(('prices',) + make_key(route,query_params),response_cache.fetch,route,query_params,request,revalidate)
     res.raise_for_status()
     return res
 
@@ -94,7 +133,7 @@ def get_latest_price(id = None):
 
     try:
         result = _prices_api_request('latest',query_params = {'id':id} if id else None)
-    except requests.HTTPError:
+    except transport.HTTPError:
         return {}
     return result.json()
 
@@ -113,8 +152,8 @@ def get_5m_price(timestamp = None):
     """
 
     try:
-        result = _prices_api_request('5m',query_params = {'id': id} if timestamp else None)
-    except requests.HTTPError:
+        result = _prices_api_request('5m',query_params = {'timestamp': timestamp} if timestamp else None)
+    except transport.HTTPError:
         return {}
     return result.json()
 
@@ -133,8 +172,8 @@ def get_1h_price(timestamp = None):
      """
 
      try:
-        result = _prices_api_request('1h',query_params = {'id': id} if timestamp else None)
-     except requests.HTTPError:
+        result = _prices_api_request('1h',query_params = {'timestamp': timestamp} if timestamp else None)
+     except transport.HTTPError:
         return {}
      return result.json()
 
@@ -155,25 +194,99 @@ def get_time_series(id:int,timestep:int):
 
     try:
         result = _prices_api_request('timeseries',query_params = {'id':id,'timestep':timestep})
-    except requests.HTTPError:
+    except transport.HTTPError:
         return {}
     return result.json()
 
-def _get_mapping():
+def _stream_prices_api_request(route:str,query_params = None):
+
+    """
+    Makes a streaming request to the specified route (using the prices endpoint)
+    The body isn't downloaded until the response is iterated, and the response cache is bypassed
+
+        Returns:
+                    requests.Response object containing the servers response
+
+    """
+
+    res = transport.get('{}/{}'.format(prices_endpoint,route), endpoint='prices', headers=headers, params = query_params, stream = True,
+                        route='prices/' + route)
+    try:
+        res.raise_for_status()
+    except transport.HTTPError:
+        res.close()
+        raise
+    return res
+
+def _id_filter(ids):
+    return None if ids is None else {int(id) for id in ids}
+
+def iter_latest_prices(ids = None):
+
+    """
+    Streams the latest high and low G.E price of every item
+    Items are yielded as they are read from the response, without building the whole snapshot in memory
+
+        Parameters:
+                    ids (iterable): only yield these item ids (optional)
+
+        Yields: (item id (int), {'high':..,'highTime':..,'low':..,'lowTime':..})
+                nothing if some sort of HTTPError occurred
+
+    """
+
+    wanted = _id_filter(ids)
+    try:
+        result = _stream_prices_api_request('latest')
+    except transport.HTTPError:
+        return
+    with result:
+        for key, record in jsonstream.iter_data_items(result.iter_content(stream_chunk_size)):
+            id = int(key)
+            if(wanted is None or id in wanted):
+                yield id, record
+
+def iter_mapping(ids = None):
+
+    """
+    Streams the mapping of every item in osrs from the wiki api (see _get_mapping)
+
+        Parameters:
+                    ids (iterable): only yield these item ids (optional)
+
+        Yields: (item id (int), item record (dict))
+                nothing if some sort of HTTPError occurred
+
+    """
+
+    wanted = _id_filter(ids)
+    try:
+        result = _stream_prices_api_request('mapping')
+    except transport.HTTPError:
+        return
+    with result:
+        for record in jsonstream.iter_array_items(result.iter_content(stream_chunk_size)):
+            id = record.get('id')
+            if(wanted is None or id in wanted):
+                yield id, record
+
+def _get_mapping(revalidate:bool = False):
 
     """
 
      Gets a mapping of every item in osrs from the wiki api
      mapping is currently an unofficial part of the api - subject to change
 
+        Parameters: revalidate (bool): whether to check a cached mapping with the server even if it hasn't expired (optional)
+
         Returns: the servers response in JSON format
                  or an empty collection if some sort of HTTPError occurred
 
     """
 
     try:
-        result = _prices_api_request('mapping')
-    except requests.HTTPError:
+        result = _prices_api_request('mapping',revalidate = revalidate)
+    except transport.HTTPError:
         return {}
     return result.json()
 
@@ -188,6 +301,175 @@ def get_item_data():
 
     return fileutils.read_json(item_list)
 
+def get_catalog():
+
+    """
+     Gets the indexed item catalog built from the item_data.json file
+     The file is only read the first time this is called (or after the item data is updated)
+     The catalog returned is a snapshot: it never changes, update_item_data() publishes a new one
+
+
+        Returns: an ItemCatalog
+
+    """
+
+    return catalog_handle.current
+
+def get_resolver():
+
+    """
+     Gets the typo tolerant name resolver built from the item catalog
+     It is built the first time this is called and kept up to date by update_item_data()
+
+        Returns: a NameResolver
+
+    """
+
+    global _resolver
+    resolver = _resolver
+    if(resolver is None):
+        from .resolver import NameResolver
+        version = catalog_handle.version
+        with metrics.timer('resolver.build'):
+            resolver = NameResolver(get_catalog())
+        #not kept if the catalog was invalidated while it was built
+        if(catalog_handle.version == version):
+            _resolver = resolver
+    return resolver
+
+def _catalog_invalidated(catalog):
+
+    """
+    Drops the resolver when the catalog handle is invalidated, so it is rebuilt from the reloaded catalog
+    (published catalogs don't need this, update_item_data updates the resolver with the changes)
+    """
+
+    global _resolver
+    if(catalog is None):
+        _resolver = None
+
+catalog_handle.subscribe(_catalog_invalidated)
+
+def resolve_item(name:str,k:int = 1):
+
+    """
+     Resolves an item name typed by a user (partial or misspelled, i.e 'abysal whip' or 'torag legs') to items
+
+        Parameters:
+                    name (str): the name to resolve
+                    k (int): the maximum number of matches to return
+
+        Returns: a list of up to k Match(id, name, score) tuples, best first
+
+    """
+
+    with metrics.timer('resolver.search'):
+        return get_resolver().search(name,k)
+
+def _load_items():
+
+    """
+     Loads the item data from the binary sidecar (item_data.bin), falling back to item_data.json
+     The sidecar is regenerated from item_data.json if it is missing or stale
+
+        Returns: a sequence of items
+
+    """
+
+    with metrics.timer('catalog.load'):
+        items = itemcache.load_item_cache(item_cache,item_list)
+        if(items is not None):
+            return items
+
+        #stamped before reading, so a sidecar built from records older than the file is never taken as fresh
+        try:
+            stamp = itemcache.source_stamp(item_list)
+        except OSError:
+            stamp = None
+        data = get_item_data()
+        if(data and stamp and itemcache.write_item_cache(item_cache,data,item_list,stamp)):
+            items = itemcache.load_item_cache(item_cache,item_list)
+            if(items is not None):
+                return items
+        return data
+
+def _items_hash(items):
+    import hashlib
+    return hashlib.sha256(json.dumps(items,sort_keys = True,separators = (',',':')).encode('utf-8')).hexdigest()
+
+def get_item_data_version():
+
+    """
+     Gets the version of the item_data.json file (incremented every time update_item_data() changes it)
+
+        Returns: a dict {'version': int, 'hash': sha256 of the item data} ({'version': 0, 'hash': None} if unknown)
+
+    """
+
+    meta = fileutils.read_json(item_meta) if os.path.exists(item_meta) else None
+    if(not isinstance(meta,dict) or 'version' not in meta):
+        return {'version':0,'hash':None}
+    return meta
+
+def update_item_data(item_mapping = None):
+
+    """
+    Updates the item_data.json file with the mapping from _get_mapping(), only applying what changed
+
+    The new mapping is compared with the current one by id. Changed items are replaced where they are
+    and new items are appended, the file is written atomically (readers see either the old or the new file)
+    and the loaded catalog's indexes are updated for the changed items only.
+
+        Parameters:
+                    item_mapping (list): the new mapping (optional, fetched with _get_mapping() by default)
+
+        Returns: a CatalogChanges object (added, removed and changed ids, and the new version)
+                 or None if the mapping couldn't be fetched or the file couldn't be written
+
+    """
+
+    if(item_mapping is None):
+        item_mapping = _get_mapping()
+    if(not item_mapping):
+        return None
+
+    def build(catalog):
+        changes = diff_items(catalog,item_mapping)
+        version = get_item_data_version()
+        if(not changes):
+            changes.version = version['version']
+            return None, changes
+
+        catalog = catalog.apply_changes(changes)
+        items = list(catalog.items)
+        #the stamp is the one of the file this call wrote, even if another process replaces it right after
+        written = fileutils.write_json_stat(item_list,items)
+        if(written is None):
+            return None, None
+        changes.version = version['version'] + 1
+        fileutils.write_to_json(item_meta,{'version':changes.version,'hash':_items_hash(items)})
+        itemcache.write_item_cache(item_cache,items,item_list,itemcache.source_stamp(written))
+        if(_resolver is not None):
+            _resolver.update(changes)
+        return catalog, changes
+
+    #the new catalog is built off to the side and swapped in once its indexes are ready,
+    #readers keep using the previous snapshot until then
+    return catalog_handle.update(build)
+
+def start_catalog_refresh(interval:float = 3600):
+
+    """
+    Calls update_item_data() every interval seconds in a background thread
+    Queries running while the catalog is refreshed are never blocked, get_catalog() returns the new snapshot once it is ready
+    Each refresh revalidates the cached mapping with the server, so intervals shorter than its cache TTL still see changes
+
+        Returns: the CatalogHandle (call stop() on it to stop refreshing)
+
+    """
+
+    return catalog_handle.start(lambda: update_item_data(_get_mapping(revalidate = True)),interval)
+
 def _update_item_data():
 
     """
@@ -196,14 +478,11 @@ def _update_item_data():
     Technically you can update it as much as you'd like
     but you'll probably get rate-limited if you access the mapping route too much
 
-        Returns: bool (whether list was updated)
+        Returns: bool (whether list was updated: items were added, changed or removed)
 
     """
 
-    item_mapping = _get_mapping()
-    if(item_mapping):
-        updated = fileutils.write_to_json(item_list,item_mapping)
-    return updated
+    return bool(update_item_data())
 
 
 
@@ -234,7 +513,7 @@ def ge_lookup(id):
 
     try:
         result = _ge_api_request(id) 
-    except requests.HTTPError:
+    except transport.HTTPError:
         return {}
     return result.json().get('item')
 
@@ -255,10 +534,113 @@ def get_current_price(id):
     """
     try:
         result = _graph_api_request(id)
-    except requests.HTTPError:
+    except transport.HTTPError:
         return 0
     return int(next(reversed(result.json().get('daily').values())))
 
+def _lookup_concurrently(func,ids,workers):
+
+    """
+    Calls func for every id using a thread pool
+
+        Returns: a dict {id: func(id)}
+
+    """
+
+    if(not ids):
+        return {}
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers = min(workers or max_workers,len(ids))) as executor:
+        return dict(zip(ids,executor.map(func,ids)))
+
+def _latest_mid_price(prices):
+
+    """
+    Gets the midpoint of the latest high and low prices (or whichever one exists)
+
+        Parameters: prices (dict): an entry of the /latest route's data, i.e {'high':105,'highTime':...,'low':100,'lowTime':...}
+
+        Returns: the price or 0 if the item has no latest price
+
+    """
+
+    if(not prices):
+        return 0
+    high = prices.get('high')
+    low = prices.get('low')
+    if(high and low):
+        return (high + low) // 2
+    return high or low or 0
+
+def get_current_prices(ids,use_latest:bool = True,workers:int = None):
+
+    """
+
+    Gets the current price of several items
+
+    Prices are taken from a single /latest snapshot where possible (the midpoint of the latest high and low price).
+    Items missing from the snapshot are looked up with get_current_price() concurrently.
+
+    Parameters:
+                ids (iterable): ids to search
+                use_latest (bool): whether to use the /latest snapshot, if False every price comes from the G.E graphs
+                Default: True
+                workers (int): number of threads used for the G.E graph lookups (optional)
+
+    Returns: a dict {id: price}, the price is 0 if it was unable to be retrieved
+             Prices from /latest are what the item last traded for, while the G.E graph price (the only source
+             when use_latest is False) is the daily guide price, so the same item can get a noticeably
+             different price from get_current_price() or when it falls back to the graphs
+
+    """
+
+    ids = list(dict.fromkeys(ids))
+    prices = {}
+    remaining = ids
+
+    if(use_latest and ids):
+        try:
+            latest = get_latest_price().get('data',{})
+        except transport.RequestException:
+            latest = {}
+        remaining = []
+        for id in ids:
+            price = _latest_mid_price(latest.get(str(id)))
+            if(price):
+                prices[id] = price
+            else:
+                remaining.append(id)
+
+    prices.update(_lookup_concurrently(_current_price_or_zero,remaining,workers))
+    return {id:prices[id] for id in ids}
+
+def _current_price_or_zero(id):
+
+    """
+    get_current_price() for the bulk lookups: a connection error or timeout only loses that item's price
+    """
+
+    try:
+        return get_current_price(id)
+    except transport.RequestException:
+        return 0
+
+def ge_lookups(ids,workers:int = None):
+
+    """
+
+    Looks up several items on the grand exchange concurrently
+
+    Parameters:
+                ids (iterable): ids to look up
+                workers (int): number of threads to use (optional)
+
+    Returns: a dict {id: ge_lookup(id)}
+
+    """
+
+    return _lookup_concurrently(ge_lookup,list(dict.fromkeys(ids)),workers)
+
 
 
 def search_item_data(examine:str = None, id:int = None, members:bool = None,lowalch:int=None,highalch:int=None,
@@ -281,40 +663,34 @@ def search_item_data(examine:str = None, id:int = None, members:bool = None,lowa
 
     """
 
-    def clean(s):
-        if(isinstance(s,str)):
-            return s.lower()
-        return s
-
-    query = {'examine':examine,'id':id,'members':members,'lowalch':lowalch,'highalch':highalch,
-            'limit':limit,'value':value,'icon':icon,'name':name}
+    catalog = get_catalog()
+    with metrics.timer('catalog.search'):
+        return catalog.search(examine = examine, id = id, members = members, lowalch = lowalch, highalch = highalch,
+                              limit = limit, value = value, icon = icon, name = name)
 
-    search_query = {k:clean(v) for k, v in query.items() if v is not None}
-    results = []
+def query_items(expression:str = None, order_by:str = None, k:int = None, offset:int = 0, **filters):
 
-    for item in get_item_data():
+    """
+    Queries the mapping data with range predicates, sorting and pagination (see itemquery)
 
-        name = search_query.get('name')
-        examine = search_query.get('examine')
-        icon = search_query.get('icon')
-        
-        if(name):
-            if(name not in str(item.get('name')).lower()):
-                continue
-   
-        if(examine):
-            if(examine not in str(item.get('examine')).lower()):
-                continue
+        Parameters:
+                    expression (str): i.e 'members and highalch > 10k and limit >= 100' (optional)
+                    order_by (str): field to sort by, '-' prefixed for descending order, i.e '-value' (optional, mapping order by default)
+                    k (int): the maximum number of items to return (optional, every match by default)
+                    offset (int): the number of matching items to skip
+                    filters: keyword filters, i.e highalch__gt = 10000, limit__ge = 100, name = 'rune'
 
-        if(icon):
-            if(icon not in str(item.get('icon')).lower()):
-                continue
+        Returns: a QueryPage (items, total number of matches, offset)
 
-        if({k:v for k,v in search_query.items() if k not in ('name','examine','icon')}.items() <= {k:v for k,v in item.items()}.items()):
-            results.append(item)
+        Raises: QueryError if the query is invalid
 
-    return results
+    """
 
+    from .itemquery import compile_query
+    query = compile_query(expression,order_by,**filters)
+    catalog = get_catalog()
+    with metrics.timer('catalog.query'):
+        return query.run(catalog,k,offset)
 
 def convert(n:str):
 
@@ -326,13 +702,33 @@ def convert(n:str):
                     n (str): String to convert
 
         Returns: an integer corresponding to the passed string
+                 (see gegraph.convert to convert many strings at once)
+
+    """
+    value, multiplier = _split_number(n)
+    if(multiplier > 1):
+        #rounded, as int() would truncate i.e 4.1*1000000 (4099999.9999999995)
+        return int(round(value*multiplier))
+    return int(value)
+
+_multipliers = {'k': 1000, 'm': 1000000, 'b': 1000000000}
+
+def _split_number(n):
 
     """
-    n = str(n).replace(',','').lower()
-    if('k' in n):
-        return int(float(n.replace('k',''))*1000)
-    elif('m' in n):
-        return int(float(n.replace('m',''))*1000000)
-    elif('b' in n):
-        return int(float(n.replace('b',''))*1000000000)
-    return int(float(n))
\ No newline at end of file
+    Parses a number string with an optional k, m or b suffix (the rules shared by convert and gegraph.convert)
+
+        Returns: (the number before the suffix (float), the suffix's multiplier (1 without a suffix))
+
+        Raises: ValueError if n isn't a number
+
+    """
+
+    n = str(n).strip().replace(',','').lower()
+    multiplier = _multipliers.get(n[-1:],1)
+    if(multiplier > 1):
+        n = n[:-1]
+    value = float(n)
+    if(value != value or value in (float('inf'),float('-inf'))):
+        raise ValueError('could not convert string to a number: {!r}'.format(n))
+    return value, multiplier
\ No newline at end of file
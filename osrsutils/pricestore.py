@@ -0,0 +1,357 @@
+"""
+Module implementing a local store for price time series from the prices api
+
+Each item's series for a timestep is kept in its own append-only file of fixed-width int64 records
+(timestamp, avgHighPrice, avgLowPrice, highPriceVolume, lowPriceVolume), sorted by timestamp.
+Updating only appends points newer than the last stored timestamp, and reads never touch the network.
+
+The records are stored row by row rather than as one file per column: an append is a single write to a single file,
+so the columns can never end up with different lengths. A crash partway through an append can only leave a partial
+trailing record, which reads ignore and the next append truncates away. read() still returns the series as columns.
+
+Typical usage:
+
+store = PriceStore()
+store.update_many(ids, '1h')
+week = store.read_many(ids, '1h', start = time.time() - 7*86400)
+
+"""
+import bisect
+import os
+import threading
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from . import fileutils
+from . import osrsitems
+from . import transport
+
+columns = ('timestamp','avgHighPrice','avgLowPrice','highPriceVolume','lowPriceVolume')
+record_size = len(columns) * 8
+
+#seconds covered by each timestep
+timesteps = {'5m': 300, '1h': 3600, '6h': 21600, '24h': 86400}
+
+MISSING = -2**63
+
+default_root = fileutils.get_data_path('prices')
+
+#snapshots fetched by backfill() before they are written, each item's file is written once per batch
+backfill_batch = 288
+
+def _record(point,timestamp = None):
+    values = [point.get('timestamp') if timestamp is None else timestamp]
+    for column in columns[1:]:
+        v = point.get(column)
+        values.append(MISSING if v is None else int(v))
+    return values
+
+def _fetch_snapshot(timestep,timestamp):
+    if(timestep == '5m'):
+        return osrsitems.get_5m_price(timestamp)
+    if(timestep == '1h'):
+        return osrsitems.get_1h_price(timestamp)
+    raise ValueError("Snapshots are only available for the '5m' and '1h' timesteps")
+
+class PriceStore:
+
+    """
+    A persistent store of per-item price/volume series
+
+    Attributes:
+                root (str): directory the series are stored in (one sub directory per timestep)
+
+    """
+
+    def __init__(self,root:str = None):
+
+        """
+        Parameters:
+                    root (str): directory to store the series in (optional)
+                    Default: the 'prices' directory next to item_data.json
+
+        """
+
+        self.root = root or default_root
+        #{(id, timestep): ((mtime, size) of the file, last timestamp)}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def _path(self,id,timestep):
+        if(timestep not in timesteps):
+            raise ValueError("Invalid timestep '{}'. Valid timesteps: {}".format(timestep,', '.join(timesteps)))
+        return os.path.join(self.root,timestep,'{}.bin'.format(int(id)))
+
+    def _load(self,path):
+        data = array('q')
+        try:
+            with open(path,'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return data
+        #drop a partial record left by an interrupted append
+        data.frombytes(raw[:len(raw) - len(raw) % record_size])
+        return data
+
+    def last_timestamp(self,id,timestep:str):
+
+        """
+        Gets the timestamp of the newest point stored for an item
+        (kept until the file changes, even if another store or process writes it)
+
+            Returns: the timestamp or None if nothing is stored
+
+        """
+
+        key = (int(id),timestep)
+        path = self._path(id,timestep)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        stamp = (stat.st_mtime_ns,stat.st_size)
+        cached = self._last.get(key)
+        if(cached is not None and cached[0] == stamp):
+            return cached[1]
+
+        last = None
+        try:
+            with open(path,'rb') as f:
+                f.seek(0,os.SEEK_END)
+                size = f.tell() - f.tell() % record_size
+                if(size):
+                    f.seek(size - record_size)
+                    last = array('q',f.read(8))[0]
+        except FileNotFoundError:
+            return None
+        self._last[key] = (stamp,last)
+        return last
+
+    def append(self,id,timestep:str,points):
+
+        """
+        Stores points for an item
+        Points newer than the last stored point are appended, older points are merged into the file
+        (points whose timestamp is already stored are ignored)
+
+            Parameters:
+                        id (int): item id
+                        timestep (str): '5m', '1h', '6h' or '24h'
+                        points (iterable): dicts in the timeseries route format
+                        {'timestamp':..,'avgHighPrice':..,'avgLowPrice':..,'highPriceVolume':..,'lowPriceVolume':..}
+
+            Returns: the number of points stored
+
+        """
+
+        return self._store(id,timestep,[_record(p) for p in points if p.get('timestamp') is not None])
+
+    def _store(self,id,timestep,records):
+
+        """
+        Stores records (lists of len(columns) ints), the file is rewritten at most once
+        """
+
+        records = sorted(records,key = lambda r: r[0])
+        if(not records):
+            return 0
+
+        path = self._path(id,timestep)
+        with self._lock:
+            last = self.last_timestamp(id,timestep)
+            newer = [r for r in records if last is None or r[0] > last]
+            older = [r for r in records if last is not None and r[0] < last]
+
+            stored = 0
+            if(older):
+                stored += self._merge(path,older)
+
+            data = array('q')
+            for r in newer:
+                if(not data or data[-len(columns)] != r[0]):
+                    data.extend(r)
+            if(data):
+                os.makedirs(os.path.dirname(path),exist_ok = True)
+                with open(path,'ab') as f:
+                    #an interrupted append may have left a partial record, cut it off so the new records stay aligned
+                    size = f.seek(0,os.SEEK_END)
+                    if(size % record_size):
+                        f.truncate(size - size % record_size)
+                    f.write(data.tobytes())
+                stored += len(data) // len(columns)
+            return stored
+
+    def _merge(self,path,records):
+
+        """
+        Inserts records older than the last stored point (rewrites the file once)
+        """
+
+        width = len(columns)
+        data = self._load(path)
+        timestamps = set(data[::width])
+        new = []
+        for r in records:
+            if(r[0] not in timestamps):
+                timestamps.add(r[0])
+                new.append(r)
+        if(not new):
+            return 0
+
+        rows = [data[i:i + width] for i in range(0,len(data),width)] + [array('q',r) for r in new]
+        rows.sort(key = lambda r: r[0])
+        merged = array('q')
+        for r in rows:
+            merged.extend(r)
+        tmp = '{}.{}.tmp'.format(path,os.getpid())
+        with open(tmp,'wb') as f:
+            f.write(merged.tobytes())
+        os.replace(tmp,path)
+        return len(new)
+
+    def update(self,id,timestep:str = '5m'):
+
+        """
+        Fetches the item's time series from the api and stores the points newer than the last stored point
+
+            Parameters:
+                        id (int): item id
+                        timestep (str): '5m', '1h', '6h' or '24h'
+
+            Returns: the number of new points stored
+
+        """
+
+        series = osrsitems.get_time_series(id,timestep).get('data') or []
+        last = self.last_timestamp(id,timestep)
+        return self.append(id,timestep,[p for p in series if last is None or p.get('timestamp',0) > last])
+
+    def update_many(self,ids,timestep:str = '5m',workers:int = None):
+
+        """
+        Updates several items concurrently (requests are still subject to the transport rate limits)
+        A connection error or timeout only fails the update of that item, the other items are still stored
+
+            Returns: a dict {id: number of new points stored, or None if the item's request failed}
+
+        """
+
+        def update(id):
+            try:
+                return self.update(id,timestep)
+            except transport.RequestException:
+                return None
+
+        ids = list(dict.fromkeys(ids))
+        if(not ids):
+            return {}
+        with ThreadPoolExecutor(max_workers = min(workers or osrsitems.max_workers,len(ids))) as executor:
+            return dict(zip(ids,executor.map(update,ids)))
+
+    def store_snapshot(self,timestep:str,snapshot:dict):
+
+        """
+        Stores every item of a /5m or /1h response
+
+            Parameters:
+                        timestep (str): '5m' or '1h'
+                        snapshot (dict): the response, i.e {'data':{'2':{'avgHighPrice':..}},'timestamp':1663000000}
+
+            Returns: the number of items stored
+
+        """
+
+        timestamp = snapshot.get('timestamp')
+        if(timestamp is None):
+            return 0
+        stored = 0
+        for id, point in (snapshot.get('data') or {}).items():
+            stored += self.append(id,timestep,[dict(point,timestamp = timestamp)])
+        return stored
+
+    def record(self,timestep:str = '5m',timestamp:int = None):
+
+        """
+        Fetches a /5m or /1h snapshot and stores it
+
+            Parameters:
+                        timestep (str): '5m' or '1h'
+                        timestamp (int): beginning of the period to fetch (optional, the latest period by default)
+
+            Returns: the number of items stored
+
+        """
+
+        return self.store_snapshot(timestep,_fetch_snapshot(timestep,timestamp))
+
+    def backfill(self,timestep:str,start:int,end:int):
+
+        """
+        Fetches and stores every /5m or /1h snapshot between start and end
+        Snapshots are fetched backfill_batch at a time and each item's points in a batch are stored together,
+        so a file is rewritten at most once per batch even when the range is older than what is stored
+
+            Parameters:
+                        timestep (str): '5m' or '1h'
+                        start (int): unix timestamp of the first period (rounded down to the timestep)
+                        end (int): unix timestamp after the last period
+
+            Returns: the number of points stored
+
+        """
+
+        step = timesteps[timestep]
+        periods = range(int(start) - int(start) % step,int(end),step)
+        stored = 0
+        for i in range(0,len(periods),backfill_batch):
+            batch = {}
+            for timestamp in periods[i:i + backfill_batch]:
+                snapshot = _fetch_snapshot(timestep,timestamp)
+                if(snapshot.get('timestamp') is None):
+                    continue
+                for id, point in (snapshot.get('data') or {}).items():
+                    batch.setdefault(id,array('q')).extend(_record(point,snapshot['timestamp']))
+            width = len(columns)
+            for id, data in batch.items():
+                stored += self._store(id,timestep,[data[j:j + width] for j in range(0,len(data),width)])
+        return stored
+
+    def read(self,id,timestep:str,start:int = None,end:int = None):
+
+        """
+        Reads an item's stored series without touching the network
+
+            Parameters:
+                        id (int): item id
+                        timestep (str): '5m', '1h', '6h' or '24h'
+                        start (int): only include points at or after this timestamp (optional)
+                        end (int): only include points before this timestamp (optional)
+
+            Returns: a dict of columns {'timestamp':[...],'avgHighPrice':[...],...}
+                     missing prices/volumes are None, like in the api responses
+
+        """
+
+        data = self._load(self._path(id,timestep))
+        width = len(columns)
+        timestamps = data[::width]
+
+        lo = 0 if start is None else bisect.bisect_left(timestamps,start)
+        hi = len(timestamps) if end is None else bisect.bisect_left(timestamps,end)
+        data = data[lo*width:hi*width]
+
+        series = {'timestamp':data[::width].tolist()}
+        for i, column in enumerate(columns[1:],1):
+            series[column] = [None if v == MISSING else v for v in data[i::width]]
+        return series
+
+    def read_many(self,ids,timestep:str,start:int = None,end:int = None):
+
+        """
+        Reads several items' stored series
+
+            Returns: a dict {id: read(id, timestep, start, end)}
+
+        """
+
+        return {id:self.read(id,timestep,start,end) for id in ids}
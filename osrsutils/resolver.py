@@ -0,0 +1,280 @@
+"""
+Module implementing a typo tolerant item name resolver
+
+Names are normalized (lowered, apostrophes dropped, punctuation turned into spaces) and split into tokens.
+Every query token is matched against the vocabulary of name tokens through a trigram index:
+exact tokens, tokens starting with or containing the query token, and tokens within a small edit distance.
+Items are then ranked by how well their tokens cover the query, so "abysal whip" and "torag legs"
+resolve to Abyssal whip and Torag's platelegs.
+
+Typical usage:
+
+resolver = NameResolver(get_item_data())
+resolver.resolve('torag legs')          # the best Match (id, name, score) or None
+resolver.search('dragon scim', k = 5)   # the 5 best matches
+
+"""
+import bisect
+import heapq
+import re
+import threading
+from collections import namedtuple
+
+Match = namedtuple('Match',['id','name','score'])
+
+#similarity given to a query token found at the start of / inside a name token
+prefix_score = 0.9
+contains_score = 0.8
+
+#matches scoring less than this are dropped
+min_score = 0.5
+
+#number of query tokens whose matching name tokens are kept between searches
+match_cache_size = 4096
+
+_dropped = re.compile(r"['`]")
+_separators = re.compile(r'[^0-9a-z]+')
+
+def normalize(name:str):
+
+    """
+    Normalizes an item name for matching, i.e "Torag's platelegs (0)" -> 'torags platelegs 0'
+    """
+
+    return ' '.join(_separators.split(_dropped.sub('',str(name).lower()))).strip()
+
+def _padded_grams(token):
+    padded = '$' + token + '$'
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def max_edits(token:str):
+
+    """
+    Gets how many edits a query token may be away from a name token (none for tokens of 3 characters or less)
+    """
+
+    if(len(token) <= 3):
+        return 0
+    if(len(token) <= 7):
+        return 1
+    return 2
+
+def edit_distance(a:str,b:str,limit:int):
+
+    """
+    Computes the Levenshtein distance between a and b, giving up once it is known to be over limit
+
+        Returns: the distance, or limit + 1 if it is greater than limit
+
+    """
+
+    if(abs(len(a) - len(b)) > limit):
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a,1):
+        current = [i]
+        for j, cb in enumerate(b,1):
+            current.append(min(previous[j] + 1,current[j - 1] + 1,previous[j - 1] + (ca != cb)))
+        if(min(current) > limit):
+            return limit + 1
+        previous = current
+    return min(previous[-1],limit + 1)
+
+class NameResolver:
+
+    """
+    Resolves item names typed by users to item ids
+
+    Attributes:
+                names (dict): item id -> item name
+                ----
+                Indexes:
+                exact: normalized name -> ids
+                tokens: name token -> ids of the items containing it
+                vocabulary: every name token in sorted order (prefix lookups)
+                grams: trigram of a '$'-padded token -> tokens containing it (contains and edit distance lookups)
+
+    """
+
+    def __init__(self,items = ()):
+
+        """
+        Parameters:
+                    items (iterable): item records (dicts with 'id' and 'name'), such as get_item_data() or an ItemCatalog
+
+        """
+
+        self.names = {}
+        self._normalized = {}
+        self._exact = {}
+        self._tokens = {}
+        self._vocabulary = []
+        self._grams = {}
+        self._matches = {}
+        self._lock = threading.Lock()
+        for item in items:
+            self._add(item.get('id'),item.get('name'))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _add(self,id,name):
+        if(id is None or name is None):
+            return
+        normalized = normalize(name)
+        self.names[id] = name
+        self._normalized[id] = normalized
+        self._exact.setdefault(normalized,set()).add(id)
+        for token in set(normalized.split()):
+            ids = self._tokens.get(token)
+            if(ids is None):
+                ids = self._tokens[token] = set()
+                bisect.insort(self._vocabulary,token)
+                for gram in _padded_grams(token):
+                    self._grams.setdefault(gram,set()).add(token)
+            ids.add(id)
+
+    def _remove(self,id):
+        normalized = self._normalized.pop(id,None)
+        if(normalized is None):
+            return
+        del self.names[id]
+        self._exact[normalized].discard(id)
+        if(not self._exact[normalized]):
+            del self._exact[normalized]
+        for token in set(normalized.split()):
+            ids = self._tokens[token]
+            ids.discard(id)
+            if(not ids):
+                del self._tokens[token]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary,token)]
+                for gram in _padded_grams(token):
+                    self._grams[gram].discard(token)
+                    if(not self._grams[gram]):
+                        del self._grams[gram]
+
+    def update(self,changes):
+
+        """
+        Applies the changes of an item mapping update in place, only re-indexing the items that changed
+
+            Parameters: changes (CatalogChanges): see itemcatalog.diff_items() and osrsitems.update_item_data()
+
+        """
+
+        with self._lock:
+            self._matches.clear()
+            for id in changes.removed + changes.changed:
+                self._remove(id)
+            for id in changes.changed + changes.added:
+                record = changes.records[id]
+                self._add(record.get('id'),record.get('name'))
+
+    def _token_matches(self,token):
+
+        """
+        Gets the name tokens matching a query token
+
+            Returns: a dict {name token: similarity}
+
+        """
+
+        matches = {}
+        if(token in self._tokens):
+            matches[token] = 1.0
+
+        i = bisect.bisect_left(self._vocabulary,token)
+        while(i < len(self._vocabulary) and self._vocabulary[i].startswith(token)):
+            matches.setdefault(self._vocabulary[i],prefix_score)
+            i += 1
+        if(len(token) < 3):
+            return matches
+
+        #tokens containing every inner trigram of the query token contain it (checked below)
+        grams = _padded_grams(token)
+        inner = sorted((self._grams.get(g,()) for g in grams if '$' not in g),key = len)
+        if(inner and inner[0]):
+            candidates = set(inner[0]).intersection(*inner[1:])
+            for candidate in candidates:
+                if(token in candidate):
+                    matches.setdefault(candidate,contains_score)
+
+        #misspellings are only looked for when the token isn't a known word
+        limit = max_edits(token) if token not in self._tokens else 0
+        if(limit):
+            #every edit breaks at most 3 trigrams
+            needed = len(grams) - 3*limit
+            counts = {}
+            for gram in grams:
+                for candidate in self._grams.get(gram,()):
+                    counts[candidate] = counts.get(candidate,0) + 1
+            for candidate, count in counts.items():
+                if(count >= needed and candidate not in matches):
+                    distance = edit_distance(token,candidate,limit)
+                    if(distance <= limit):
+                        matches[candidate] = 1 - distance/max(len(token),len(candidate))
+        return matches
+
+    def search(self,name:str,k:int = 5):
+
+        """
+        Gets the items best matching a (possibly misspelled or partial) name
+
+            Parameters:
+                        name (str): the name to look up
+                        k (int): the maximum number of matches to return
+
+            Returns: a list of up to k Match(id, name, score) tuples, best first (score is between 0 and 1, 1 for an exact match)
+
+        """
+
+        query = normalize(name)
+        tokens = query.split()
+        if(not tokens):
+            return []
+
+        with self._lock:
+            #best similarity of each query token, per item
+            best = {}
+            for i, token in enumerate(dict.fromkeys(tokens)):
+                matches = self._matches.get(token)
+                if(matches is None):
+                    if(len(self._matches) >= match_cache_size):
+                        self._matches.clear()
+                    matches = self._matches[token] = self._token_matches(token)
+                for matched, similarity in matches.items():
+                    for id in self._tokens[matched]:
+                        scores = best.get(id)
+                        if(scores is None):
+                            scores = best[id] = {}
+                        if(similarity > scores.get(i,0)):
+                            scores[i] = similarity
+
+            n = len(dict.fromkeys(tokens))
+            ranked = []
+            for id, scores in best.items():
+                normalized = self._normalized[id]
+                if(normalized == query):
+                    score = 1.0
+                else:
+                    coverage = len(scores) / len(normalized.split())
+                    score = sum(scores.values()) / n * (0.8 + 0.2*min(1,coverage))
+                    if(normalized.startswith(query)):
+                        score = max(score,prefix_score + 0.05*len(query)/len(normalized))
+                    score = min(score,0.99)
+                if(score >= min_score):
+                    ranked.append((score,-len(normalized),-id,id))
+            top = heapq.nlargest(k,ranked)
+            return [Match(id,self.names[id],round(score,4)) for score, _, _, id in top]
+
+    def resolve(self,name:str):
+
+        """
+        Gets the best match for a name
+
+            Returns: a Match(id, name, score) or None if nothing matches well enough
+
+        """
+
+        matches = self.search(name,1)
+        return matches[0] if matches else None
@@ -0,0 +1,300 @@
+"""
+Module implementing a vectorized market screener
+
+The item mapping and a prices snapshot (/latest or /5m) are joined into NumPy arrays aligned by item id,
+so margins and profits for every tradeable item are computed in a handful of array operations.
+Requires numpy (pip install osrsutils[numpy])
+
+Typical usage:
+
+market = Market.load()
+profit = market.alch_profit(market.price_of(561))
+best = market.top(profit, 20, mask = market['limit'] >= 100)
+print(market.records(best, profit = profit))
+
+"""
+import numpy as np
+
+from . import osrsitems
+
+nature_rune = 561
+
+#grand exchange tax on the sale price, capped per item, items selling for less than tax_free_below are not taxed
+ge_tax_rate = 0.02
+ge_tax_cap = 5000000
+tax_free_below = 50
+tax_exempt_ids = frozenset([13190])
+
+#the buy limit resets every 4 hours
+limit_window_hours = 4
+
+mapping_fields = ('highalch','lowalch','value','limit')
+latest_fields = ('high','highTime','low','lowTime')
+average_fields = ('avgHighPrice','highPriceVolume','avgLowPrice','lowPriceVolume')
+
+#hours covered by the volumes of each averaged route
+route_hours = {'5m': 5/60, '1h': 1}
+
+def _column(records,field):
+    return np.fromiter((np.nan if r.get(field) is None else r[field] for r in records),dtype = np.float64,count = len(records))
+
+class Market:
+
+    """
+    Item mapping and prices joined into arrays sorted by item id
+
+    Price/volume arrays are float64 with NaN where a value is missing (untraded items, items without a buy limit...),
+    so results for those items are NaN and are never selected by comparisons or top().
+
+    Attributes:
+                ids (ndarray): int64 item ids in ascending order
+                names (ndarray): item names (object array)
+                members (ndarray): bool array
+                fields (dict): float64 arrays, the mapping fields (highalch, lowalch, value, limit)
+                               and the snapshot fields (high, low... for /latest, avgHighPrice, highPriceVolume... for /5m and /1h)
+                hours (float): hours covered by the snapshot volumes (None for /latest, which has no volumes)
+
+    """
+
+    def __init__(self,ids,names,members,fields,hours = None):
+        self.ids = ids
+        self.names = names
+        self.members = members
+        self.fields = fields
+        self.hours = hours
+
+    @classmethod
+    def from_data(cls,items,prices,hours = None):
+
+        """
+        Joins mapping records with a prices snapshot
+
+            Parameters:
+                        items (sequence): item mapping records (only items present in the snapshot are kept)
+                        prices (dict): the 'data' of a /latest, /5m or /1h response {'2':{'high':..,'low':..},...}
+                        hours (float): hours covered by the snapshot volumes (1/12 for /5m, 1 for /1h)
+
+            Returns: a Market
+
+        """
+
+        records = sorted((item for item in items if str(item.get('id')) in prices),key = lambda item: item['id'])
+        ids = np.fromiter((item['id'] for item in records),dtype = np.int64,count = len(records))
+        names = np.array([item.get('name') for item in records],dtype = object)
+        members = np.fromiter((bool(item.get('members')) for item in records),dtype = bool,count = len(records))
+
+        fields = {field:_column(records,field) for field in mapping_fields}
+        snapshot = [prices[str(id)] for id in ids.tolist()]
+        snapshot_fields = average_fields if snapshot and 'avgHighPrice' in snapshot[0] else latest_fields
+        for field in snapshot_fields:
+            fields[field] = _column(snapshot,field)
+        return cls(ids,names,members,fields,hours)
+
+    @classmethod
+    def load(cls,route:str = 'latest'):
+
+        """
+        Builds a Market from the item catalog and a fresh prices snapshot
+
+            Parameters:
+                        route (str): 'latest', '5m' or '1h'
+
+            Returns: a Market
+
+        """
+
+        if(route == 'latest'):
+            snapshot = osrsitems.get_latest_price()
+        elif(route == '5m'):
+            snapshot = osrsitems.get_5m_price()
+        elif(route == '1h'):
+            snapshot = osrsitems.get_1h_price()
+        else:
+            raise ValueError("Invalid route '{}'. Valid routes: latest, 5m, 1h".format(route))
+        return cls.from_data(osrsitems.get_catalog(),snapshot.get('data') or {},route_hours.get(route))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self,field):
+        if(field == 'id'):
+            return self.ids
+        if(field == 'name'):
+            return self.names
+        if(field == 'members'):
+            return self.members
+        return self.fields[field]
+
+    @property
+    def buy_price(self):
+
+        """
+        The instant buy price (latest high or average high price)
+        """
+
+        return self.fields['high'] if 'high' in self.fields else self.fields['avgHighPrice']
+
+    @property
+    def sell_price(self):
+
+        """
+        The instant sell price (latest low or average low price)
+        """
+
+        return self.fields['low'] if 'low' in self.fields else self.fields['avgLowPrice']
+
+    def positions(self,ids):
+
+        """
+        Gets the positions of item ids in the arrays
+
+            Returns: an int array, -1 where an id isn't in the market
+
+        """
+
+        ids = np.asarray(ids,dtype = np.int64)
+        if(not len(self.ids)):
+            return np.full(len(ids),-1)
+        pos = np.minimum(np.searchsorted(self.ids,ids),len(self.ids) - 1)
+        return np.where(self.ids[pos] == ids,pos,-1)
+
+    def price_of(self,id):
+
+        """
+        Gets the buy price of a single item (i.e price_of(561) for nature runes)
+
+            Returns: the price, NaN if the item has no price
+
+        """
+
+        pos = self.positions([id])[0]
+        return np.nan if pos < 0 else self.buy_price[pos]
+
+    def ge_tax(self,price = None):
+
+        """
+        Computes the grand exchange tax paid when selling at price
+
+            Parameters: price (float or ndarray): sale price(s) (optional, the buy price by default)
+                        Exempt items are only recognised when price is aligned with the market's ids
+
+            Returns: float64 array (a float for a single price)
+
+        """
+
+        price = self.buy_price if price is None else np.asarray(price,dtype = np.float64)
+        tax = np.where(price < tax_free_below,0,np.minimum(np.floor(price*ge_tax_rate),ge_tax_cap))
+        if(tax_exempt_ids and tax.ndim == 1 and len(tax) == len(self.ids)):
+            tax[np.isin(self.ids,list(tax_exempt_ids))] = 0
+        return tax if tax.ndim else float(tax)
+
+    def alch_profit(self,nature_rune_price = None):
+
+        """
+        Computes high alch profit: highalch - nature rune price - buy price
+
+            Parameters: nature_rune_price (float): price of a nature rune (optional, taken from the market by default)
+
+            Returns: float64 array
+
+        """
+
+        if(nature_rune_price is None):
+            nature_rune_price = self.price_of(nature_rune)
+        return self.fields['highalch'] - nature_rune_price - self.buy_price
+
+    def flip_margin(self):
+
+        """
+        Computes the flipping margin: sell at the high price, buy at the low price, pay G.E tax on the sale
+
+            Returns: float64 array
+
+        """
+
+        return self.buy_price - self.sell_price - self.ge_tax()
+
+    def profit_per_hour(self,profit = None,volume = None):
+
+        """
+        Computes profit per hour when buying the buy limit every limit window
+
+            Parameters:
+                        profit (ndarray): profit per item (optional, flip_margin() by default)
+                        volume (ndarray): items that can be bought per hour (optional, caps the buy limit)
+                                          For /5m and /1h markets the traded volume is used by default
+
+            Returns: float64 array, NaN where the buy limit (or the volume) is unknown
+
+        """
+
+        if(profit is None):
+            profit = self.flip_margin()
+        per_hour = self.fields['limit'] / limit_window_hours
+        if(volume is None and 'lowPriceVolume' in self.fields and self.hours):
+            volume = np.minimum(self.fields['lowPriceVolume'],self.fields['highPriceVolume']) / self.hours
+        if(volume is not None):
+            per_hour = np.minimum(per_hour,volume)
+        return profit * per_hour
+
+    def where(self,mask):
+
+        """
+        Gets a Market containing only the items where mask is True
+        """
+
+        mask = np.asarray(mask)
+        return Market(self.ids[mask],self.names[mask],self.members[mask],{k:v[mask] for k, v in self.fields.items()},self.hours)
+
+    def top(self,values,k:int,mask = None,ascending:bool = False):
+
+        """
+        Gets the positions of the k items with the largest (or smallest) values, best first
+        NaN values are never selected
+
+            Parameters:
+                        values (ndarray): values to rank
+                        k (int): the number of items
+                        mask (ndarray): only consider items where mask is True (optional)
+                        ascending (bool): select the smallest values instead
+
+            Returns: an int array of positions
+
+        """
+
+        values = np.asarray(values,dtype = np.float64)
+        valid = ~np.isnan(values)
+        if(mask is not None):
+            valid &= np.asarray(mask,dtype = bool)
+        candidates = np.flatnonzero(valid)
+        keys = values[candidates] if ascending else -values[candidates]
+        if(k < len(candidates)):
+            part = np.argpartition(keys,k)[:k]
+            candidates = candidates[part]
+            keys = keys[part]
+        return candidates[np.argsort(keys,kind = 'stable')]
+
+    def records(self,positions = None,**columns):
+
+        """
+        Converts items back to dicts
+
+            Parameters:
+                        positions (ndarray): positions to convert (optional, every item by default)
+                        columns: extra arrays to include, i.e profit = market.flip_margin()
+
+            Returns: a list of dicts {'id','name','members',mapping fields,snapshot fields,extra columns}
+
+        """
+
+        if(positions is None):
+            positions = np.arange(len(self.ids))
+        arrays = dict(self.fields,**columns)
+        results = []
+        for pos in np.asarray(positions).tolist():
+            record = {'id':int(self.ids[pos]),'name':self.names[pos],'members':bool(self.members[pos])}
+            for field, values in arrays.items():
+                v = values[pos]
+                record[field] = None if v != v else (int(v) if float(v).is_integer() else float(v))
+            results.append(record)
+        return results
@@ -0,0 +1,90 @@
+"""
+Module implementing request coalescing (single-flight)
+
+When several threads ask for the same key at the same time, only the first one runs the request;
+the others wait for it and get the same result (or the same exception).
+Nothing is cached: once the request finishes, the next call for the key runs a new request.
+
+Typical usage:
+
+inflight = SingleFlight()
+res = inflight.do(('ge', id), _ge_api_request, id)
+
+"""
+import threading
+
+from . import metrics
+
+class _Call:
+
+    __slots__ = ('done','result','error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+
+    """
+    Coalesces concurrent calls made with the same key
+
+    Attributes:
+                shared (int): calls that were answered by another thread's request
+
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def __len__(self):
+
+        """
+        The number of requests currently in flight
+        """
+
+        return len(self._calls)
+
+    def do(self,key,func,*args,**kwargs):
+
+        """
+        Calls func(*args, **kwargs), unless a call with the same key is already in flight,
+        in which case waits for it and returns its result
+
+            Parameters:
+                        key: a hashable identifying the request, i.e ('ge', 4151)
+                        func: the function making the request
+
+            Returns: whatever func returns
+
+            Raises: whatever func raises (every waiting caller gets the exception)
+
+        """
+
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if(leader):
+                call = self._calls[key] = _Call()
+            else:
+                self.shared += 1
+
+        if(not leader):
+            metrics.increment('singleflight.shared',route = str(key[0]) if isinstance(key,tuple) else str(key))
+            call.done.wait()
+            if(call.error is not None):
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func(*args,**kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
@@ -0,0 +1,345 @@
+"""
+Module implementing the HTTP transport shared by osrsitems and osrshiscores
+
+Every request goes through a pooled requests.Session (one per host) so connections are kept alive,
+failed requests (connection errors, timeouts, 429 and 5xx) are retried with exponential backoff,
+and each endpoint has a token bucket limiting how fast requests can be sent (retries take a token too).
+
+When a cache server is configured (see cacheserver, set_cache_server or the OSRSUTILS_CACHE_SERVER environment variable),
+requests to the prices, ge, graph and hiscores endpoints are sent through it instead, so every process on the host
+shares its response cache and rate limits.
+
+Typical usage:
+
+transport.set_rate_limit('graph', rate = 5, burst = 5)
+res = transport.get(url, endpoint = 'graph')
+
+transport.set_cache_server('http://127.0.0.1:8787')
+
+"""
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+from . import metrics
+
+#requests (and urllib3) take longer to import than the rest of the package, so they are imported when the first session is created
+requests = None
+HTTPAdapter = None
+
+def _import_requests():
+    global requests, HTTPAdapter
+    if(requests is None):
+        import requests as module
+        from requests.adapters import HTTPAdapter
+        requests = module
+
+def __getattr__(name):
+
+    """
+    Gives access to the requests exceptions without importing requests up front, i.e transport.HTTPError
+    """
+
+    if(name in ('HTTPError','RequestException','ConnectionError','Timeout')):
+        _import_requests()
+        return getattr(requests,name)
+    raise AttributeError('module {!r} has no attribute {!r}'.format(__name__,name))
+
+#(connect timeout, read timeout) in seconds
+timeout = (3.05, 10)
+retries = 3
+backoff_factor = 0.5
+backoff_max = 120
+retry_statuses = (429, 500, 502, 503, 504)
+pool_maxsize = 32
+
+class TokenBucket:
+
+    """
+    A thread-safe token bucket rate limiter
+
+    Attributes:
+                rate (float): tokens added to the bucket per second
+                capacity (float): the maximum number of tokens the bucket can hold (the burst size)
+
+    """
+
+    def __init__(self,rate:float,capacity:float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self,tokens:float = 1):
+
+        """
+        Takes tokens from the bucket without waiting
+
+            Returns: the number of seconds the caller has to wait before the tokens are available (0 if available now)
+
+        """
+
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity,self._tokens + (now - self._updated)*self.rate)
+            self._updated = now
+            self._tokens -= tokens
+            if(self._tokens >= 0):
+                return 0
+            return -self._tokens / self.rate
+
+    def acquire(self,tokens:float = 1):
+
+        """
+        Takes tokens from the bucket, sleeping until they are available
+
+            Returns: the number of seconds spent waiting
+
+        """
+
+        wait = self.reserve(tokens)
+        if(wait > 0):
+            time.sleep(wait)
+        return wait
+
+#requests per second and burst size for each endpoint
+rate_limits = {
+    'prices': (5, 10),
+    'ge': (2, 2),
+    'graph': (2, 2),
+    'hiscores': (2, 4),
+}
+
+#url of the local cache server requests are routed through (None sends requests directly)
+cache_server = os.environ.get('OSRSUTILS_CACHE_SERVER') or None
+
+#endpoints routed through the cache server
+cached_endpoints = ('prices','ge','graph','hiscores')
+
+_limiters = {endpoint: TokenBucket(rate,burst) for endpoint, (rate, burst) in rate_limits.items()}
+_sessions = {}
+_lock = threading.Lock()
+
+def set_rate_limit(endpoint:str,rate:float = None,burst:float = 1):
+
+    """
+    Sets the rate limit for an endpoint
+
+        Parameters:
+                    endpoint (str): 'prices', 'ge', 'graph', 'hiscores' (or any other name passed to get())
+                    rate (float): requests per second, None disables rate limiting for the endpoint
+                    burst (float): how many requests can be sent at once before the rate applies
+
+    """
+
+    with _lock:
+        if(rate is None):
+            rate_limits.pop(endpoint,None)
+            _limiters.pop(endpoint,None)
+        else:
+            rate_limits[endpoint] = (rate, burst)
+            _limiters[endpoint] = TokenBucket(rate,burst)
+
+def get_limiter(endpoint:str):
+
+    """
+    Gets the token bucket used for an endpoint (or None if the endpoint isn't rate limited)
+    """
+
+    return _limiters.get(endpoint)
+
+def set_cache_server(url:str = None):
+
+    """
+    Routes the prices, ge, graph and hiscores requests through a cache server (see cacheserver)
+
+        Parameters:
+                    url (str): the server's url, i.e 'http://127.0.0.1:8787' (None sends requests directly again)
+
+    """
+
+    global cache_server
+    cache_server = url.rstrip('/') if url else None
+
+def configure(timeout = None, retries:int = None, backoff_factor:float = None, pool_maxsize:int = None):
+
+    """
+    Changes the transport settings. Existing sessions are closed and recreated on the next request
+
+        Parameters:
+                    timeout: seconds (float) or a (connect, read) tuple
+                    retries (int): how many times a request is retried on connection errors, 429 and 5xx responses
+                    backoff_factor (float): retries wait backoff_factor * 2^(retry - 1) seconds (or the Retry-After header)
+                    pool_maxsize (int): how many connections are kept open per host
+
+    """
+
+    settings = globals()
+    for name, value in (('timeout',timeout),('retries',retries),('backoff_factor',backoff_factor),('pool_maxsize',pool_maxsize)):
+        if(value is not None):
+            settings[name] = value
+    close()
+
+def grow_pool(size:int):
+
+    """
+    Makes sure at least size connections can be kept open per host
+    Unlike configure(), existing sessions are not closed: they get a larger connection pool for their next requests
+    (requests already in flight finish on the previous pool)
+
+        Parameters:
+                    size (int): the number of connections needed
+
+    """
+
+    global pool_maxsize
+    with _lock:
+        if(size <= pool_maxsize):
+            return
+        pool_maxsize = size
+        for session in _sessions.values():
+            adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = pool_maxsize, max_retries = 0)
+            session.mount('http://',adapter)
+            session.mount('https://',adapter)
+
+def close():
+
+    """
+    Closes every pooled session
+    """
+
+    with _lock:
+        sessions = list(_sessions.values())
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+def _new_session():
+    _import_requests()
+    #retries are made by get_direct, so each attempt goes through the endpoint's rate limit
+    adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = pool_maxsize, max_retries = 0)
+    session = requests.Session()
+    session.mount('http://',adapter)
+    session.mount('https://',adapter)
+    return session
+
+def get_session(url:str):
+
+    """
+    Gets the pooled session used for the host in url
+    """
+
+    host = urlsplit(url).netloc
+    session = _sessions.get(host)
+    if(session is None):
+        with _lock:
+            session = _sessions.get(host)
+            if(session is None):
+                session = _new_session()
+                _sessions[host] = session
+    return session
+
+def get(url:str, endpoint:str = None, params = None, headers = None, stream:bool = False, route:str = None):
+
+    """
+    Sends a GET request through the pooled session for the url's host, after waiting on the endpoint's rate limit
+    (or through the cache server if one is configured, which applies the rate limit and the retries instead)
+    Status codes are not checked, call raise_for_status() on the response if needed
+
+        Parameters:
+                    url (str): url to request
+                    endpoint (str): name of the rate limit to apply (optional)
+                    params: Dict, list or tuple to send as a query string (optional)
+                    headers (dict): request headers (optional)
+                    stream (bool): whether to defer downloading the response body
+                    route (str): name the request is recorded under in metrics (optional, the endpoint by default)
+
+        Returns:
+                    requests.Response object containing the servers response
+
+    """
+
+    if(cache_server is not None and endpoint in cached_endpoints):
+        _import_requests()
+        upstream = requests.Request('GET',url,params = params).prepare().url
+        #the server already retried upstream, retrying its 429/5xx here would multiply the upstream requests
+        return get_direct(cache_server + '/fetch', params = {'endpoint':endpoint,'url':upstream}, headers = headers,
+                          stream = stream, route = route or endpoint, max_retries = 0)
+    return get_direct(url,endpoint,params,headers,stream,route)
+
+def get_direct(url:str, endpoint:str = None, params = None, headers = None, stream:bool = False, route:str = None,
+               max_retries:int = None):
+
+    """
+    Sends a GET request to url itself, ignoring the cache server (takes the same parameters as get())
+    Connection errors, timeouts and retry_statuses responses are retried up to max_retries times (retries by default),
+    every attempt waiting on the endpoint's rate limit
+    """
+
+    _import_requests()
+    if(max_retries is None):
+        max_retries = retries
+    limiter = _limiters.get(endpoint)
+    route = route or endpoint or urlsplit(url).netloc
+    start = time.perf_counter()
+    attempt = 0
+    while(True):
+        if(limiter is not None):
+            wait = limiter.acquire()
+            if(wait and metrics.enabled):
+                metrics.observe('ratelimit.wait',wait,endpoint = endpoint)
+        try:
+            res = get_session(url).get(url, params = params, headers = headers, timeout = timeout, stream = stream)
+        except (requests.ConnectionError,requests.Timeout) as e:
+            if(attempt < max_retries):
+                attempt += 1
+                time.sleep(_backoff(attempt))
+                continue
+            if(metrics.enabled):
+                metrics.record_request(route,time.perf_counter() - start,type(e).__name__,retries = attempt)
+            raise
+        except requests.RequestException as e:
+            if(metrics.enabled):
+                metrics.record_request(route,time.perf_counter() - start,type(e).__name__,retries = attempt)
+            raise
+        if(res.status_code not in retry_statuses or attempt >= max_retries):
+            break
+        attempt += 1
+        delay = _retry_after(res)
+        res.close()
+        time.sleep(_backoff(attempt) if delay is None else delay)
+
+    if(metrics.enabled):
+        _record_response(route,res,time.perf_counter() - start,stream,attempt)
+    return res
+
+def _backoff(attempt):
+    return min(backoff_max,backoff_factor * 2**(attempt - 1))
+
+def _retry_after(res):
+
+    """
+    Gets the seconds to wait from a response's Retry-After header (seconds or an HTTP date), None if it has none
+    """
+
+    value = res.headers.get('Retry-After')
+    if(not value):
+        return None
+    try:
+        return min(backoff_max,max(0,float(value)))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+    try:
+        return min(backoff_max,max(0,parsedate_to_datetime(value).timestamp() - time.time()))
+    except (TypeError,ValueError):
+        return None
+
+def _record_response(route,res,seconds,stream,retries):
+    if(stream):
+        size = int(res.headers.get('Content-Length') or 0)
+    else:
+        size = len(res.content)
+    metrics.record_request(route,seconds,res.status_code,size,retries)
@@ -0,0 +1,461 @@
+"""
+Module implementing a price watcher that polls the prices api once for many consumers
+
+Each poll of /latest (or /5m, /1h) is turned into arrays sorted by item id and compared with the previous
+snapshot in a few array operations. Subscribers only receive the items that changed (a PriceDelta),
+optionally narrowed down by vectorized filters such as margin_moved(pct = 5).
+Requires numpy (pip install osrsutils[numpy])
+
+Typical usage:
+
+watcher = PriceWatcher(intervals = {'latest': 60, '5m': 300})
+watcher.subscribe(lambda delta: print(delta.records()), filter = margin_moved(pct = 5))
+subscription = watcher.subscribe_queue(filter = watched_ids([4151, 11832]))
+watcher.start()
+
+async for delta in watcher.stream(filter = price_moved('high', pct = 2)):
+    ...
+
+"""
+import asyncio
+import queue
+import threading
+import time
+
+import numpy as np
+
+from . import metrics
+from . import osrsitems
+
+#fields kept for each route, and the (high, low) price fields the margin is computed from
+route_fields = {
+    'latest': ('high','highTime','low','lowTime'),
+    '5m': ('avgHighPrice','highPriceVolume','avgLowPrice','lowPriceVolume'),
+    '1h': ('avgHighPrice','highPriceVolume','avgLowPrice','lowPriceVolume'),
+}
+price_fields = {
+    'latest': ('high','low'),
+    '5m': ('avgHighPrice','avgLowPrice'),
+    '1h': ('avgHighPrice','avgLowPrice'),
+}
+
+_requests = {
+    'latest': 'get_latest_price',
+    '5m': 'get_5m_price',
+    '1h': 'get_1h_price',
+}
+
+class PriceSnapshot:
+
+    """
+    One poll of a route as arrays sorted by item id
+
+    Attributes:
+                route (str): 'latest', '5m' or '1h'
+                timestamp (int): the snapshot's timestamp (the response timestamp for /5m and /1h, the poll time for /latest)
+                ids (ndarray): int64 item ids in ascending order
+                values (ndarray): float64 array of shape (len(ids), len(route_fields[route])), NaN where a value is missing
+
+    """
+
+    def __init__(self,route,timestamp,ids,values):
+        self.route = route
+        self.timestamp = timestamp
+        self.ids = ids
+        self.values = values
+
+    @classmethod
+    def from_data(cls,route:str,data:dict,timestamp:int = None):
+
+        """
+        Builds a snapshot from the 'data' of a prices api response {'2':{'high':..,'low':..},...}
+        """
+
+        fields = route_fields[route]
+        ids = np.fromiter((int(k) for k in data),dtype = np.int64,count = len(data))
+        records = list(data.values())
+        values = np.array([[np.nan if r.get(f) is None else r[f] for f in fields] for r in records],dtype = np.float64)
+        values = values.reshape(len(records),len(fields))
+        order = np.argsort(ids,kind = 'stable')
+        return cls(route,int(time.time() if timestamp is None else timestamp),ids[order],values[order])
+
+    def __len__(self):
+        return len(self.ids)
+
+    def field(self,name:str):
+        return self.values[:,route_fields[self.route].index(name)]
+
+class PriceDelta:
+
+    """
+    The items that changed between two snapshots of a route
+
+    Attributes:
+                route (str): 'latest', '5m' or '1h'
+                timestamp (int): timestamp of the newer snapshot
+                ids (ndarray): int64 ids of the changed items (items new in the snapshot are included, with NaN old values)
+                old (ndarray): float64 values in the previous snapshot, shape (len(ids), len(route_fields[route]))
+                new (ndarray): float64 values in the new snapshot
+
+    """
+
+    def __init__(self,route,timestamp,ids,old,new):
+        self.route = route
+        self.timestamp = timestamp
+        self.ids = ids
+        self.old = old
+        self.new = new
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return len(self.ids) > 0
+
+    def __repr__(self):
+        return 'PriceDelta(route={!r}, timestamp={}, items={})'.format(self.route,self.timestamp,len(self.ids))
+
+    def field(self,name:str):
+
+        """
+        Gets one field before and after the change
+
+            Returns: (old ndarray, new ndarray)
+
+        """
+
+        i = route_fields[self.route].index(name)
+        return self.old[:,i], self.new[:,i]
+
+    def margin(self):
+
+        """
+        Gets the margin (high - low) before and after the change
+
+            Returns: (old ndarray, new ndarray)
+
+        """
+
+        high, low = price_fields[self.route]
+        old_high, new_high = self.field(high)
+        old_low, new_low = self.field(low)
+        return old_high - old_low, new_high - new_low
+
+    def select(self,mask):
+
+        """
+        Gets the delta of the items selected by a bool mask (or an array of positions)
+        """
+
+        return PriceDelta(self.route,self.timestamp,self.ids[mask],self.old[mask],self.new[mask])
+
+    def records(self):
+
+        """
+        Converts the delta to a list of dicts, i.e {'id':4151,'high':..,'low':..,'old':{'high':..,'low':..}}
+        Missing values are None
+        """
+
+        fields = route_fields[self.route]
+        old = np.where(np.isnan(self.old),None,self.old).tolist()
+        new = np.where(np.isnan(self.new),None,self.new).tolist()
+        records = []
+        for id, old_row, new_row in zip(self.ids.tolist(),old,new):
+            record = {'id':id}
+            record.update((f,None if v is None else int(v)) for f, v in zip(fields,new_row))
+            record['old'] = {f:None if v is None else int(v) for f, v in zip(fields,old_row)}
+            records.append(record)
+        return records
+
+def diff_snapshots(old:PriceSnapshot,new:PriceSnapshot):
+
+    """
+    Compares two snapshots of the same route
+
+        Returns: a PriceDelta of the items whose values changed or that are new in the snapshot
+
+    """
+
+    positions = np.searchsorted(old.ids,new.ids)
+    positions[positions >= len(old.ids)] = 0
+    found = (old.ids[positions] == new.ids) if len(old.ids) else np.zeros(len(new.ids),dtype = bool)
+    before = np.full(new.values.shape,np.nan)
+    before[found] = old.values[positions[found]]
+    same = (before == new.values) | (np.isnan(before) & np.isnan(new.values))
+    changed = ~found | ~same.all(axis = 1)
+    return PriceDelta(new.route,new.timestamp,new.ids[changed],before[changed],new.values[changed])
+
+def _relative(old,new,pct,absolute):
+    moved = np.abs(new - old)
+    with np.errstate(divide = 'ignore',invalid = 'ignore'):
+        mask = np.ones(len(moved),dtype = bool)
+        if(absolute is not None):
+            mask &= moved >= absolute
+        if(pct is not None):
+            mask &= moved * 100 >= pct * np.abs(old)
+    #comparisons with NaN (new items, missing values) are False
+    return mask & ~np.isnan(moved)
+
+def price_moved(field:str,pct:float = None,absolute:float = None):
+
+    """
+    Filter selecting items where a field moved by at least pct percent and/or absolute gp
+    i.e price_moved('high', pct = 2)
+    """
+
+    def mask(delta):
+        return _relative(*delta.field(field),pct,absolute)
+    return mask
+
+def margin_moved(pct:float = None,absolute:float = None):
+
+    """
+    Filter selecting items whose margin (high - low) moved by at least pct percent and/or absolute gp
+    """
+
+    def mask(delta):
+        return _relative(*delta.margin(),pct,absolute)
+    return mask
+
+def watched_ids(ids):
+
+    """
+    Filter selecting only the given item ids
+    """
+
+    ids = np.asarray(sorted(int(id) for id in ids),dtype = np.int64)
+    def mask(delta):
+        return np.isin(delta.ids,ids,assume_unique = True)
+    return mask
+
+class Subscription:
+
+    """
+    A consumer of a watcher's deltas
+
+    Attributes:
+                route (str): the route the subscription receives deltas for
+                filter: a function taking a PriceDelta and returning a bool mask of the items to keep (or a list of them, all must match)
+                callback: the function called with each filtered delta (None for queue subscriptions)
+                queue (queue.Queue): the queue filtered deltas are put in (None for callback subscriptions)
+
+    """
+
+    def __init__(self,route,filter = None,callback = None,queue = None):
+        self.route = route
+        self.filter = filter
+        self.callback = callback
+        self.queue = queue
+
+    def apply(self,delta:PriceDelta):
+
+        """
+        Gets the part of delta matching the subscription's filter
+        """
+
+        filters = self.filter if isinstance(self.filter,(list,tuple)) else [self.filter]
+        mask = None
+        for f in filters:
+            if(f is not None):
+                mask = f(delta) if mask is None else mask & f(delta)
+        return delta if mask is None else delta.select(mask)
+
+    def deliver(self,delta:PriceDelta):
+        if(self.callback is not None):
+            self.callback(delta)
+            return
+        try:
+            self.queue.put_nowait(delta)
+        except queue.Full:
+            #slow consumers lose the oldest delta rather than blocking the watcher
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.queue.put_nowait(delta)
+
+class PriceWatcher:
+
+    """
+    Polls prices api routes at a fixed cadence and pushes the changed items to every subscriber
+
+    Attributes:
+                intervals (dict): seconds between polls of each route, i.e {'latest': 60, '5m': 300}
+                snapshots (dict): the last snapshot of each route
+
+    """
+
+    def __init__(self,intervals:dict = None):
+
+        """
+        Parameters:
+                    intervals (dict): routes to poll and the seconds between polls (optional, {'latest': 60} by default)
+
+        """
+
+        self.intervals = dict({'latest':60} if intervals is None else intervals)
+        for route in self.intervals:
+            if(route not in route_fields):
+                raise ValueError('Unsupported route {!r}, expected one of {}'.format(route,list(route_fields)))
+        self.snapshots = {}
+        self._subscriptions = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self,callback,route:str = 'latest',filter = None):
+
+        """
+        Calls callback with every non empty PriceDelta of route (from the polling thread)
+
+            Parameters:
+                        callback: a function taking a PriceDelta
+                        route (str): 'latest', '5m' or '1h'
+                        filter: a filter (see price_moved, margin_moved, watched_ids) or a list of filters (optional)
+
+            Returns: a Subscription (pass it to unsubscribe() to stop receiving deltas)
+
+        """
+
+        return self._add(Subscription(route,filter,callback = callback))
+
+    def subscribe_queue(self,route:str = 'latest',filter = None,maxsize:int = 0):
+
+        """
+        Puts every non empty PriceDelta of route in a queue.Queue (subscription.queue)
+        If the queue is full the oldest delta is dropped
+
+            Returns: a Subscription
+
+        """
+
+        return self._add(Subscription(route,filter,queue = queue.Queue(maxsize)))
+
+    def _add(self,subscription):
+        with self._lock:
+            self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self,subscription:Subscription):
+        with self._lock:
+            if(subscription in self._subscriptions):
+                self._subscriptions.remove(subscription)
+
+    async def stream(self,route:str = 'latest',filter = None,maxsize:int = 0):
+
+        """
+        Async iterator over the non empty PriceDeltas of route
+        The watcher must be running (start()) or polled from elsewhere
+
+            Usage: async for delta in watcher.stream(filter = margin_moved(pct = 5)):
+
+        """
+
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue(maxsize)
+
+        def put(delta):
+            if(deltas.full()):
+                deltas.get_nowait()
+            deltas.put_nowait(delta)
+
+        subscription = self.subscribe(lambda delta: loop.call_soon_threadsafe(put,delta),route,filter)
+        try:
+            while(True):
+                yield await deltas.get()
+        finally:
+            self.unsubscribe(subscription)
+
+    def _fetch(self,route):
+
+        """
+        Gets a snapshot of a route (None if the response is empty or isn't a prices api response)
+        """
+
+        response = getattr(osrsitems,_requests[route])()
+        data = response.get('data') if isinstance(response,dict) else None
+        if(not isinstance(data,dict)):
+            return None
+        data = {id:record for id, record in data.items() if isinstance(record,dict)}
+        if(not data):
+            return None
+        return PriceSnapshot.from_data(route,data,response.get('timestamp'))
+
+    def poll(self,route:str = 'latest'):
+
+        """
+        Polls a route once and pushes the changes to the subscribers
+        The first poll of a route only records the snapshot, an empty response is skipped (the last snapshot is kept)
+
+            Returns: the PriceDelta (None for the first poll or if the request failed or returned nothing)
+
+        """
+
+        with metrics.timer('watcher.poll',route = route):
+            snapshot = self._fetch(route)
+            if(snapshot is None):
+                return None
+            previous = self.snapshots.get(route)
+            self.snapshots[route] = snapshot
+            if(previous is None):
+                return None
+            delta = diff_snapshots(previous,snapshot)
+
+        metrics.increment('watcher.changes',len(delta),route = route)
+        if(delta):
+            with self._lock:
+                subscriptions = [s for s in self._subscriptions if s.route == route]
+            for subscription in subscriptions:
+                #a failing filter or callback doesn't keep the other subscribers from their delta
+                try:
+                    selected = subscription.apply(delta)
+                    if(selected):
+                        subscription.deliver(selected)
+                except Exception as e:
+                    print(e)
+        return delta
+
+    def _run(self):
+        due = {route: 0 for route in self.intervals}
+        while(not self._stop.is_set()):
+            now = time.monotonic()
+            for route, when in due.items():
+                if(when <= now):
+                    #a failed poll is retried at the next interval instead of ending the thread
+                    try:
+                        self.poll(route)
+                    except Exception as e:
+                        metrics.increment('watcher.errors',route = route)
+                        print(e)
+                    due[route] = time.monotonic() + self.intervals[route]
+            self._stop.wait(max(0,min(due.values()) - time.monotonic()))
+
+    def start(self):
+
+        """
+        Starts polling in a background thread
+        """
+
+        if(self._thread is not None and self._thread.is_alive()):
+            return self
+        self._stop.clear()
+        self._thread = threading.Thread(target = self._run,name = 'osrsutils-price-watcher',daemon = True)
+        self._thread.start()
+        return self
+
+    def stop(self,timeout:float = None):
+
+        """
+        Stops the background thread
+        """
+
+        self._stop.set()
+        if(self._thread is not None):
+            self._thread.join(timeout)
+            self._thread = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self,*exc):
+        self.stop()
@@ -11,6 +11,7 @@ setup(
     url='https://github.com/Flailfish/osrsutils',
     version="1.0",
     install_requires=requirements,
+    extras_require={'numpy': ['numpy']},
     description = 'API wrapper for osrs wiki api and osrs index_lite',
     python_requires='>=3.7.0',
     packages = ['osrsutils'],
@@ -0,0 +1,80 @@
+import random
+import unittest
+from multiprocessing import shared_memory
+from unittest import mock
+
+import numpy as np
+
+from osrsutils import analytics
+
+def random_panel(seed,n,t):
+
+    """
+    A panel of n items over t timestamps, with gaps and items missing the start or end of the window
+    """
+
+    rng = random.Random(seed)
+    series = {}
+    for id in range(1,n + 1):
+        start, stop = rng.randrange(t // 3), t - rng.randrange(t // 3)
+        price = rng.randint(10,10000)
+        points = []
+        for ts in range(start,stop):
+            price = max(1,int(price*rng.uniform(0.95,1.05)))
+            if(rng.random() < 0.1):
+                continue
+            points.append({'timestamp':1000 + 300*ts,
+                           'avgHighPrice':price + rng.randint(0,5) if rng.random() > 0.1 else None,
+                           'avgLowPrice':price if rng.random() > 0.1 else None,
+                           'highPriceVolume':rng.randint(0,500),'lowPriceVolume':rng.randint(0,500)})
+        series[id] = points
+    return analytics.TimeSeriesPanel.from_series(series)
+
+class Recorder(shared_memory.SharedMemory):
+
+    """
+    SharedMemory remembering the segments created by the process it is used in
+    """
+
+    created = []
+
+    def __init__(self,name = None,create = False,size = 0):
+        super().__init__(name = name,create = create,size = size)
+        if(create):
+            Recorder.created.append(self.name)
+
+class AnalyzeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.patch = mock.patch.object(analytics,'min_parallel_items',8)
+        self.patch.start()
+        self.panel = random_panel(1,40,60)
+        Recorder.created = []
+
+    def tearDown(self):
+        self.patch.stop()
+
+    def test_parallel_matches_serial(self):
+        basket = [1,2,3]
+        serial = analytics.analyze(self.panel,6,basket,workers = 1)
+        with mock.patch.object(shared_memory,'SharedMemory',Recorder):
+            parallel = analytics.analyze(self.panel,6,basket,workers = 3)
+        #the pool path was taken
+        self.assertEqual(len(Recorder.created),3)
+        self.assertEqual(set(parallel),set(analytics.statistics) | {'correlation'})
+        for name, values in serial.items():
+            self.assertEqual(parallel[name].shape,values.shape)
+            np.testing.assert_allclose(parallel[name],values,rtol = 1e-12,equal_nan = True,err_msg = name)
+
+    def test_segments_unlinked_when_worker_raises(self):
+        with mock.patch.object(shared_memory,'SharedMemory',Recorder):
+            #the window is only used by the workers, which fail on it
+            with self.assertRaises(TypeError):
+                analytics.analyze(self.panel,'x',workers = 3)
+        self.assertEqual(len(Recorder.created),3)
+        for name in Recorder.created:
+            with self.assertRaises(FileNotFoundError):
+                shared_memory.SharedMemory(name = name)
+
+if __name__ == '__main__':
+    unittest.main()
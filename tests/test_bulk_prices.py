@@ -0,0 +1,51 @@
+import json
+import os
+import socket
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import osrsitems, transport
+from stubserver import StubServer
+
+def closed_port_url():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1',0))
+        return 'http://127.0.0.1:{}'.format(s.getsockname()[1])
+
+class BulkPricesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = StubServer().start()
+        self.server.install()
+        self.saved = (transport.retries,transport.rate_limits.get('graph'))
+        transport.configure(retries = 0)
+        transport.set_rate_limit('graph',None)
+        self.latest = json.loads(self.server.payloads['latest'])['data']
+        self.graph_price = list(json.loads(self.server.payloads['graph'])['daily'].values())[-1]
+
+    def tearDown(self):
+        transport.configure(retries = self.saved[0])
+        transport.set_rate_limit('graph',*self.saved[1])
+        self.server.stop()
+
+    def test_latest_then_graphs(self):
+        prices = osrsitems.get_current_prices([4151,2,900000,4151])
+        self.assertEqual(list(prices),[4151,2,900000])
+        self.assertEqual(prices[4151],(self.latest['4151']['high'] + self.latest['4151']['low']) // 2)
+        self.assertEqual(prices[900000],self.graph_price)
+        self.assertEqual(osrsitems.get_current_prices([4151],use_latest = False),{4151:self.graph_price})
+
+    def test_graph_errors_lose_one_price(self):
+        self.server.queue_statuses(200,500)
+        self.assertEqual(osrsitems.get_current_prices([4151,900000]),{4151:osrsitems.get_current_prices([4151])[4151],900000:0})
+
+        #the graphs can't be reached: the /latest prices are kept
+        osrsitems.graph_endpoint = closed_port_url() + '/graph/'
+        prices = osrsitems.get_current_prices([4151,900000,900001])
+        self.assertEqual(prices[4151],(self.latest['4151']['high'] + self.latest['4151']['low']) // 2)
+        self.assertEqual((prices[900000],prices[900001]),(0,0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import transport
+from osrsutils.cache import ResponseCache
+from stubserver import StubServer
+
+class ResponseCacheTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer().start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.saved = transport.backoff_factor
+        transport.configure(backoff_factor = 0)
+
+    def tearDown(self):
+        transport.configure(backoff_factor = self.saved)
+
+    def request(self,route):
+        url = '{}/prices/{}'.format(self.server.url,route)
+        return lambda headers: transport.get(url,headers = headers)
+
+    def test_ttl_and_revalidation(self):
+        cache = ResponseCache(ttls = {'latest':0.3})
+        requests, not_modified = self.server.requests, self.server.not_modified
+        first = cache.fetch('latest',None,self.request('latest'))
+        self.assertEqual(first.status_code,200)
+        self.assertIs(cache.fetch('latest',None,self.request('latest')),first)
+        self.assertEqual(self.server.requests - requests,1)
+
+        time.sleep(0.35)
+        #expired: revalidated with If-None-Match, the stub answers 304 and the cached response is kept
+        self.assertIs(cache.fetch('latest',None,self.request('latest')),first)
+        self.assertEqual(self.server.requests - requests,2)
+        self.assertEqual(self.server.not_modified - not_modified,1)
+        self.assertIs(cache.fetch('latest',None,self.request('latest')),first)
+        self.assertEqual(self.server.requests - requests,2)
+        self.assertEqual(cache.stats()['hits'],2)
+        self.assertEqual(cache.stats()['misses'],1)
+        self.assertEqual(cache.stats()['revalidations'],1)
+
+    def test_changed_payload_replaces_entry(self):
+        cache = ResponseCache(ttls = {'latest':0.1})
+        first = cache.fetch('latest',None,self.request('latest'))
+        time.sleep(0.15)
+        saved = self.server.payloads['latest']
+        self.server.payloads['latest'] = b'{"data":{}}'
+        try:
+            second = cache.fetch('latest',None,self.request('latest'))
+        finally:
+            self.server.payloads['latest'] = saved
+        self.assertIsNot(second,first)
+        self.assertEqual(second.json(),{'data':{}})
+        self.assertIs(cache.fetch('latest',None,self.request('latest')),second)
+
+    def test_revalidate_before_expiry(self):
+        cache = ResponseCache(ttls = {'mapping':3600})
+        first = cache.fetch('mapping',None,self.request('mapping'))
+        requests, not_modified = self.server.requests, self.server.not_modified
+        self.assertIs(cache.fetch('mapping',None,self.request('mapping'),revalidate = True),first)
+        self.assertEqual((self.server.requests - requests,self.server.not_modified - not_modified),(1,1))
+        saved = self.server.payloads['mapping']
+        self.server.payloads['mapping'] = b'[]'
+        try:
+            self.assertIs(cache.fetch('mapping',None,self.request('mapping')),first)
+            second = cache.fetch('mapping',None,self.request('mapping'),revalidate = True)
+        finally:
+            self.server.payloads['mapping'] = saved
+        self.assertEqual(second.json(),[])
+        self.assertIs(cache.fetch('mapping',None,self.request('mapping')),second)
+
+    def test_errors_and_disabled_routes_not_cached(self):
+        cache = ResponseCache(ttls = {'latest':60,'mapping':0})
+        self.server.queue_statuses(404)
+        self.assertEqual(cache.fetch('latest',None,self.request('latest')).status_code,404)
+        self.assertEqual(len(cache),0)
+        self.assertEqual(cache.fetch('latest',None,self.request('latest')).status_code,200)
+        self.assertEqual(len(cache),1)
+        requests = self.server.requests
+        cache.fetch('mapping',None,self.request('mapping'))
+        cache.fetch('mapping',None,self.request('mapping'))
+        self.assertEqual(self.server.requests - requests,2)
+        self.assertEqual(len(cache),1)
+
+    def test_params_and_eviction(self):
+        cache = ResponseCache(ttls = {'5m':60},max_entries = 2)
+        for timestamp in (300,600,900):
+            cache.fetch('5m',{'timestamp':timestamp},self.request('5m'))
+        self.assertEqual(len(cache),2)
+        self.assertEqual(cache.stats()['evictions'],1)
+        requests = self.server.requests
+        cache.fetch('5m',{'timestamp':900},self.request('5m'))
+        self.assertEqual(self.server.requests,requests)
+        cache.fetch('5m',{'timestamp':300},self.request('5m'))
+        self.assertEqual(self.server.requests,requests + 1)
+        cache.invalidate('5m')
+        self.assertEqual(len(cache),0)
+
+if __name__ == '__main__':
+    unittest.main()
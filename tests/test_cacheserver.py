@@ -0,0 +1,108 @@
+import os
+import sys
+import time
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import osrsitems, transport
+from osrsutils.cacheserver import CacheServer
+from stubserver import StubServer
+
+class CacheServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.stub = StubServer().start()
+        self.stub.install()
+        self.server = CacheServer(port = 0,ttls = {'latest':0.3,'ge':60}).start()
+
+    def tearDown(self):
+        transport.set_cache_server(None)
+        self.server.stop()
+        self.stub.stop()
+
+    def fetch(self,endpoint,url,headers = None):
+        return transport.get_direct(self.server.url + '/fetch',params = {'endpoint':endpoint,'url':url},headers = headers)
+
+    def test_only_allowed_prefixes(self):
+        for endpoint, url in (('prices','http://example.com/prices/latest'),
+                              ('prices',self.stub.url + '/ge/detail.json?item=2'),
+                              ('nope',self.stub.url + '/prices/latest')):
+            res = self.fetch(endpoint,url)
+            self.assertEqual(res.status_code,400,url)
+        self.assertEqual(self.server.upstream_requests,0)
+        self.assertEqual(self.fetch('prices',self.stub.url + '/prices/latest').status_code,200)
+
+    def test_hiscores_only_index_lite(self):
+        for url in (self.stub.url + '/m=hiscore_oldschool/overall?table=0',self.stub.url + '/other/index_lite.ws?player=a',
+                    self.stub.url + '/m=hiscore_oldschool/index_lite.json?player=a'):
+            self.assertEqual(self.fetch('hiscores',url).status_code,400,url)
+        self.assertEqual(self.server.upstream_requests,0)
+        res = self.fetch('hiscores',self.stub.url + '/m=hiscore_oldschool_ironman/index_lite.ws?player=a')
+        self.assertEqual(res.status_code,200)
+
+    def test_shared_cache_and_revalidation(self):
+        url = self.stub.url + '/prices/latest'
+        first = self.fetch('prices',url)
+        self.assertEqual(first.status_code,200)
+        self.assertEqual(self.fetch('prices',url).content,first.content)
+        self.assertEqual(self.server.upstream_requests,1)
+
+        #the client already has the response: the server answers 304 without a body
+        res = self.fetch('prices',url,{'If-None-Match':first.headers['ETag']})
+        self.assertEqual(res.status_code,304)
+        self.assertEqual(res.content,b'')
+        self.assertEqual(self.fetch('prices',url,{'If-None-Match':'"other"'}).status_code,200)
+
+        #expired: the server revalidates upstream and keeps its copy on a 304
+        time.sleep(0.35)
+        not_modified = self.stub.not_modified
+        self.assertEqual(self.fetch('prices',url).content,first.content)
+        self.assertEqual(self.server.upstream_requests,2)
+        self.assertEqual(self.stub.not_modified - not_modified,1)
+        self.assertEqual(self.server.stats()['cache']['revalidations'],1)
+
+    def test_clients_routed_through_server(self):
+        transport.set_cache_server(self.server.url)
+        requests = self.stub.requests
+        expected = osrsitems.ge_lookup(4151)
+        self.assertEqual(osrsitems.ge_lookup(4151),expected)
+        self.assertEqual(self.stub.requests - requests,1)
+        self.assertEqual(self.server.requests,2)
+
+    def test_clients_dont_retry_the_server(self):
+        saved = (transport.retries,transport.backoff_factor)
+        transport.configure(retries = 2,backoff_factor = 0)
+        transport.set_cache_server(self.server.url)
+        try:
+            #the server retries upstream twice and passes the last error on, the client doesn't retry it
+            self.stub.queue_statuses(500,500,500)
+            requests = self.stub.requests
+            with self.assertRaises(transport.HTTPError):
+                osrsitems._ge_api_request(2)
+            self.assertEqual(self.stub.requests - requests,3)
+            self.assertEqual(self.server.requests,1)
+
+            #a throttled upstream's Retry-After reaches the client
+            transport.configure(retries = 0)
+            self.stub.retry_after = '7'
+            self.stub.queue_statuses(429)
+            res = transport.get(self.stub.url + '/ge/detail.json?item=3','ge')
+            self.assertEqual((res.status_code,res.headers.get('Retry-After')),(429,'7'))
+        finally:
+            transport.configure(retries = saved[0],backoff_factor = saved[1])
+
+    def test_upstream_errors(self):
+        saved = transport.retries
+        transport.configure(retries = 0)
+        try:
+            self.stub.queue_statuses(500)
+            url = self.stub.url + '/ge/detail.json?item=2'
+            self.assertEqual(self.fetch('ge',url).status_code,500)
+            #errors aren't cached
+            self.assertEqual(self.fetch('ge',url).status_code,200)
+        finally:
+            transport.configure(retries = saved)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import json
+import random
+import sys
+import threading
+import unittest
+
+from osrsutils.itemcatalog import CatalogHandle, ItemCatalog, diff_items
+
+from test_itemcatalog import item_data, linear_search
+
+class CatalogHandleTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(item_data,encoding = 'utf-8') as f:
+            cls.items = json.load(f)[:3000]
+
+    def setUp(self):
+        self.interval = sys.getswitchinterval()
+        #switch threads often, so readers build indexes while the writer copies them
+        sys.setswitchinterval(1e-5)
+
+    def tearDown(self):
+        sys.setswitchinterval(self.interval)
+
+    def test_updates_while_searching(self):
+        handle = CatalogHandle(lambda: self.items)
+        queries = [{'name':'rune'},{'examine':'a'},{'icon':'png'},{'value':1},{'limit':100},{'highalch':0},
+                   {'lowalch':0},{'members':True,'name':'ore'},{'id':4151}]
+        stop = threading.Event()
+        errors = []
+
+        def read(seed):
+            rng = random.Random(seed)
+            try:
+                while(not stop.is_set()):
+                    catalog = handle.current
+                    query = rng.choice(queries)
+                    if(catalog.search(**query) != linear_search(catalog.items,**query)):
+                        errors.append(query)
+            except Exception as e:
+                errors.append(e)
+
+        readers = [threading.Thread(target = read,args = (seed,)) for seed in range(6)]
+        for reader in readers:
+            reader.start()
+        try:
+            rng = random.Random(0)
+            for round in range(30):
+                if(round % 3 == 0):
+                    #a cold snapshot: readers build its indexes while apply_changes copies them
+                    handle.publish(ItemCatalog(handle.current.items))
+                current = handle.current
+                items = [dict(item) for item in current.items]
+                for item in rng.sample(items,10):
+                    item['name'] = item.get('name','') + ' rune'
+                    item['value'] = item.get('value',0) + 1
+                items.append({'id':800000 + round,'name':'Added ore {}'.format(round),'value':1,'members':True})
+                handle.update(lambda catalog: (catalog.apply_changes(diff_items(catalog,items)),None))
+        finally:
+            stop.set()
+            for reader in readers:
+                reader.join()
+        self.assertEqual(errors,[])
+        self.assertEqual(len(handle.current),len(self.items) + 30)
+        self.assertEqual(handle.version,40)
+
+    def test_index_built_during_apply_changes(self):
+        catalog = ItemCatalog(self.items).warm({'exact':['name'],'sorted':['value']})
+        builds = [lambda: catalog._exact_index('icon'),lambda: catalog._sorted_index('limit'),
+                  lambda: catalog._exact_index('examine'),lambda: catalog._sorted_index('highalch')]
+
+        class Record(dict):
+
+            #a reader building an index on catalog every time apply_changes reads a changed record
+            def get(self,key,default = None):
+                if(builds):
+                    builds.pop(0)()
+                return super().get(key,default)
+
+        items = [dict(item) for item in self.items]
+        for item in items[:5]:
+            item['name'] = item.get('name','') + ' changed'
+            item['value'] = item.get('value',0) + 1
+        changes = diff_items(catalog,items)
+        changes.records = {id:Record(record) for id, record in changes.records.items()}
+        new = catalog.apply_changes(changes)
+        expected = ItemCatalog(items)
+        for query in ({'name':'changed'},{'value':1},{'icon':'png'},{'limit':100}):
+            self.assertEqual(new.search(**query),expected.search(**query),query)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,57 @@
+import os
+import threading
+import unittest
+
+from osrsutils import osrshiscores
+from osrsutils.osrshiscores import CompactHiscores, row_length, sections
+
+fixture = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks','fixtures','hiscores.txt')
+
+class CompactHiscoresTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(fixture,encoding = 'utf-8') as f:
+            cls.text = f.read()
+
+    def test_matches_lines(self):
+        hiscores = CompactHiscores('a player','n',self.text)
+        self.assertEqual(hiscores.username,'a%20player')
+        self.assertEqual(len(hiscores.row),row_length)
+        values = [int(v) for line in self.text.strip().split('\n') for v in line.split(',')]
+        self.assertEqual(hiscores.overall,dict(zip(('rank','level','xp'),values[:3])))
+        names, columns = sections['bosses']
+        offset = osrshiscores.row_offsets[('bosses',names[0])]
+        self.assertEqual(hiscores.bosses[names[0]],dict(zip(columns,hiscores.row[offset:offset + len(columns)])))
+
+    def test_truncated_response(self):
+        lines = self.text.strip().split('\n')
+        #a blank line, a line cut after its rank and a response cut short
+        lines[1] = ''
+        lines[-10] = lines[-10].split(',')[0] + ','
+        hiscores = CompactHiscores('player','N','\n'.join(lines[:-3]))
+        self.assertEqual(hiscores.skills[sections['skills'][0][0]],{'rank':-1,'level':-1,'xp':-1})
+        row = hiscores.row
+        self.assertEqual(row[-len(sections['bosses'][1]):].tolist(),[-1] * len(sections['bosses'][1]))
+
+    def test_concurrent_lazy_parse(self):
+        expected = CompactHiscores('player','N',self.text).row.tolist()
+        for _ in range(20):
+            hiscores = CompactHiscores('player','N',self.text)
+            rows = []
+            barrier = threading.Barrier(8)
+            def read():
+                barrier.wait()
+                rows.append(dict(hiscores.bosses))
+            threads = [threading.Thread(target = read) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for bosses in rows:
+                for name, entry in bosses.items():
+                    offset = osrshiscores.row_offsets[('bosses',name)]
+                    self.assertEqual(list(entry.values()),expected[offset:offset + len(entry)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import transport
+from osrsutils.osrshiscores import CompactHiscores, HiscoresError, PlayerHiscores, failure_reason, fetch_hiscores
+from stubserver import StubServer
+
+players = [('alice','N'),('bob','IM'),('missing one','N'),('carol','BAD'),('dave','N')]
+
+class FetchHiscoresTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer().start()
+        cls.server.install()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.checkpoint = os.path.join(self.workdir,'checkpoint.jsonl')
+        self.saved = (transport.retries,transport.rate_limits.get('hiscores'))
+        transport.configure(retries = 0)
+        transport.set_rate_limit('hiscores',None)
+
+    def tearDown(self):
+        transport.configure(retries = self.saved[0])
+        transport.set_rate_limit('hiscores',*self.saved[1])
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def fetch(self,**kwargs):
+        return {(r.username,r.account_type):r for r in fetch_hiscores(players,workers = 1,checkpoint = self.checkpoint,**kwargs)}
+
+    def test_results_and_failures(self):
+        results = self.fetch(compact = True)
+        self.assertEqual(set(results),set(players))
+        self.assertIsInstance(results[('alice','N')].hiscores,CompactHiscores)
+        self.assertEqual([failure_reason(results[p].error) for p in players],[None,None,'not_found','invalid',None])
+        with open(self.checkpoint,encoding = 'utf-8') as f:
+            self.assertEqual(len(f.readlines()),len(players))
+
+    def test_resume(self):
+        #the first lookup is throttled
+        self.server.queue_statuses(429)
+        results = self.fetch()
+        self.assertEqual(failure_reason(results[('alice','N')].error),'transient')
+
+        #resuming only fetches the transient and invalid failures again
+        requests = self.server.requests
+        results = self.fetch()
+        self.assertEqual(set(results),{('alice','N'),('carol','BAD')})
+        self.assertIsNone(results[('alice','N')].error)
+        self.assertEqual(self.server.requests - requests,1)
+
+        #missing players are final unless retry_failed
+        results = self.fetch(retry_failed = True)
+        self.assertEqual(set(results),{('missing one','N'),('carol','BAD')})
+
+    def test_resume_after_stopping_early(self):
+        results = fetch_hiscores(players,workers = 1,checkpoint = self.checkpoint)
+        first = [next(results),next(results)]
+        results.close()
+        #a line cut short by a crash is ignored
+        with open(self.checkpoint,'a',encoding = 'utf-8') as f:
+            f.write('{"username": "dave", "acc')
+        rest = self.fetch()
+        self.assertEqual({(r.username,r.account_type) for r in first} | set(rest),set(players))
+        self.assertFalse({(r.username,r.account_type) for r in first} & set(rest))
+
+    def test_malformed_bodies(self):
+        batch = [('alice','N'),('empty body','N'),('html page','N'),('dave','N')]
+        for compact in (False,True):
+            results = {(r.username,r.account_type):r for r in fetch_hiscores(batch,workers = 2,compact = compact)}
+            self.assertEqual(set(results),set(batch))
+            for player in (('empty body','N'),('html page','N')):
+                self.assertIsInstance(results[player].error,HiscoresError)
+                self.assertEqual(failure_reason(results[player].error),'transient')
+            self.assertIsNone(results[('dave','N')].error)
+        for parse in (PlayerHiscores,CompactHiscores.fetch):
+            with self.assertRaises(HiscoresError):
+                parse('html page','N')
+
+    def test_checkpoint_entries(self):
+        self.fetch()
+        with open(self.checkpoint,encoding = 'utf-8') as f:
+            entries = [json.loads(line) for line in f]
+        self.assertIn({'username':'missing one','account_type':'N','ok':False,'reason':'not_found'},entries)
+        self.assertIn({'username':'carol','account_type':'BAD','ok':False,'reason':'invalid'},entries)
+        self.assertIn({'username':'alice','account_type':'N','ok':True},entries)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import gegraph, osrsitems, transport
+from stubserver import StubServer
+
+class ConvertTest(unittest.TestCase):
+
+    values = ['217.1k','+1,223','-5.2m','4.1m','1.5','2.5','-1.5','0.5','7','1,000,000','1.25b',' 12k ','3.14159K','0']
+
+    def test_matches_scalar_convert(self):
+        self.assertEqual(gegraph.convert(self.values).tolist(),[osrsitems.convert(v) for v in self.values])
+
+    def test_values(self):
+        #suffixed values are rounded, plain decimals truncated like int()
+        self.assertEqual(gegraph.convert(['4.1m','217.1k','1.5','-1.5','0.5','1.25b']).tolist(),
+                         [4100000,217100,1,-1,0,1250000000])
+
+    def test_empty_and_invalid(self):
+        self.assertEqual(gegraph.convert([]).tolist(),[])
+        for value in ('12x','1km','1kk','k','','1k5','nan','inf'):
+            with self.assertRaises(ValueError,msg = value):
+                osrsitems.convert(value)
+            with self.assertRaises(ValueError,msg = value):
+                gegraph.convert(['1',value])
+
+class GraphHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.graphs = gegraph.GraphHistory(self.workdir)
+        self.saved = transport.retries
+        transport.configure(retries = 0)
+
+    def tearDown(self):
+        transport.configure(retries = self.saved)
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def test_stale_graph_on_connection_error(self):
+        with StubServer() as server:
+            server.install()
+            series = self.graphs.get(4151)
+            self.assertEqual(len(series.timestamps),180)
+            self.assertTrue(self.graphs.is_fresh(4151))
+        #the stub is gone (and its kept-alive connections closed): downloads fail with a ConnectionError
+        transport.close()
+        saved = osrsitems.graph_endpoint
+        osrsitems.graph_endpoint = server.url + '/graph/'
+        try:
+            stale = self.graphs.get(4151,refresh = True)
+            self.assertTrue(np.array_equal(stale.daily,series.daily))
+            self.assertEqual(list(self.graphs.get_many([4151,2],refresh = True)),[4151])
+        finally:
+            osrsitems.graph_endpoint = saved
+
+if __name__ == '__main__':
+    unittest.main()
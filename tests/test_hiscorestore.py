@@ -0,0 +1,94 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from osrsutils.hiscorestore import HiscoresHistory, column_indices
+from osrsutils.osrshiscores import row_length, row_offsets, sections
+
+def rows(seed,n):
+
+    """
+    n successive rows of one player: values only grow, a few entries change between snapshots
+    """
+
+    rng = random.Random(seed)
+    row = [-1] * row_length
+    result = []
+    for _ in range(n):
+        row = list(row)
+        for column in rng.sample(range(row_length),rng.randint(0,6)):
+            row[column] = max(row[column],0) + rng.randint(1,1000)
+        result.append(row)
+    return result
+
+class HiscoresHistoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def fill(self,history):
+        snapshots = {('alice','N'):rows(1,20),('bob','IM'):rows(2,15)}
+        for (username, account_type), player_rows in snapshots.items():
+            for t, row in enumerate(player_rows):
+                history.add_row(username,account_type,row,1000 + t*10)
+        return snapshots
+
+    def test_state_round_trip(self):
+        history = HiscoresHistory()
+        snapshots = self.fill(history)
+        self.assertEqual(history.players,[('alice','N'),('bob','IM')])
+        for t in range(20):
+            state = history.state(1000 + t*10 + 5)
+            self.assertEqual(state[0].tolist(),snapshots[('alice','N')][t])
+            self.assertEqual(state[1].tolist(),snapshots[('bob','IM')][min(t,14)])
+        self.assertTrue((history.state(999) == -1).all())
+        #an unchanged snapshot stores nothing, an older one is ignored
+        self.assertEqual(history.add_row('alice','N',snapshots[('alice','N')][-1],5000),0)
+        self.assertEqual(history.add_row('alice','N',[5] * row_length,0),0)
+
+    def test_gains(self):
+        history = HiscoresHistory()
+        snapshots = self.fill(history)
+        players, names, gains = history.gains(1045,1125)
+        self.assertEqual(names,sections['skills'][0])
+        _, columns = column_indices('skills','xp')
+        for i, player in enumerate(players):
+            player_rows = snapshots[player]
+            before = np.maximum(np.array(player_rows[4])[columns],0)
+            after = np.maximum(np.array(player_rows[min(12,len(player_rows) - 1)])[columns],0)
+            self.assertEqual(gains[i].tolist(),(after - before).tolist())
+        #players not tracked at the start of the window have no gain
+        self.assertTrue((history.gains(999)[2] == 0).all())
+        name = sections['skills'][0][0]
+        top = history.top_gainers(name,1,1045,1125)
+        self.assertEqual(top[0][1],int(gains[:,0].max()))
+
+    def test_saved_and_loaded(self):
+        history = HiscoresHistory(self.workdir)
+        self.fill(history)
+        loaded = HiscoresHistory(self.workdir)
+        self.assertEqual(loaded.players,history.players)
+        self.assertTrue(np.array_equal(loaded.state(),history.state()))
+        self.assertTrue(np.array_equal(loaded.state(1050),history.state(1050)))
+
+    def test_usernames_normalized(self):
+        history = HiscoresHistory(self.workdir)
+        attack = row_offsets[('skills','attack')] + 2
+        for t, (username, account_type) in enumerate((('Foo Bar','N'),('foo bar','n'),('Foo%20Bar','N'))):
+            row = [-1] * row_length
+            row[attack] = 100 * (t + 1)
+            history.add_row(username,account_type,row,1000 + t)
+        self.assertEqual(history.players,[('Foo Bar','N')])
+        self.assertEqual(history.state()[0][attack],300)
+        self.assertEqual(history.gains(1000)[2][0][0],200)
+        self.assertEqual(HiscoresHistory(self.workdir).players,[('Foo Bar','N')])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,18 @@
+import argparse
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+import run
+
+class ColdImportTest(unittest.TestCase):
+
+    def test_heavy_modules_deferred(self):
+        #bench_import raises AssertionError if requests or numpy is imported up front
+        result = run.bench_import(argparse.Namespace(repeat = 1),None)
+        self.assertEqual(result['deferred_modules'],['requests','numpy'])
+
+if __name__ == '__main__':
+    unittest.main()
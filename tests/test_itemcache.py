@@ -0,0 +1,99 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from osrsutils import itemcache, osrsitems
+
+item_data = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'osrsutils','item_data.json')
+
+class ItemCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.source = os.path.join(self.workdir,'item_data.json')
+        self.sidecar = os.path.join(self.workdir,'item_data.bin')
+        shutil.copy(item_data,self.source)
+        with open(self.source,encoding = 'utf-8') as f:
+            self.items = json.load(f)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def test_round_trip(self):
+        items = self.items + [{'id':900000,'name':'Unicode ☃ café','examine':'','members':False},{'id':900001}]
+        self.assertTrue(itemcache.write_item_cache(self.sidecar,items,self.source))
+        loaded = itemcache.load_item_cache(self.sidecar,self.source)
+        self.assertIsNotNone(loaded)
+        self.assertEqual(len(loaded),len(items))
+        self.assertEqual(list(loaded),items)
+        self.assertEqual(loaded[-1],items[-1])
+        self.assertEqual(loaded.column('value'),[item.get('value') for item in items])
+        self.assertEqual(loaded.strings('name'),[item.get('name') for item in items])
+
+    def test_stale_after_source_changes(self):
+        self.assertTrue(itemcache.write_item_cache(self.sidecar,self.items,self.source))
+        self.assertIsNotNone(itemcache.load_item_cache(self.sidecar,self.source))
+        with open(self.source,'a',encoding = 'utf-8') as f:
+            f.write('\n')
+        self.assertIsNone(itemcache.load_item_cache(self.sidecar,self.source))
+
+    def test_stale_after_source_replaced(self):
+        self.assertTrue(itemcache.write_item_cache(self.sidecar,self.items,self.source))
+        stat = os.stat(self.source)
+        with open(self.source,'w',encoding = 'utf-8') as f:
+            json.dump(self.items[:10],f)
+        os.utime(self.source,ns = (stat.st_atime_ns,stat.st_mtime_ns + 10**9))
+        self.assertIsNone(itemcache.load_item_cache(self.sidecar,self.source))
+
+    def test_stamp_taken_before_read(self):
+        #the items were read before another process replaced the file: the sidecar must not be written as fresh
+        stamp = itemcache.source_stamp(self.source)
+        with open(self.source,'w',encoding = 'utf-8') as f:
+            json.dump(self.items[:10],f)
+        os.utime(self.source,ns = (stamp[0],stamp[0] + 10**9))
+        self.assertFalse(itemcache.write_item_cache(self.sidecar,self.items,self.source,stamp))
+        self.assertIsNone(itemcache.load_item_cache(self.sidecar,self.source))
+        self.assertTrue(itemcache.write_item_cache(self.sidecar,self.items[:10],self.source,itemcache.source_stamp(self.source)))
+        self.assertEqual(list(itemcache.load_item_cache(self.sidecar,self.source)),self.items[:10])
+
+    def test_missing_or_invalid(self):
+        self.assertIsNone(itemcache.load_item_cache(self.sidecar,self.source))
+        with open(self.sidecar,'wb') as f:
+            f.write(b'not a sidecar')
+        self.assertIsNone(itemcache.load_item_cache(self.sidecar,self.source))
+
+class ColdStartTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.saved = (osrsitems.item_list,osrsitems.item_cache)
+        osrsitems.item_list = os.path.join(self.workdir,'item_data.json')
+        osrsitems.item_cache = os.path.join(self.workdir,'item_data.bin')
+        shutil.copy(item_data,osrsitems.item_list)
+        with open(item_data,encoding = 'utf-8') as f:
+            self.items = json.load(f)
+
+    def tearDown(self):
+        osrsitems.item_list, osrsitems.item_cache = self.saved
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def test_sidecar_built_then_reused(self):
+        self.assertFalse(os.path.exists(osrsitems.item_cache))
+        items = osrsitems._load_items()
+        self.assertIsInstance(items,itemcache.MappedItems)
+        self.assertEqual(list(items),self.items)
+        modified = os.stat(osrsitems.item_cache).st_mtime_ns
+        self.assertEqual(list(osrsitems._load_items()),self.items)
+        self.assertEqual(os.stat(osrsitems.item_cache).st_mtime_ns,modified)
+
+    def test_sidecar_rebuilt_when_json_changes(self):
+        osrsitems._load_items()
+        with open(osrsitems.item_list,'w',encoding = 'utf-8') as f:
+            json.dump(self.items[:10],f)
+        os.utime(osrsitems.item_list,ns = (0,os.stat(osrsitems.item_cache).st_mtime_ns + 10**9))
+        self.assertEqual(list(osrsitems._load_items()),self.items[:10])
+
+if __name__ == '__main__':
+    unittest.main()
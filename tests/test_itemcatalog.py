@@ -0,0 +1,75 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from osrsutils import osrsitems
+from osrsutils.itemcatalog import ItemCatalog
+
+item_data = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'osrsutils','item_data.json')
+
+def linear_search(items,**query):
+
+    """
+    The search_item_data implementation from before the catalog was indexed
+    """
+
+    search_query = {k:(v.lower() if isinstance(v,str) else v) for k, v in query.items() if v is not None}
+    results = []
+    for item in items:
+        for field in ('name','examine','icon'):
+            if(search_query.get(field) and search_query[field] not in str(item.get(field)).lower()):
+                break
+        else:
+            if({k:v for k,v in search_query.items() if k not in ('name','examine','icon')}.items() <= item.items()):
+                results.append(item)
+    return results
+
+def random_queries(items,n,seed = 0):
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        item = rng.choice(items)
+        query = {}
+        for field in rng.sample(['name','examine','icon','id','members','highalch','limit','value'],rng.randint(1,3)):
+            value = item.get(field)
+            if(isinstance(value,str)):
+                start = rng.randint(0,max(0,len(value) - 3))
+                value = value[start:start + rng.randint(1,8)].upper() if rng.random() < 0.2 else value[start:start + rng.randint(1,8)]
+            query[field] = value
+        queries.append(query)
+    return queries + [{},{'name':'zzzzqqq'},{'members':False},{'name':'a'},{'examine':'of the'}]
+
+class SearchTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.workdir = tempfile.mkdtemp()
+        cls.saved = (osrsitems.item_list,osrsitems.item_cache,osrsitems.item_meta)
+        osrsitems.item_list = os.path.join(cls.workdir,'item_data.json')
+        osrsitems.item_cache = os.path.join(cls.workdir,'item_data.bin')
+        osrsitems.item_meta = os.path.join(cls.workdir,'item_data.meta.json')
+        shutil.copy(item_data,osrsitems.item_list)
+        osrsitems.catalog_handle.invalidate()
+        with open(item_data,encoding = 'utf-8') as f:
+            cls.items = json.load(f)
+
+    @classmethod
+    def tearDownClass(cls):
+        osrsitems.item_list, osrsitems.item_cache, osrsitems.item_meta = cls.saved
+        osrsitems.catalog_handle.invalidate()
+        shutil.rmtree(cls.workdir,ignore_errors = True)
+
+    def test_matches_linear_scan(self):
+        for query in random_queries(self.items,500):
+            self.assertEqual(osrsitems.search_item_data(**query),linear_search(self.items,**query),query)
+
+    def test_catalog_matches_linear_scan(self):
+        catalog = ItemCatalog(self.items)
+        for query in random_queries(self.items,200,seed = 1):
+            self.assertEqual(catalog.search(**query),linear_search(self.items,**query),query)
+
+if __name__ == '__main__':
+    unittest.main()
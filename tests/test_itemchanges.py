@@ -0,0 +1,125 @@
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from osrsutils import osrsitems
+from osrsutils.itemcatalog import ItemCatalog, diff_items
+
+from test_itemcatalog import item_data, linear_search, random_queries
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from stubserver import StubServer
+
+class ApplyChangesTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(item_data,encoding = 'utf-8') as f:
+            cls.items = json.load(f)
+
+    def changed_mapping(self,seed,remove):
+        rng = random.Random(seed)
+        items = [dict(item) for item in self.items]
+        for item in rng.sample(items,20):
+            item['name'] = item.get('name','') + ' (changed)'
+            item['value'] = item.get('value',0) + 7
+            item['examine'] = rng.choice(['A new examine.','Its edge is sharp.'])
+        items += [{'id':900000 + i,'name':'New item {}'.format(i),'examine':'Fresh.','members':True,'value':i,'highalch':i} for i in range(5)]
+        if(remove):
+            del items[10:15]
+        return items
+
+    def assertSameCatalog(self,catalog,expected):
+        self.assertEqual(list(catalog.items),list(expected.items))
+        for query in random_queries(list(expected.items),300,seed = 2) + [{'name':'changed'},{'name':'new item'},{'examine':'fresh'}]:
+            self.assertEqual(catalog.search(**query),expected.search(**query),query)
+        for item in expected.items:
+            self.assertEqual(catalog.get(item['id']),expected.get(item['id']))
+
+    def check(self,remove):
+        for warm in (False,True):
+            old = ItemCatalog(self.items)
+            if(warm):
+                old.warm()
+            new_items = self.changed_mapping(int(remove),remove)
+            changes = diff_items(old,new_items)
+            catalog = old.apply_changes(changes)
+            expected = ItemCatalog(new_items)
+            self.assertSameCatalog(catalog,expected)
+            #the old catalog is left untouched
+            self.assertSameCatalog(old,ItemCatalog(self.items))
+
+    def test_changes_and_additions(self):
+        self.check(remove = False)
+
+    def test_removals(self):
+        self.check(remove = True)
+
+    def test_empty_diff(self):
+        catalog = ItemCatalog(self.items)
+        self.assertFalse(diff_items(catalog,[dict(item) for item in self.items]))
+
+class UpdateItemDataTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.saved = (osrsitems.item_list,osrsitems.item_cache,osrsitems.item_meta)
+        osrsitems.item_list = os.path.join(self.workdir,'item_data.json')
+        osrsitems.item_cache = os.path.join(self.workdir,'item_data.bin')
+        osrsitems.item_meta = os.path.join(self.workdir,'item_data.meta.json')
+        shutil.copy(item_data,osrsitems.item_list)
+        osrsitems.catalog_handle.invalidate()
+        with open(item_data,encoding = 'utf-8') as f:
+            self.items = json.load(f)
+
+    def tearDown(self):
+        osrsitems.item_list, osrsitems.item_cache, osrsitems.item_meta = self.saved
+        osrsitems.catalog_handle.invalidate()
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def test_update_applies_only_changes(self):
+        items = [dict(item) for item in self.items]
+        items[0]['name'] = 'Renamed zzqq'
+        items.append({'id':900000,'name':'New zzqq','examine':'Fresh.','members':False})
+        del items[5]
+        changes = osrsitems.update_item_data(items)
+        self.assertEqual((changes.added,changes.removed,changes.changed),([900000],[self.items[5]['id']],[items[0]['id']]))
+        self.assertEqual(changes.version,1)
+        self.assertEqual(osrsitems.get_item_data_version()['version'],1)
+        with open(osrsitems.item_list,encoding = 'utf-8') as f:
+            self.assertEqual(json.load(f),list(osrsitems.get_catalog().items))
+        self.assertEqual(osrsitems.search_item_data(name = 'zzqq'),linear_search(items,name = 'zzqq'))
+
+        #the same mapping again changes nothing and keeps the version
+        changes = osrsitems.update_item_data(items)
+        self.assertFalse(changes)
+        self.assertEqual(changes.version,1)
+
+    def test_refresh_revalidates_cached_mapping(self):
+        with StubServer() as server:
+            server.install()
+            server.payloads['mapping'] = json.dumps(self.items).encode('utf-8')
+            self.assertFalse(osrsitems.update_item_data())
+            items = self.items + [{'id':900000,'name':'Refreshed zzqq','examine':'Fresh.','members':False}]
+            server.payloads['mapping'] = json.dumps(items).encode('utf-8')
+            #the mapping is still cached, a plain update doesn't see the new item
+            self.assertFalse(osrsitems.update_item_data())
+            handle = osrsitems.start_catalog_refresh(0.05)
+            try:
+                for _ in range(100):
+                    if(osrsitems.get_catalog().get(900000)):
+                        break
+                    time.sleep(0.05)
+            finally:
+                handle.stop()
+            self.assertEqual(osrsitems.get_catalog().get(900000)['name'],'Refreshed zzqq')
+            self.assertEqual(osrsitems.get_item_data_version()['version'],1)
+
+if __name__ == '__main__':
+    unittest.main()
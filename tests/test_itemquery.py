@@ -0,0 +1,144 @@
+import json
+import operator
+import os
+import random
+import unittest
+
+from osrsutils.itemcatalog import ItemCatalog, numeric_fields, string_fields
+from osrsutils.itemquery import Query, QueryError, compile_query
+
+item_data = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'osrsutils','item_data.json')
+
+_compare = {'eq':operator.eq,'ne':operator.ne,'lt':operator.lt,'le':operator.le,'gt':operator.gt,'ge':operator.ge}
+
+def is_number(v):
+    return isinstance(v,(int,float)) and v == v
+
+def matches(item,p):
+
+    """
+    Checks a predicate on a single item without any index
+    """
+
+    if(p.field in string_fields):
+        value = str(item.get(p.field)).lower()
+        return value == p.value if p.op == 'eq' else p.value in value
+    value = item.get(p.field)
+    if(not is_number(value)):
+        return False
+    if(p.op == 'between'):
+        return p.value[0] <= value <= p.value[1]
+    if(p.op == 'in'):
+        return value in p.value
+    return _compare[p.op](value,p.value)
+
+def brute_force(items,query,k = None,offset = 0):
+
+    """
+    Filters every item and sorts the whole result: present values in order, ties and missing values in mapping order
+    """
+
+    found = [(pos,item) for pos, item in enumerate(items) if all(matches(item,p) for p in query.predicates)]
+    if(query.order is not None):
+        field, descending = query.order
+        if(field in string_fields):
+            value = lambda item: str(item.get(field)).lower()
+            present = lambda item: value(item) != 'none'
+        else:
+            value = lambda item: item.get(field)
+            present = lambda item: is_number(item.get(field))
+        #sorted() keeps ties in mapping order, reverse = True included
+        ranked = sorted((e for e in found if present(e[1])),key = lambda e: value(e[1]),reverse = descending)
+        found = ranked + [e for e in found if not present(e[1])]
+    stop = None if k is None else offset + k
+    return [item for _, item in found[offset:stop]], len(found)
+
+def random_query(rng,items):
+    query = Query()
+    for _ in range(rng.randint(0,3)):
+        item = rng.choice(items)
+        field = rng.choice(numeric_fields + string_fields)
+        value = item.get(field)
+        if(field in string_fields):
+            value = str(value).lower()
+            if(rng.random() < 0.3):
+                query.where(field,'eq',value)
+            else:
+                start = rng.randint(0,max(0,len(value) - 2))
+                query.where(field,'contains',value[start:start + rng.randint(1,6)])
+        elif(value is None):
+            #a field the item doesn't have
+            query.where(field,rng.choice(('ne','ge')),0)
+        else:
+            op = rng.choice(('eq','ne','lt','le','gt','ge','between','in'))
+            if(op == 'between'):
+                query.where(field,op,(value,value + rng.randint(0,1000)))
+            elif(op == 'in'):
+                query.where(field,op,[value] + [rng.choice(items).get(field) or 0 for _ in range(3)])
+            else:
+                query.where(field,op,value)
+    if(rng.random() < 0.8):
+        query.order_by(rng.choice(('','-')) + rng.choice(numeric_fields + string_fields))
+    return query
+
+class QueryTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with open(item_data,encoding = 'utf-8') as f:
+            cls.items = json.load(f)
+        cls.catalog = ItemCatalog(cls.items)
+
+    def check(self,items,catalog,query,k = None,offset = 0):
+        expected, total = brute_force(items,query,k,offset)
+        page = query.run(catalog,k,offset)
+        self.assertEqual((page.total,page.offset),(total,offset),query)
+        self.assertEqual(page.items,expected,query)
+
+    def test_against_brute_force(self):
+        rng = random.Random(7)
+        for _ in range(300):
+            query = random_query(rng,self.items)
+            k = rng.choice((None,1,10,100,10000))
+            offset = rng.choice((0,0,5,50))
+            self.check(self.items,self.catalog,query,k,offset)
+
+    def test_ties_and_missing_fields(self):
+        items = [{'id':1,'name':'A','members':True,'limit':100,'value':5},
+                 {'id':2,'name':'B','members':False,'value':5},
+                 {'id':3,'name':'c','members':True,'limit':100,'value':float('nan')},
+                 {'id':4,'members':True,'limit':50,'value':7},
+                 {'id':5,'name':'b','members':False,'limit':100}]
+        catalog = ItemCatalog(items)
+        for order in ('limit','-limit','value','-value','name','-name','members','-members'):
+            query = Query().order_by(order)
+            for k in (None,0,1,2,3,10):
+                for offset in (0,1,4,6):
+                    self.check(items,catalog,query,k,offset)
+        #ties keep mapping order, items without the field come last either way
+        self.assertEqual([i['id'] for i in Query().order_by('-limit').run(catalog).items],[1,3,5,4,2])
+        self.assertEqual([i['id'] for i in Query().order_by('limit').run(catalog).items],[4,1,3,5,2])
+        self.assertEqual([i['id'] for i in Query().order_by('-value').run(catalog).items],[4,1,2,3,5])
+        #predicates never match a missing or NaN value
+        for op, value in (('ne',0),('ge',0),('lt',1000),('between',(0,1000)),('in',(5,7,100))):
+            self.check(items,catalog,Query().where('limit',op,value).where('value',op,value))
+        page = compile_query('limit = 100 and members',order_by = '-value').run(catalog,k = 10)
+        self.assertEqual(([i['id'] for i in page.items],page.total),([1,3],2))
+
+    def test_k_larger_than_matches(self):
+        query = compile_query('highalch > 1m',order_by = '-highalch')
+        expected, total = brute_force(self.items,query)
+        page = query.run(self.catalog,k = total + 100)
+        self.assertEqual((page.items,page.total),(expected,total))
+        self.assertEqual(query.run(self.catalog,k = 10,offset = total + 5).items,[])
+        self.assertEqual(Query(name = 'zzzzqqq').run(self.catalog,k = 10),([],0,0))
+
+    def test_errors(self):
+        for expression in ('nosuchfield > 1','name > 1','limit ~ 5','limit >','limit > 1 or value < 2','limit between 1'):
+            with self.assertRaises(QueryError):
+                compile_query(expression)
+        with self.assertRaises(QueryError):
+            Query().order_by('-nosuchfield')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import jsonstream, osrsitems
+from stubserver import StubServer
+
+item_data = os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'osrsutils','item_data.json')
+
+def chunked(data,size):
+    return [data[i:i + size] for i in range(0,len(data),size)]
+
+class JsonStreamTest(unittest.TestCase):
+
+    latest = {'data':{'2':{'high':150,'highTime':1,'low':None,'lowTime':2},
+                      '6':{'high':-3,'low':1.5e3,'name':'café ☃ "quoted" \\ é'},
+                      '8':{'nested':[1,[2,{'a':{}}],[]],'empty':''}},
+              'timestamp':1700000000,'extra':[{'data':{}}]}
+
+    def test_data_items_small_chunks(self):
+        for text in (json.dumps(self.latest),json.dumps(self.latest,indent = 4,ensure_ascii = False),
+                     json.dumps({'before':{'data':[1]},**self.latest},separators = (',',':'))):
+            expected = list(json.loads(text)['data'].items())
+            for size in (1,2,3,7,64):
+                self.assertEqual(list(jsonstream.iter_data_items(chunked(text,size))),expected)
+                self.assertEqual(list(jsonstream.iter_data_items(chunked(text.encode('utf-8'),size))),expected)
+
+    def test_empty_data(self):
+        for text in ('{"data":{}}','{ "data" : { } , "timestamp": 1 }','{}'):
+            self.assertEqual(list(jsonstream.iter_data_items(chunked(text,1))),list(json.loads(text).get('data',{}).items()))
+
+    def test_array_items_small_chunks(self):
+        with open(item_data,'rb') as f:
+            data = f.read()[:200000]
+        #cut the mapping after a complete record and close the array
+        data = data[:data.rindex(b'},') + 1] + b']'
+        expected = json.loads(data)
+        for size in (1,5,4096):
+            self.assertEqual(list(jsonstream.iter_array_items(chunked(data,size))),expected)
+        for text in ('[]',' [ ] ','[1, "a", null, {"b": [true, false]}]'):
+            self.assertEqual(list(jsonstream.iter_array_items(chunked(text,1))),json.loads(text))
+
+    def test_invalid_json(self):
+        for text in ('{"data":{"2":{"high":1}','[1, 2','{"data":{"2" 1}}'):
+            with self.assertRaises(ValueError):
+                list(jsonstream.iter_data_items(chunked(text,2)) if text[0] == '{' else jsonstream.iter_array_items(chunked(text,2)))
+
+class StreamingRoutesTest(unittest.TestCase):
+
+    def test_latest_and_mapping(self):
+        with StubServer() as server:
+            server.install()
+            latest = json.loads(server.payloads['latest'])['data']
+            self.assertEqual(dict(osrsitems.iter_latest_prices()),{int(k):v for k, v in latest.items()})
+            self.assertEqual(dict(osrsitems.iter_latest_prices([2,4151,-1])),{2:latest['2'],4151:latest['4151']})
+            mapping = json.loads(server.payloads['mapping'])
+            self.assertEqual([record for _, record in osrsitems.iter_mapping()],mapping)
+            self.assertEqual([id for id, _ in osrsitems.iter_mapping({4151})],[4151])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import random
+import unittest
+
+from osrsutils.leaderboard import Leaderboard, column_position
+from osrsutils.osrshiscores import row_length
+
+#entries queried by the tests, values are drawn from a small range so that there are many ties
+queried = (('overall',None),('slayer',None),('zulrah',None),('attack','rank'))
+
+def random_row(rng):
+    row = [-1] * row_length
+    for name, column in queried:
+        if(rng.random() > 0.2):
+            row[column_position(name,column)] = rng.randint(0,8)
+    return row
+
+class LeaderboardTest(unittest.TestCase):
+
+    def check(self,board,rows):
+
+        """
+        Compares every query against a scan of rows ({(username, account_type): row}, in first tracked order)
+        """
+
+        self.assertEqual(len(board),len(rows))
+        for name, column in queried:
+            position = column_position(name,column)
+            ranked = [(player,row[position]) for player, row in rows.items() if row[position] >= 0]
+            ranked.sort(key = lambda p: -p[1])
+            self.assertEqual(board.count(name,column),len(ranked))
+            self.assertEqual(board.top(name,len(ranked) + 5,column),ranked)
+            self.assertEqual(board.top(name,3,column,offset = 2),ranked[2:5])
+            self.assertEqual(board.range(name,2,5,column),[p for p in ranked if 2 <= p[1] <= 5])
+            self.assertEqual(board.range(name,column = column),ranked)
+            for player, row in rows.items():
+                value = row[position]
+                if(value < 0):
+                    self.assertIsNone(board.rank_of(*player,name,column))
+                    self.assertIsNone(board.percentile(*player,name,column))
+                    continue
+                higher = sum(1 for _, v in ranked if v > value)
+                self.assertEqual(board.value(*player,name,column),value)
+                self.assertEqual(board.rank_of(*player,name,column),higher + 1)
+                self.assertAlmostEqual(board.percentile(*player,name,column),100 * (len(ranked) - higher) / len(ranked))
+
+    def test_against_brute_force(self):
+        rng = random.Random(3)
+        board = Leaderboard()
+        rows = {}
+        players = [('player{}'.format(i),rng.choice(('N','IM','HCIM'))) for i in range(30)]
+        for step in range(400):
+            player = rng.choice(players)
+            if(rng.random() < 0.1):
+                self.assertEqual(board.remove(*player),player in rows)
+                rows.pop(player,None)
+            else:
+                row = random_row(rng)
+                board.update_row(*player,row)
+                rows[player] = row
+            if(step % 25 == 0):
+                #queries build the indexes, later updates maintain them in place
+                self.check(board,rows)
+        self.check(board,rows)
+
+    def test_ties(self):
+        board = Leaderboard()
+        slayer = column_position('slayer')
+        for username, xp in (('a',10),('b',20),('c',10),('d',20),('e',5)):
+            row = [-1] * row_length
+            row[slayer] = xp
+            board.update_row(username,'N',row)
+        #ties share a rank and keep the order the players were first tracked in
+        self.assertEqual(board.top('slayer',5),[(('b','N'),20),(('d','N'),20),(('a','N'),10),(('c','N'),10),(('e','N'),5)])
+        self.assertEqual([board.rank_of(u,'N','slayer') for u in 'abcde'],[3,1,3,1,5])
+        self.assertEqual(board.percentile('a','N','slayer'),60)
+        self.assertEqual(board.percentile('d','N','slayer'),100)
+
+    def test_update_moves_player(self):
+        board = Leaderboard()
+        slayer = column_position('slayer')
+        row = [-1] * row_length
+        for username, xp in (('a',10),('b',20),('c',30)):
+            row[slayer] = xp
+            board.update_row(username,'N',row)
+        self.assertEqual(board.rank_of('a','N','slayer'),3)
+        row[slayer] = 40
+        board.update_row('a','N',row)
+        self.assertEqual(board.top('slayer',5),[(('a','N'),40),(('c','N'),30),(('b','N'),20)])
+        #going unranked takes the player out of the index
+        row[slayer] = -1
+        board.update_row('a','N',row)
+        self.assertEqual(board.count('slayer'),2)
+        self.assertIsNone(board.rank_of('a','N','slayer'))
+        self.assertTrue(board.remove('c','N'))
+        self.assertFalse(board.remove('c','N'))
+        self.assertEqual(board.top('slayer',5),[(('b','N'),20)])
+
+    def test_normalized_keys(self):
+        board = Leaderboard()
+        slayer = column_position('slayer')
+        row = [-1] * row_length
+        for xp, (username, account_type) in enumerate((('Foo Bar','N'),('foo bar','n'),('FOO%20BAR','N')),1):
+            row[slayer] = xp
+            board.update_row(username,account_type,row)
+        self.assertEqual(len(board),1)
+        self.assertIn(('foo%20bar','n'),board)
+        self.assertEqual(board.top('slayer',5),[(('Foo Bar','N'),3)])
+        self.assertEqual(board.rank_of('fOO bAR','N','slayer'),1)
+        self.assertTrue(board.remove('Foo%20Bar','n'))
+        self.assertEqual(len(board),0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,26 @@
+import unittest
+
+from osrsutils import metrics
+
+class TimerTest(unittest.TestCase):
+
+    def tearDown(self):
+        metrics.disable()
+        metrics.reset()
+
+    def test_disabled_timer_is_shared(self):
+        self.assertIs(metrics.timer('a'),metrics.timer('b',route = 'x'))
+        with metrics.timer('a'):
+            pass
+        self.assertEqual(metrics.snapshot()['histograms'],[])
+
+    def test_enabled_timer_records(self):
+        metrics.enable()
+        with self.assertRaises(KeyError):
+            with metrics.timer('catalog.search',route = 'x'):
+                raise KeyError()
+        [histogram] = metrics.snapshot()['histograms']
+        self.assertEqual((histogram['name'],histogram['labels'],histogram['count']),('catalog.search',{'route':'x'},1))
+
+if __name__ == '__main__':
+    unittest.main()
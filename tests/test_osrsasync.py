@@ -0,0 +1,84 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import osrsitems, transport
+from osrsutils.osrsasync import AsyncClient
+from stubserver import StubServer
+
+class RunSharedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.client = AsyncClient(max_concurrency = 4)
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def tearDown(self):
+        self.client.close()
+
+    def lookup(self,fail = False):
+        with self.lock:
+            self.calls += 1
+        time.sleep(0.1)
+        if(fail):
+            raise ValueError('failed')
+        return {'prices':[1,2,3]}
+
+    def test_callers_get_their_own_copy(self):
+        async def main():
+            return await asyncio.gather(*(self.client.run_shared('key',self.lookup) for _ in range(5)))
+        results = asyncio.run(main())
+        self.assertEqual(self.calls,1)
+        self.assertEqual(len({id(r) for r in results}),5)
+        self.assertEqual(len({id(r['prices']) for r in results}),5)
+        results[0]['prices'].append(4)
+        self.assertTrue(all(r == {'prices':[1,2,3]} for r in results[1:]))
+
+    def test_exception_shared(self):
+        async def main():
+            return await asyncio.gather(*(self.client.run_shared('key',self.lookup,True) for _ in range(3)),return_exceptions = True)
+        results = asyncio.run(main())
+        self.assertEqual(self.calls,1)
+        self.assertTrue(all(isinstance(r,ValueError) for r in results))
+
+    def test_cancelled_caller(self):
+        async def main():
+            first = asyncio.ensure_future(self.client.run_shared('key',self.lookup))
+            second = asyncio.ensure_future(self.client.run_shared('key',self.lookup))
+            await asyncio.sleep(0.02)
+            first.cancel()
+            result = await second
+            #the call finished: the next one runs again
+            await self.client.run_shared('key',self.lookup)
+            return first, result
+        first, result = asyncio.run(main())
+        self.assertTrue(first.cancelled())
+        self.assertEqual(result,{'prices':[1,2,3]})
+        self.assertEqual(self.calls,2)
+
+class AsyncClientTest(unittest.TestCase):
+
+    def test_concurrent_lookups_share_a_request(self):
+        saved = transport.rate_limits.get('ge')
+        transport.set_rate_limit('ge',None)
+        try:
+            with StubServer(latency = 0.2) as server:
+                server.install()
+                expected = osrsitems.ge_lookup(4151)
+                async def main():
+                    async with AsyncClient(max_concurrency = 8) as client:
+                        return await asyncio.gather(*(client.ge_lookup(4151) for _ in range(6)))
+                requests = server.requests
+                results = asyncio.run(main())
+                self.assertEqual(server.requests - requests,1)
+                self.assertTrue(all(result == expected for result in results))
+        finally:
+            transport.set_rate_limit('ge',*saved)
+
+if __name__ == '__main__':
+    unittest.main()
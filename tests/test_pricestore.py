@@ -0,0 +1,65 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from osrsutils import osrsitems, transport
+from osrsutils.pricestore import PriceStore
+
+def point(timestamp,price):
+    return {'timestamp':timestamp,'avgHighPrice':price,'avgLowPrice':None,'highPriceVolume':3,'lowPriceVolume':0}
+
+class PriceStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.workdir = tempfile.mkdtemp()
+        self.store = PriceStore(self.workdir)
+
+    def tearDown(self):
+        shutil.rmtree(self.workdir,ignore_errors = True)
+
+    def test_append_and_merge(self):
+        self.assertEqual(self.store.append(2,'5m',[point(600,2),point(300,1)]),2)
+        self.assertEqual(self.store.append(2,'5m',[point(0,0),point(300,9),point(900,3)]),2)
+        series = self.store.read(2,'5m')
+        self.assertEqual(series['timestamp'],[0,300,600,900])
+        self.assertEqual(series['avgHighPrice'],[0,1,2,3])
+        self.assertEqual(series['avgLowPrice'],[None] * 4)
+        self.assertEqual(self.store.read(2,'5m',start = 300,end = 900)['timestamp'],[300,600])
+        self.assertEqual(self.store.last_timestamp(2,'5m'),900)
+
+    def test_partial_record(self):
+        self.store.append(2,'5m',[point(300,1)])
+        path = self.store._path(2,'5m')
+        #an append interrupted after 3 and after 16 bytes
+        for stray in (b'abc',bytes(16)):
+            with open(path,'ab') as f:
+                f.write(stray)
+            self.assertEqual(self.store.read(2,'5m')['timestamp'],[300])
+            self.assertEqual(self.store.last_timestamp(2,'5m'),300)
+        self.assertEqual(self.store.append(2,'5m',[point(600,2)]),1)
+        series = self.store.read(2,'5m')
+        self.assertEqual(series['timestamp'],[300,600])
+        self.assertEqual(series['avgHighPrice'],[1,2])
+        self.assertEqual(os.path.getsize(path) % 40,0)
+
+    def test_update_many_failures(self):
+        self.store.append(6,'5m',[point(300,1)])
+
+        def get_time_series(id,timestep):
+            if(id == 4):
+                raise transport.ConnectionError('connection reset')
+            if(id == 8):
+                raise transport.Timeout('timed out')
+            return {'data':[point(300,id),point(600,id)]}
+
+        with mock.patch.object(osrsitems,'get_time_series',get_time_series):
+            updated = self.store.update_many([2,4,6,8,2],workers = 3)
+        self.assertEqual(updated,{2:2,4:None,6:1,8:None})
+        self.assertEqual(self.store.read(2,'5m')['timestamp'],[300,600])
+        self.assertEqual(self.store.read(6,'5m')['avgHighPrice'],[1,6])
+        self.assertIsNone(self.store.last_timestamp(4,'5m'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import random
+import string
+import unittest
+
+from osrsutils.resolver import NameResolver, edit_distance, max_edits, normalize
+
+items = [
+    {'id':1,'name':'Abyssal whip'},
+    {'id':2,'name':"Torag's platelegs"},
+    {'id':3,'name':'Dragon scimitar'},
+    {'id':4,'name':'Dragon dagger'},
+    {'id':5,'name':'Rune axe'},
+    {'id':6,'name':'Iron axe'},
+    {'id':7,'name':'Abyssal dagger'},
+    {'id':8,'name':'Coal'},
+    {'id':9,'name':'Cod'},
+    {'id':10,'name':'Guthix balance'},
+    {'id':11,'name':'Guthix bolance'},
+]
+
+def brute_force_tokens(resolver,token):
+
+    """
+    The name tokens a query token should match, found by scanning the whole vocabulary
+    """
+
+    vocabulary = set(resolver._tokens)
+    limit = max_edits(token) if token not in vocabulary else 0
+    found = set()
+    for candidate in vocabulary:
+        if(candidate.startswith(token) or (len(token) >= 3 and token in candidate)):
+            found.add(candidate)
+        elif(limit and edit_distance(token,candidate,limit) <= limit):
+            found.add(candidate)
+    return found
+
+class NameResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.resolver = NameResolver(items)
+
+    def test_exact_and_case_insensitive(self):
+        for item in items:
+            for name in (item['name'],item['name'].upper(),item['name'].lower()):
+                match = self.resolver.resolve(name)
+                self.assertEqual((match.id,match.score),(item['id'],1.0))
+        self.assertEqual(self.resolver.resolve('torags platelegs').id,2)
+        self.assertEqual(normalize("Torag's platelegs (0)"),'torags platelegs 0')
+
+    def test_typos_and_partial_names(self):
+        self.assertEqual(self.resolver.resolve('abysal whip').id,1)
+        self.assertEqual(self.resolver.resolve('torag legs').id,2)
+        self.assertEqual(self.resolver.resolve('dragon scim').id,3)
+        self.assertEqual(self.resolver.resolve('dragn dagger').id,4)
+        self.assertIsNone(self.resolver.resolve('xyz'))
+        self.assertEqual(self.resolver.search('   '),[])
+
+    def test_edit_distance_ranking(self):
+        #balancee is 1 edit away from balance and 2 from bolance
+        matches = self.resolver.search('guthix balancee')
+        self.assertEqual([m.id for m in matches],[10,11])
+        self.assertGreater(matches[0].score,matches[1].score)
+        similarities = self.resolver._token_matches('balancee')
+        self.assertEqual(similarities,{'balance':1 - 1/8,'bolance':1 - 2/8})
+        #a token spelled right doesn't pull in its misspellings
+        self.assertEqual(self.resolver.resolve('guthix balance').id,10)
+        self.assertEqual(self.resolver._token_matches('balance'),{'balance':1.0})
+
+    def test_short_names(self):
+        #4 letter tokens allow one edit, 3 letter tokens none
+        self.assertEqual(self.resolver.resolve('coai').id,8)
+        self.assertIsNone(self.resolver.resolve('cad'))
+        self.assertIsNone(self.resolver.resolve('cda'))
+        self.assertEqual(self.resolver.resolve('cod').id,9)
+        #short prefixes still match every token they start
+        self.assertEqual({m.id for m in self.resolver.search('co')},{8,9})
+
+    def test_trigram_candidates(self):
+        rng = random.Random(5)
+        vocabulary = sorted(self.resolver._tokens)
+        queries = ['yss','agger','ax','scimitr','platelegz','a']
+        for _ in range(300):
+            token = rng.choice(vocabulary)
+            edit = rng.randrange(4)
+            i = rng.randrange(len(token))
+            if(edit == 0):
+                token = token[:i] + token[i + 1:]
+            elif(edit == 1):
+                token = token[:i] + rng.choice(string.ascii_lowercase) + token[i:]
+            elif(edit == 2):
+                token = token[:i] + rng.choice(string.ascii_lowercase) + token[i + 1:]
+            else:
+                token = token[i:i + rng.randint(1,5)]
+            queries.append(token)
+        for token in queries:
+            if(token):
+                self.assertEqual(set(self.resolver._token_matches(token)),brute_force_tokens(self.resolver,token),token)
+
+    def test_edit_distance(self):
+        self.assertEqual(edit_distance('kitten','sitting',5),3)
+        self.assertEqual(edit_distance('kitten','sitting',2),3)
+        self.assertEqual(edit_distance('abc','abc',0),0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import math
+import unittest
+
+import numpy as np
+
+from osrsutils.screener import Market
+
+items = [{'id':2,'name':'Cannonball','limit':11000,'highalch':3},
+         {'id':6,'name':'Cannon base','highalch':112500},
+         {'id':561,'name':'Nature rune','limit':18000,'highalch':2},
+         {'id':13190,'name':'Old school bond','highalch':3}]
+
+prices = {'2':{'avgHighPrice':200,'highPriceVolume':1200,'avgLowPrice':190,'lowPriceVolume':1000},
+          '6':{'avgHighPrice':190000,'highPriceVolume':10,'avgLowPrice':180000,'lowPriceVolume':10},
+          '561':{'avgHighPrice':40,'highPriceVolume':None,'avgLowPrice':39,'lowPriceVolume':None},
+          '13190':{'avgHighPrice':9000000,'highPriceVolume':50,'avgLowPrice':8900000,'lowPriceVolume':50}}
+
+class MarketTest(unittest.TestCase):
+
+    def setUp(self):
+        self.market = Market.from_data(items,prices,hours = 1)
+
+    def test_ge_tax(self):
+        self.assertEqual(self.market.ids.tolist(),[2,6,561,13190])
+        self.assertEqual(self.market.ge_tax().tolist(),[4,3800,0,0])
+        self.assertEqual(self.market.ge_tax([49,50,10**9]).tolist(),[0,1,5000000])
+        self.assertEqual(self.market.ge_tax(1000),20)
+        self.assertEqual(self.market.ge_tax(10),0)
+        self.assertTrue(math.isnan(self.market.ge_tax(float('nan'))))
+
+    def test_profit_per_hour(self):
+        margin = self.market.flip_margin()
+        self.assertEqual(margin[:3].tolist(),[6,6200,1])
+        profit = self.market.profit_per_hour()
+        #cannonballs are capped by the traded volume, the unknown limit and volume give NaN
+        self.assertEqual(profit[0],6 * 1000)
+        self.assertTrue(np.isnan(profit[1:]).all())
+        profit = self.market.profit_per_hour(volume = np.full(4,np.inf))
+        self.assertEqual(profit[0],6 * 11000 / 4)
+        self.assertTrue(np.isnan(profit[1]))
+        self.assertEqual(profit[2],1 * 18000 / 4)
+
+if __name__ == '__main__':
+    unittest.main()
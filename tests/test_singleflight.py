@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import unittest
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import transport
+from osrsutils.singleflight import SingleFlight
+from stubserver import StubServer
+
+class SingleFlightTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer(latency = 0.3).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.saved = transport.retries
+        transport.configure(retries = 0)
+        self.inflight = SingleFlight()
+
+    def tearDown(self):
+        transport.configure(retries = self.saved)
+
+    def request(self):
+        res = transport.get(self.server.url + '/ge/detail.json')
+        res.raise_for_status()
+        return res
+
+    def concurrently(self,n):
+        results = [None] * n
+        barrier = threading.Barrier(n)
+        def call(i):
+            barrier.wait()
+            try:
+                results[i] = self.inflight.do(('ge',4151),self.request)
+            except Exception as e:
+                results[i] = e
+        threads = [threading.Thread(target = call,args = (i,)) for i in range(n)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shares_result(self):
+        requests = self.server.requests
+        results = self.concurrently(8)
+        self.assertEqual(self.server.requests - requests,1)
+        self.assertTrue(all(result is results[0] for result in results))
+        self.assertEqual(results[0].status_code,200)
+        self.assertEqual(self.inflight.shared,7)
+        self.assertEqual(len(self.inflight),0)
+
+        #nothing is cached once the request finished
+        self.inflight.do(('ge',4151),self.request)
+        self.assertEqual(self.server.requests - requests,2)
+
+    def test_shares_exception(self):
+        self.server.queue_statuses(500)
+        requests = self.server.requests
+        results = self.concurrently(6)
+        self.assertEqual(self.server.requests - requests,1)
+        for result in results:
+            self.assertIsInstance(result,transport.HTTPError)
+        self.assertEqual(len(self.inflight),0)
+        self.assertEqual(self.inflight.do(('ge',4151),self.request).status_code,200)
+
+    def test_different_keys_not_shared(self):
+        requests = self.server.requests
+        threads = [threading.Thread(target = self.inflight.do,args = (('ge',id),self.request)) for id in (1,2,3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.server.requests - requests,3)
+        self.assertEqual(self.inflight.shared,0)
+
+if __name__ == '__main__':
+    unittest.main()
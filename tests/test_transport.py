@@ -0,0 +1,96 @@
+import os
+import sys
+import time
+import unittest
+from email.utils import formatdate
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import transport
+from osrsutils.transport import TokenBucket
+from stubserver import StubServer
+
+class TokenBucketTest(unittest.TestCase):
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(10,2)
+        self.assertEqual(bucket.reserve(),0)
+        self.assertEqual(bucket.reserve(),0)
+        self.assertAlmostEqual(bucket.reserve(),0.1,delta = 0.02)
+        self.assertAlmostEqual(bucket.reserve(),0.2,delta = 0.02)
+
+    def test_acquire_waits(self):
+        bucket = TokenBucket(20,1)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        self.assertGreaterEqual(time.monotonic() - start,0.18)
+
+class TransportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = StubServer().start()
+        cls.url = cls.server.url + '/prices/latest'
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.saved = (transport.retries,transport.backoff_factor)
+        transport.configure(retries = 3,backoff_factor = 0)
+
+    def tearDown(self):
+        transport.configure(retries = self.saved[0],backoff_factor = self.saved[1])
+        transport.set_rate_limit('test',None)
+
+    def test_retries_errors(self):
+        self.server.queue_statuses(500,503)
+        requests = self.server.requests
+        res = transport.get(self.url,'test')
+        self.assertEqual(res.status_code,200)
+        self.assertEqual(self.server.requests - requests,3)
+
+    def test_gives_up_after_retries(self):
+        transport.configure(retries = 1)
+        self.server.queue_statuses(500,502,200)
+        requests = self.server.requests
+        self.assertEqual(transport.get(self.url,'test').status_code,502)
+        self.assertEqual(self.server.requests - requests,2)
+        self.assertEqual(transport.get(self.url,'test').status_code,200)
+
+    def test_client_errors_not_retried(self):
+        self.server.queue_statuses(404)
+        requests = self.server.requests
+        self.assertEqual(transport.get(self.url,'test').status_code,404)
+        self.assertEqual(self.server.requests - requests,1)
+
+    def test_retry_after(self):
+        #the backoff would wait 10 seconds, Retry-After: 0 is used instead
+        transport.configure(backoff_factor = 10)
+        self.server.queue_statuses(429,429)
+        start = time.monotonic()
+        self.assertEqual(transport.get(self.url,'test').status_code,200)
+        self.assertLess(time.monotonic() - start,5)
+
+    def test_retry_after_values(self):
+        class Response:
+            def __init__(self,value):
+                self.headers = {'Retry-After':value} if value is not None else {}
+        self.assertEqual(transport._retry_after(Response('3')),3)
+        self.assertEqual(transport._retry_after(Response('-1')),0)
+        self.assertEqual(transport._retry_after(Response('100000')),transport.backoff_max)
+        self.assertAlmostEqual(transport._retry_after(Response(formatdate(time.time() + 30,usegmt = True))),30,delta = 2)
+        self.assertIsNone(transport._retry_after(Response(None)))
+        self.assertIsNone(transport._retry_after(Response('soon')))
+
+    def test_every_attempt_takes_a_token(self):
+        transport.set_rate_limit('test',10,2)
+        self.server.queue_statuses(500)
+        self.assertEqual(transport.get(self.url,'test').status_code,200)
+        #both tokens of the burst were used by the two attempts
+        self.assertGreater(transport.get_limiter('test').reserve(),0.05)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import json
+import os
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.realpath(__file__))),'benchmarks'))
+
+from osrsutils import osrsitems
+from osrsutils.watcher import PriceSnapshot, PriceWatcher, diff_snapshots, margin_moved, price_moved, watched_ids
+from stubserver import StubServer
+
+def snapshot(data):
+    return PriceSnapshot.from_data('latest',data,0)
+
+class DiffTest(unittest.TestCase):
+
+    old = {'2':{'high':100,'highTime':1,'low':90,'lowTime':1},
+           '6':{'high':1000,'highTime':1,'low':None,'lowTime':None},
+           '8':{'high':50,'highTime':1,'low':40,'lowTime':1}}
+
+    def test_diff(self):
+        new = json.loads(json.dumps(self.old))
+        new['2']['high'] = 103
+        new['6']['low'] = 800
+        new['10'] = {'high':5,'highTime':2,'low':4,'lowTime':2}
+        del new['8']
+        delta = diff_snapshots(snapshot(self.old),snapshot(new))
+        self.assertEqual(delta.ids.tolist(),[2,6,10])
+        records = delta.records()
+        self.assertEqual(records[0],{'id':2,'high':103,'highTime':1,'low':90,'lowTime':1,
+                                     'old':{'high':100,'highTime':1,'low':90,'lowTime':1}})
+        self.assertEqual(records[1]['old']['low'],None)
+        self.assertEqual(records[2]['old'],{'high':None,'highTime':None,'low':None,'lowTime':None})
+        self.assertFalse(diff_snapshots(snapshot(self.old),snapshot(self.old)))
+        self.assertEqual(len(diff_snapshots(snapshot({}),snapshot(self.old))),3)
+
+    def test_filters(self):
+        new = json.loads(json.dumps(self.old))
+        new['2']['high'] = 103      #3% move, margin 10 -> 13
+        new['8']['high'] = 60       #20% move, margin 10 -> 20
+        new['6']['low'] = 900       #the old margin is unknown
+        delta = diff_snapshots(snapshot(self.old),snapshot(new))
+        self.assertEqual(delta.ids[price_moved('high',pct = 5)(delta)].tolist(),[8])
+        self.assertEqual(delta.ids[price_moved('high',absolute = 3)(delta)].tolist(),[2,8])
+        self.assertEqual(delta.ids[margin_moved(pct = 50)(delta)].tolist(),[8])
+        self.assertEqual(delta.ids[margin_moved(absolute = 1)(delta)].tolist(),[2,8])
+        self.assertEqual(delta.ids[watched_ids([6,8,4151])(delta)].tolist(),[6,8])
+        old, new = delta.margin()
+        self.assertTrue(np.array_equal(old,np.array([10,np.nan,10]),equal_nan = True))
+        self.assertEqual(new.tolist(),[13,100,20])
+
+class PriceWatcherTest(unittest.TestCase):
+
+    def test_poll_pushes_deltas(self):
+        with StubServer() as server:
+            server.install()
+            watcher = PriceWatcher()
+            received = []
+            watcher.subscribe(received.append)
+            subscription = watcher.subscribe_queue(filter = [watched_ids([2,4151]),price_moved('high',pct = 10)])
+            self.assertIsNone(watcher.poll())
+
+            latest = json.loads(server.payloads['latest'])
+            latest['data']['2']['high'] *= 2
+            latest['data']['6']['high'] += 1
+            latest['data']['4151']['low'] -= 1
+            server.payloads['latest'] = json.dumps(latest).encode('utf-8')
+            osrsitems.response_cache.invalidate()
+
+            delta = watcher.poll()
+            self.assertEqual(delta.ids.tolist(),[2,6,4151])
+            self.assertEqual([d.ids.tolist() for d in received],[[2,6,4151]])
+            self.assertEqual(subscription.queue.get_nowait().ids.tolist(),[2])
+
+            #nothing changed: no delta is pushed
+            osrsitems.response_cache.invalidate()
+            self.assertFalse(watcher.poll())
+            self.assertEqual(len(received),1)
+            self.assertTrue(subscription.queue.empty())
+
+            watcher.unsubscribe(subscription)
+            self.assertEqual(len(watcher._subscriptions),1)
+
+    def test_bad_responses_skipped(self):
+        old = DiffTest.old
+        new = json.loads(json.dumps(old))
+        new['2']['high'] = 103
+        responses = [{'data':old},{},None,{'data':{}},{'data':None},{'data':{'2':None}},{'data':new}]
+        watcher = PriceWatcher()
+        received = []
+        watcher.subscribe(lambda delta: 1/0)
+        watcher.subscribe(lambda delta: received.append(delta),filter = lambda delta: delta.ids == 'x')
+        watcher.subscribe(received.append)
+        with mock.patch.object(osrsitems,'get_latest_price',side_effect = responses):
+            self.assertIsNone(watcher.poll())
+            for _ in range(5):
+                self.assertIsNone(watcher.poll())
+                self.assertEqual(len(watcher.snapshots['latest']),3)
+            #the empty polls didn't replace the last snapshot, and the failing subscribers didn't stop the last one
+            self.assertEqual(watcher.poll().ids.tolist(),[2])
+        self.assertEqual([d.ids.tolist() for d in received],[[2]])
+
+    def test_thread_survives_errors(self):
+        old = DiffTest.old
+        new = json.loads(json.dumps(old))
+        new['8']['low'] = 41
+        responses = [{'data':old},ConnectionError('down'),{},ValueError('bad json'),{'data':new}]
+        done = threading.Event()
+
+        def get_latest_price():
+            response = responses.pop(0) if responses else {'data':new}
+            if(not responses):
+                done.set()
+            if(isinstance(response,Exception)):
+                raise response
+            return response
+
+        received = []
+        watcher = PriceWatcher({'latest':0.01})
+        watcher.subscribe(received.append)
+        with mock.patch.object(osrsitems,'get_latest_price',get_latest_price):
+            with watcher:
+                self.assertTrue(done.wait(5))
+                thread = watcher._thread
+                #the delta is pushed once the poll of the last response finishes
+                for _ in range(100):
+                    if(received):
+                        break
+                    threading.Event().wait(0.01)
+                self.assertTrue(thread.is_alive())
+        self.assertEqual([d.ids.tolist() for d in received],[[8]])
+
+    def test_unknown_route(self):
+        with self.assertRaises(ValueError):
+            PriceWatcher({'24h':60})
+
+if __name__ == '__main__':
+    unittest.main()